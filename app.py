@@ -1,11 +1,7 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
-import pytz
-import psycopg2
-from psycopg2.extras import execute_values
 import time
 # --- 1. إعداد الصفحة والتصميم (Configuration & CSS) ---
+_run_started = time.perf_counter()
 st.set_page_config(
     page_title="Nawaem POS 🚀", 
     layout="wide", 
@@ -14,177 +10,44 @@ st.set_page_config(
 )
 
 from styles import get_main_style
-from database import get_db_connection, run_query, init_db, migrate_db, get_inventory, get_customers, get_sales, get_expenses, clear_all_cache, get_time
+from database import setup_db, ensure_partitions, get_stock_summary, clear_all_cache, start_change_listener, get_time
+from valuation import ensure_daily_snapshot
+from checkout_journal import start_checkout_replayer
+from ui import perf_enabled
 
 # تصميم عصري محسّن (Enhanced Glassmorphism & Dark Mode)
 st.markdown(get_main_style(), unsafe_allow_html=True)
 
-# --- 4. دوال مساعدة للواجهة ---
-
-def get_stock_status(stock):
-    """الحصول على حالة المخزون بشكل مرئي"""
-    if stock <= 0:
-        return ("🔴 نفذ", "danger")
-    elif stock < 3:
-        return ("🟡 قليل", "warning")
-    else:
-        return ("🟢 متوفر", "success")
-
-def render_stock_bar(stock, max_stock=20):
-    """رسم شريط تقدم المخزون"""
-    percentage = min(100, (stock / max_stock) * 100)
-    color = "#EF4444" if stock < 3 else "#F59E0B" if stock < 6 else "#10B981"
-    return f"""
-    <div class="stock-bar">
-        <div class="stock-bar-fill" style="width: {percentage}%; background: {color};"></div>
-    </div>
-    """
-
-# --- 5. منطق التطبيق (Callbacks Logic) ---
+# --- 2. تهيئة الجلسة ---
 
 if 'cart' not in st.session_state: 
     st.session_state.cart = []
-if 'db_inited' not in st.session_state:
-    init_db()
-    migrate_db()
-    st.session_state.db_inited = True
-
-def add_to_cart_callback():
-    selection = st.session_state.get('pos_selection')
-    if not selection: 
-        return
-    
-    df = get_inventory()
-    try:
-        prod_name = selection.split(" | ")[0]
-        prod_color = selection.split(" | ")[1].split(" (")[0]
-        item_row = df[(df['name'] == prod_name) & (df['color'] == prod_color)].iloc[0]
-        
-        qty = st.session_state.get('pos_qty', 1)
-        price = st.session_state.get('pos_price', item_row['price'])
-        
-        cart_item = {
-            "id": int(item_row['id']), 
-            "name": item_row['name'],
-            "color": item_row['color'], 
-            "size": item_row['size'],
-            "price": price, 
-            "qty": qty, 
-            "cost": float(item_row['cost']),
-            "total": price * qty
-        }
-        st.session_state.cart.append(cart_item)
-        st.toast(f"🛒 أضيف: {item_row['name']}", icon="✅")
-    except IndexError:
-        st.error("❌ لم يتم العثور على المنتج")
-    except Exception as e:
-        st.error(f"❌ حدث خطأ أثناء إضافة المنتج: {e}")
-
-def remove_from_cart_callback(idx):
-    if 0 <= idx < len(st.session_state.cart):
-        removed = st.session_state.cart.pop(idx)
-        st.toast(f"🗑️ أُزيل: {removed['name']}", icon="✅")
-
-def checkout_callback():
-    if not st.session_state.cart:
-        st.error("❌ السلة فارغة")
-        return
-
-    c_select = st.session_state.get('c_select')
-    c_name = st.session_state.get('c_name')
-    if c_select == "➕ عميل جديد" and not c_name:
-        st.error("❌ الاسم مطلوب")
-        return
-
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            # معالجة العميل
-            cust_id = None
-            if c_select == "➕ عميل جديد":
-                cur.execute(
-                    "INSERT INTO public.customers (name, phone, address, username) VALUES (%s, %s, %s, %s) RETURNING id", 
-                    (c_name, st.session_state.get('c_phone', ''), st.session_state.get('c_addr', ''), c_name)
-                )
-                cust_id = cur.fetchone()[0]
-                customer_display = c_name
-                customer_addr = st.session_state.get('c_addr', '')
-            else:
-                df_cust = get_customers()
-                cust_data = df_cust[df_cust['name'] == c_select].iloc[0]
-                cust_id = int(cust_data['id'])
-                customer_display = cust_data['name']
-                customer_addr = cust_data['address']
-
-            # تحضير البيانات للإدخال الدفعي
-            inv_id = get_time().strftime("%Y%m%d%H%M")
-            sales_data = []
-            
-            discount_pct = st.session_state.get('c_discount', 0)
-            
-            for item in st.session_state.cart:
-                cur.execute("UPDATE public.variants SET stock = stock - %s WHERE id = %s", (item['qty'], item['id']))
-                
-                # Apply Discount
-                orig_total = item['total']
-                discount_amt = orig_total * (discount_pct / 100.0)
-                final_total = orig_total - discount_amt
-                
-                profit = final_total - (item['cost'] * item['qty'])
-                
-                sales_data.append((
-                    cust_id, item['id'], item['name'], item['qty'], final_total, 
-                    profit, get_time(), inv_id, st.session_state.get('c_dur', '24 ساعة'),
-                    discount_amt
-                ))
-
-            execute_values(cur, """
-                INSERT INTO public.sales (customer_id, variant_id, product_name, qty, total, profit, date, invoice_id, delivery_duration, discount)
-                VALUES %s
-            """, sales_data)
-
-            conn.commit()
-            
-            # إنشاء نص الفاتورة (تنسيق مخصص للطابعات الحرارية)
-            line_len = 32
-            msg = f"{'نواعم بوتيك':^{line_len}}\n"
-            msg += f"{'Nawaem Boutique':^{line_len}}\n"
-            msg += f"{'-'*line_len}\n"
-            msg += f"التاريخ: {get_time().strftime('%Y-%m-%d %H:%M')}\n"
-            msg += f"رقم الفاتورة: {inv_id}\n"
-            msg += f"العميل: {customer_display}\n"
-            msg += f"{'-'*line_len}\n"
-            msg += f"{'المنتج':<18} {'السعر':>13}\n"
-            
-            total = 0
-            for it in st.session_state.cart:
-                # Format: ItemName (Qty) ... Price
-                item_line = f"{it['name']} ({it['size']})"
-                # Truncate if too long
-                if len(item_line) > 18: item_line = item_line[:17] + "…"
-                
-                price_line = f"{it['qty']}x{it['price']:,}"
-                total_line = f"{it['total']:,}"
-                
-                msg += f"{item_line:<18} {total_line:>13}\n"
-                msg += f"  @{it['price']:,}\n"
-                total += it['total']
-            
-            msg += f"{'-'*line_len}\n"
-            msg += f"الإجمالي: {total:,.0f} د.ع\n"
-            msg += f"{'-'*line_len}\n"
-            msg += f"📍 {customer_addr}\n"
-            msg += f"{'شكراً لزيارتكم':^{line_len}}"
-            
-            st.session_state.last_inv = msg
-            st.session_state.cart = []
-            clear_all_cache()
-            
-    except Exception as e:
-        conn.rollback()
-        st.error(f"❌ فشلت العملية: {e}")
-
-# --- 6. واجهة المستخدم (Layout) ---
+# إنشاء الجداول وتحديثها مرة واحدة لكل عملية (وليس لكل جلسة متصفح)
+setup_db()
+
+# مستمع تغييرات قاعدة البيانات (مرة واحدة لكل عملية) لتحديث الكاش فوراً بين الجلسات
+start_change_listener()
+# مزامنة الفواتير المحفوظة محلياً مع قاعدة البيانات في الخلفية
+start_checkout_replayer()
+# أقسام الأشهر القادمة لجداول المبيعات والمصاريف (مرة واحدة لكل شهر لكل عملية)
+partition_problems = ensure_partitions(get_time().strftime("%Y-%m"))
+# لقطة تقييم المخزون اليومية إن لم تُنفّذ المهمة المجدولة (مرة واحدة لكل يوم لكل عملية)
+ensure_daily_snapshot(get_time().date())
+
+# --- 3. الصفحات (تُحمّل عند الطلب فقط) ---
+# كل صفحة ملف مستقل في views/ ولا يُنفّذ إلا ملف الصفحة المعروضة مع استيراداته
+
+PAGES = [
+    st.Page("views/pos.py", title="نقطة البيع", icon="🛒", default=True),
+    st.Page("views/inventory.py", title="المخزون", icon="📦"),
+    st.Page("views/reports.py", title="التقارير", icon="📊"),
+    st.Page("views/customers.py", title="العملاء", icon="👥"),
+    st.Page("views/history.py", title="السجل", icon="📜"),
+    st.Page("views/expenses.py", title="المصاريف", icon="💸"),
+]
+page = st.navigation(PAGES, position="hidden")
+
+# --- 4. واجهة المستخدم (Layout) ---
 
 with st.sidebar:
     # العلامة التجارية - باستخدام مكونات Streamlit الأصلية
@@ -194,11 +57,8 @@ with st.sidebar:
     st.divider()
     
     # التنقل
-    page = st.radio(
-        "التنقل", 
-        ["🛒 نقطة البيع", "📦 المخزون", "📊 التقارير", "👥 العملاء", "📜 السجل", "💸 المصاريف"],
-        label_visibility="collapsed"
-    )
+    for p in PAGES:
+        st.page_link(p)
     
     st.divider()
     
@@ -215,688 +75,21 @@ with st.sidebar:
     
     # ملخص سريع
     st.divider()
-    df_inv = get_inventory()
-    if df_inv is not None and not df_inv.empty:
-        total_items = df_inv['stock'].sum()
-        low_stock = len(df_inv[df_inv['stock'] < 3])
+    summary = get_stock_summary()
+    if summary and summary['variants'] > 0:
+        total_items = summary['total_items']
+        low_stock = summary['low_stock']
         st.caption(f"📦 المخزون: {total_items} قطعة")
         if low_stock > 0:
             st.caption(f"⚠️ نواقص: {low_stock} موديل")
+    for problem in partition_problems:
+        st.caption(f"⚠️ تقسيم الجداول: {problem}")
 
-# ==========================================
-# صفحة 1: نقطة البيع (POS)
-# ==========================================
-if page == "🛒 نقطة البيع":
-    col_pos, col_cart = st.columns([2, 1.2], gap="large")
-
-    # >> القسم الأيمن: المنتجات والبحث
-    with col_pos:
-        st.markdown("### 🔍 البحث والمنتجات")
-        df_inv = get_inventory()
-        
-        if df_inv is not None:
-             low_stock_count = len(df_inv[df_inv['stock'] < 3])
-             if low_stock_count > 0:
-                 st.warning(f"⚠️ تنبيه: يوجد {low_stock_count} منتجات قاربت على النفاذ!")
-        
-        if df_inv is not None and not df_inv.empty:
-            df_active = df_inv[df_inv['stock'] > 0].copy()
-            df_active['display'] = df_active['name'] + " | " + df_active['color'] + " (" + df_active['size'] + ")"
-            
-            st.selectbox(
-                "بحث عن منتج:", 
-                options=df_active['display'].tolist(), 
-                index=None, 
-                key="pos_selection",
-                placeholder="🔎 اكتب اسم المنتج أو اللون للبحث..."
-            )
-
-            # عرض تفاصيل المنتج المختار
-            if st.session_state.get('pos_selection'):
-                sel = st.session_state.pos_selection
-                item = df_active[df_active['display'] == sel].iloc[0]
-                
-                # بطاقة المنتج
-                st.markdown(f"""
-                <div class="product-preview">
-                    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 12px;">
-                        <h4 style="margin: 0; color: var(--text-primary);">{item['name']}</h4>
-                        <span class="status-badge status-{'success' if item['stock'] >= 3 else 'warning' if item['stock'] > 0 else 'danger'}">
-                            {item['stock']} متوفر
-                        </span>
-                    </div>
-                    <div style="color: var(--text-secondary); font-size: 14px;">
-                        <span style="margin-left: 16px;">🎨 {item['color']}</span>
-                        <span style="margin-left: 16px;">📐 {item['size']}</span>
-                        <span style="margin-left: 16px;">💵 {item['price']:,.0f} د.ع</span>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # نموذج الإضافة
-                c_qty, c_price, c_btn = st.columns([1, 1, 2])
-                with c_qty:
-                    st.number_input("العدد", 1, int(item['stock']), 1, key="pos_qty")
-                with c_price:
-                    custom_price = st.number_input("سعر البيع", value=float(item['price']), key="pos_price")
-                    # إظهار هامش الربح
-                    margin = custom_price - float(item['cost'])
-                    margin_pct = (margin / custom_price * 100) if custom_price > 0 else 0
-                    color = "#10B981" if margin > 0 else "#EF4444"
-                    st.caption(f"<span style='color:{color}'>هامش الربح: {margin:,.0f} ({margin_pct:.0f}%)</span>", unsafe_allow_html=True)
-                with c_btn:
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    st.button(
-                        "➕ إضافة للسلة", 
-                        type="primary", 
-                        use_container_width=True, 
-                        on_click=add_to_cart_callback
-                    )
-        else:
-            st.info("📭 لا توجد منتجات متوفرة في المخزون")
-
-    # >> القسم الأيسر: السلة والدفع
-    with col_cart:
-        st.markdown("### 🧾 الفاتورة")
-        
-        total_bill = sum(item['total'] for item in st.session_state.cart)
-        total_profit = sum((item['price'] - item['cost']) * item['qty'] for item in st.session_state.cart)
-        
-        # عرض الإجمالي
-        st.markdown(f"""
-        <div class="total-card">
-            <div class="total-label">الإجمالي النهائي</div>
-            <div class="total-value">{total_bill:,.0f} <span class="total-currency">د.ع</span></div>
-            <div style="font-size: 12px; color: var(--success); margin-top: 4px;">
-                ربح متوقع: {total_profit:,.0f} د.ع
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # عناصر السلة
-        if not st.session_state.cart:
-            st.markdown("""
-            <div class="empty-cart">
-                <div class="empty-cart-icon">🛒</div>
-                <p>السلة فارغة</p>
-                <p style="font-size: 12px;">اختر منتجاً للبدء</p>
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            for i, item in enumerate(st.session_state.cart):
-                col_item, col_del = st.columns([5, 1])
-                with col_item:
-                    st.markdown(f"""
-                    <div class="cart-item">
-                        <div style="display: flex; justify-content: space-between;">
-                            <strong>{item['name']}</strong>
-                            <span style="color: var(--primary);">{item['total']:,.0f}</span>
-                        </div>
-                        <div style="color: var(--text-muted); font-size: 12px; margin-top: 4px;">
-                            {item['color']} • {item['size']} • {item['qty']} × {item['price']:,.0f}
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                with col_del:
-                    st.button("🗑️", key=f"del_{i}", on_click=remove_from_cart_callback, args=(i,), help="إزالة")
-
-            st.divider()
-            
-            # معلومات العميل
-            with st.expander("👤 معلومات العميل", expanded=True):
-                df_cust = get_customers()
-                customer_options = ["➕ عميل جديد"]
-                if df_cust is not None and not df_cust.empty:
-                    customer_options += df_cust['name'].tolist()
-                
-                st.selectbox("العميل", customer_options, key="c_select")
-                
-                if st.session_state.get('c_select') == "➕ عميل جديد":
-                    st.text_input("الاسم *", key="c_name", placeholder="اسم العميل")
-                    col_p, col_a = st.columns(2)
-                    col_p.text_input("📞 الهاتف", key="c_phone", placeholder="07XX")
-                    col_a.text_input("📍 العنوان", key="c_addr", placeholder="المنطقة/الحي")
-                else:
-                    if df_cust is not None and not df_cust.empty and st.session_state.get('c_select'):
-                        curr = df_cust[df_cust['name'] == st.session_state.c_select]
-                        if not curr.empty:
-                            curr = curr.iloc[0]
-                            st.markdown(f"""
-                            <div style="background: var(--bg-elevated); padding: 12px; border-radius: 10px; font-size: 13px;">
-                                <span>📞 {curr['phone'] or 'لا يوجد'}</span> &nbsp;|&nbsp; 
-                                <span>📍 {curr['address'] or 'لا يوجد'}</span>
-                            </div>
-                            """, unsafe_allow_html=True)
-
-                st.selectbox("⏱️ مدة التوصيل", ["24 ساعة", "48 ساعة", "فوري"], key="c_dur")
-                st.number_input("💵 خصم للكلي (%)", 0, 100, 0, key="c_discount")
-            
-            # زر الدفع
-            st.button(
-                "✅ إتمام البيع وطباعة الفاتورة", 
-                type="primary", 
-                use_container_width=True, 
-                on_click=checkout_callback
-            )
-
-        # نافذة الفاتورة بعد الدفع
-        if 'last_inv' in st.session_state:
-            st.success("✅ تم البيع بنجاح!")
-            st.text_area("📋 نص الفاتورة (للنسخ)", st.session_state.last_inv, height=180)
-            if st.button("🆕 بدء طلب جديد", use_container_width=True):
-                del st.session_state.last_inv
-                st.rerun()
-
-# ==========================================
-# صفحة 2: المخزون (عرض احترافي لمتجر ملابس)
-# ==========================================
-elif page == "📦 المخزون":
-    st.markdown("## 📦 مخزون المتجر")
-
-    df = get_inventory()
-    if df is not None and not df.empty:
-        # مؤشرات الأداء السريعة
-        df['total_cost_value'] = df['stock'] * df['cost']
-        df['total_sale_potential'] = df['stock'] * df['price']
-
-        c1, c2, c3, c4 = st.columns(4)
-        total_items = df['stock'].sum()
-        total_cost = df['total_cost_value'].sum()
-        total_sales = df['total_sale_potential'].sum()
-        low_stock = len(df[df['stock'] < 3])
-
-        c1.metric("📦 إجمالي القطع", f"{total_items:,}")
-        c2.metric("💰 رأس المال", f"{total_cost:,.0f}")
-        c3.metric("📈 القيمة البيعية", f"{total_sales:,.0f}", delta=f"+{(total_sales-total_cost):,.0f} ربح")
-        c4.metric("⚠️ نواقص", f"{low_stock} موديل", delta_color="inverse")
-
-        st.divider()
+page.run()
 
-        # خيارات العرض
-        view_type = st.radio(
-            "طريقة العرض:", 
-            ["👗 عرض المتجر", "📊 ملخص سريع", "📝 تفاصيل للتعديل"], 
-            horizontal=True
-        )
-
-        # ========================================
-        # العرض الجديد: عرض المتجر (نظيف ومرتب)
-        # ========================================
-        if "عرض المتجر" in view_type:
-            # فلتر البحث
-            col_search, col_stock_filter = st.columns([2, 1])
-            with col_search:
-                search_model = st.text_input("🔍 بحث عن موديل:", placeholder="اكتب اسم الموديل...", key="matrix_search")
-            with col_stock_filter:
-                show_filter = st.selectbox("عرض:", ["الكل", "متوفر فقط", "فيه نواقص"], key="matrix_filter")
-            
-            st.divider()
-            
-            # تجميع البيانات حسب الموديل
-            models = df['name'].unique()
-            
-            for model_name in sorted(models):
-                # تطبيق فلتر البحث
-                if search_model and search_model.lower() not in model_name.lower():
-                    continue
-                
-                model_data = df[df['name'] == model_name]
-                model_total = int(model_data['stock'].sum())
-                model_has_low = (model_data['stock'] < 3).any()
-                
-                # تطبيق فلتر المخزون
-                if show_filter == "متوفر فقط" and model_total == 0:
-                    continue
-                if show_filter == "فيه نواقص" and not model_has_low:
-                    continue
-                
-                # حالة المخزون
-                if model_total == 0:
-                    status_icon = "🔴"
-                    status_text = f"{model_name} - نفذ"
-                elif model_has_low:
-                    status_icon = "🟡"
-                    status_text = f"{model_name} ({model_total} قطعة)"
-                else:
-                    status_icon = "🟢"
-                    status_text = f"{model_name} ({model_total} قطعة)"
-                
-                # عرض الموديل في Expander
-                with st.expander(f"{status_icon} {status_text}", expanded=False):
-                    # جدول لكل لون
-                    for color in model_data['color'].unique():
-                        color_data = model_data[model_data['color'] == color]
-                        price = color_data.iloc[0]['price']
-                        
-                        st.markdown(f"**🎨 {color}** - 💵 {price:,.0f} د.ع")
-                        
-                        # عرض المقاسات في صف واحد
-                        size_cols = st.columns(len(color_data))
-                        for idx, (_, row) in enumerate(color_data.iterrows()):
-                            stock = int(row['stock'])
-                            size = row['size']
-                            
-                            with size_cols[idx]:
-                                if stock >= 3:
-                                    st.success(f"{size}: {stock}")
-                                elif stock > 0:
-                                    st.warning(f"{size}: {stock}")
-                                else:
-                                    st.error(f"{size}: 0")
-                        
-                        st.markdown("---")
-            
-            # زر التصدير
-            st.divider()
-            csv = df.to_csv(index=False).encode('utf-8-sig')
-            st.download_button(
-                "📥 تصدير المخزون كاملاً (CSV)",
-                csv,
-                "inventory_full.csv",
-                "text/csv",
-                use_container_width=False
-            )
-
-        # ========================================
-        # العرض الملخص السريع
-        # ========================================
-        elif "ملخص" in view_type:
-            grouped = df.groupby('name').agg({
-                'stock': 'sum',
-                'color': 'count',
-                'total_sale_potential': 'sum'
-            }).reset_index()
-            
-            grouped.columns = ['الموديل', 'الكمية', 'الألوان', 'القيمة']
-            
-            st.dataframe(
-                grouped,
-                use_container_width=True,
-                column_config={
-                    "الكمية": st.column_config.ProgressColumn(
-                        "الكمية",
-                        format="%d",
-                        min_value=0,
-                        max_value=int(grouped['الكمية'].max()) if not grouped.empty else 10
-                    ),
-                    "القيمة": st.column_config.NumberColumn("القيمة", format="%d د.ع")
-                },
-                hide_index=True
-            )
-        
-        # ========================================
-        # العرض التفصيلي للتعديل
-        # ========================================
-        else:
-            col_search, col_filter = st.columns([2, 1])
-            with col_search:
-                search = st.text_input("🔍 بحث:", placeholder="اكتب للفلترة...")
-            with col_filter:
-                stock_filter = st.selectbox("📦 فلترة المخزون", ["الكل", "نواقص فقط", "متوفر فقط"])
-            
-            df_display = df.copy()
-            if search:
-                df_display = df_display[
-                    df_display['name'].str.contains(search, case=False, na=False) | 
-                    df_display['color'].str.contains(search, case=False, na=False)
-                ]
-            if stock_filter == "نواقص فقط":
-                df_display = df_display[df_display['stock'] < 3]
-            elif stock_filter == "متوفر فقط":
-                df_display = df_display[df_display['stock'] >= 3]
-            
-            edited_df = st.data_editor(
-                df_display,
-                key="editor_inv",
-                use_container_width=True,
-                hide_index=True,
-                column_config={
-                    "id": None, 
-                    "total_cost_value": None, 
-                    "total_sale_potential": None,
-                    "name": st.column_config.TextColumn("الاسم"),
-                    "color": st.column_config.TextColumn("اللون"),
-                    "size": st.column_config.SelectboxColumn("القياس", options=["S", "M", "L", "XL", "XXL", "Free"]),
-                    "stock": st.column_config.NumberColumn("العدد", min_value=0, format="%d 📦"),
-                    "price": st.column_config.NumberColumn("البيع", format="%d د.ع"),
-                    "cost": st.column_config.NumberColumn("التكلفة", format="%d د.ع"),
-                }
-            )
-            
-            col_save, col_export = st.columns([1, 1])
-            with col_save:
-                if st.button("💾 حفظ التعديلات", type="primary", use_container_width=True):
-                    with st.spinner("جاري الحفظ..."):
-                        changes = []
-                        for _, row in edited_df.iterrows():
-                            changes.append((
-                                int(row['stock']), float(row['price']), float(row['cost']), 
-                                row['size'], row['name'], row['color'], int(row['id'])
-                            ))
-                        
-                        if changes:
-                            conn = get_db_connection()
-                            with conn.cursor() as cur:
-                                cur.executemany(
-                                    "UPDATE public.variants SET stock=%s, price=%s, cost=%s, size=%s, name=%s, color=%s WHERE id=%s", 
-                                    changes
-                                )
-                                conn.commit()
-                            clear_all_cache()
-                            st.toast("✅ تم الحفظ بنجاح!", icon="✅")
-                            time.sleep(0.5)
-                            st.rerun()
-            
-            with col_export:
-                csv = df.to_csv(index=False).encode('utf-8-sig')
-                st.download_button(
-                    "📥 تصدير CSV",
-                    csv,
-                    "inventory.csv",
-                    "text/csv",
-                    use_container_width=True
-                )
-
-    else:
-        st.info("📭 المخزون فارغ. أضف منتجات للبدء.")
-
-    # إضافة صنف جديد
-    with st.expander("➕ إضافة منتج جديد"):
-        with st.form("new_item"):
-            c1, c2, c3 = st.columns(3)
-            n = c1.text_input("الاسم *")
-            co = c2.text_input("اللون *")
-            sz = c3.selectbox("القياس", ["S", "M", "L", "XL", "XXL", "Free"])
-            
-            c4, c5, c6 = st.columns(3)
-            s = c4.number_input("العدد", min_value=1, value=1)
-            cs = c5.number_input("التكلفة", min_value=0.0, value=0.0)
-            p = c6.number_input("سعر البيع", min_value=0.0, value=0.0)
-            
-            if st.form_submit_button("💾 حفظ المنتج", type="primary"):
-                if n and co:
-                    run_query(
-                        "INSERT INTO public.variants (name, color, size, stock, cost, price) VALUES (%s,%s,%s,%s,%s,%s)", 
-                        (n, co, sz, s, cs, p), commit=True, fetch=False
-                    )
-                    clear_all_cache()
-                    st.toast("✅ تمت الإضافة!", icon="✅")
-                    st.rerun()
-                else:
-                    st.error("❌ الاسم واللون مطلوبان")
-
-# ==========================================
-# صفحة 3: التقارير (Dashboard)
-# ==========================================
-elif page == "📊 التقارير":
-    st.markdown("## 📊 لوحة المعلومات")
-    
-    # فلتر الفترة
-    col_filter, _ = st.columns([1, 3])
-    with col_filter:
-        period = st.selectbox("📅 الفترة", ["اليوم", "هذا الأسبوع", "هذا الشهر", "كل الوقت"])
-    
-    df_s = get_sales(1000)
-    
-    if df_s is not None and not df_s.empty:
-        df_s['date'] = pd.to_datetime(df_s['date'])
-        
-        # تطبيق الفلتر
-        today = pd.Timestamp.now().normalize()
-        if period == "اليوم":
-            df_filtered = df_s[df_s['date'] >= today]
-        elif period == "هذا الأسبوع":
-            week_start = today - timedelta(days=today.dayofweek)
-            df_filtered = df_s[df_s['date'] >= week_start]
-        elif period == "هذا الشهر":
-            month_start = today.replace(day=1)
-            df_filtered = df_s[df_s['date'] >= month_start]
-        else:
-            df_filtered = df_s
-        
-        # المقاييس
-        m1, m2, m3, m4 = st.columns(4)
-        m1.metric("💵 المبيعات", f"{df_filtered['total'].sum():,.0f}")
-        m2.metric("📦 الطلبات", f"{len(df_filtered['invoice_id'].unique())}")
-        m3.metric("📈 الأرباح", f"{df_filtered['profit'].sum():,.0f}")
-        avg_basket = df_filtered.groupby('invoice_id')['total'].sum().mean() if not df_filtered.empty else 0
-        m4.metric("🛒 متوسط السلة", f"{avg_basket:,.0f}")
-        
-        st.divider()
-        
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("#### 📈 النمو اليومي")
-            if not df_filtered.empty:
-                daily_trend = df_filtered.groupby(df_filtered['date'].dt.date)['total'].sum()
-                st.line_chart(daily_trend, color="#D48896", height=300)
-            else:
-                st.info("لا توجد بيانات لهذه الفترة")
-        
-        with c2:
-            st.markdown("#### 🏆 الأكثر مبيعاً")
-            if not df_filtered.empty:
-                top = df_filtered.groupby('product_name')['qty'].sum().nlargest(5)
-                st.bar_chart(top, color="#D48896", height=250)
-                
-                st.markdown("#### 💎 أفضل العملاء")
-                top_cust = df_filtered.groupby('customer_id')['total'].sum().nlargest(5)
-                # Map IDs to Names
-                df_c = get_customers()
-                if df_c is not None and not df_c.empty:
-                    name_map = df_c.set_index('id')['name'].to_dict()
-                    top_cust.index = top_cust.index.map(lambda x: name_map.get(x, f"ID {x}"))
-                
-                st.bar_chart(top_cust, color="#D48896", height=250)
-            else:
-                st.info("لا توجد بيانات لهذه الفترة")
-
-        st.divider()
-        st.markdown("#### ⌚ أوقات الذروة (بالساعة)")
-        if not df_filtered.empty:
-            df_filtered['hour'] = df_filtered['date'].dt.hour
-            hourly_sales = df_filtered.groupby('hour')['total'].sum()
-            st.bar_chart(hourly_sales, color="#D48896", height=250)
-        else:
-             st.info("لا توجد بيانات كافية")
-        
-        # ملخص إضافي
-        st.divider()
-        col_head, col_ex = st.columns([4, 1])
-        col_head.markdown("#### 📋 آخر المبيعات")
-        csv = df_s.to_csv(index=False).encode('utf-8-sig')
-        col_ex.download_button("📥 تصدير الكل", csv, "sales_report.csv", "text/csv")
-        recent = df_filtered.head(10)[['date', 'product_name', 'qty', 'total', 'profit']]
-        recent.columns = ['التاريخ', 'المنتج', 'الكمية', 'المبلغ', 'الربح']
-        st.dataframe(recent, use_container_width=True, hide_index=True)
-        
-    else:
-        st.info("📭 لا توجد مبيعات بعد")
-
-# ==========================================
-# صفحة 4: العملاء
-# ==========================================
-elif page == "👥 العملاء":
-    st.markdown("## 👥 دليل العملاء")
-    
-    df_cust = get_customers()
-    
-    if df_cust is not None and not df_cust.empty:
-        # بحث
-        search = st.text_input("🔍 بحث عن عميل:", placeholder="اكتب الاسم أو الهاتف...")
-        
-        df_display = df_cust
-        if search:
-            df_display = df_cust[
-                df_cust['name'].str.contains(search, case=False, na=False) |
-                df_cust['phone'].str.contains(search, case=False, na=False)
-            ]
-        
-        st.dataframe(
-            df_display,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "id": None,
-                "username": None,
-                "name": st.column_config.TextColumn("الاسم"),
-                "phone": st.column_config.TextColumn("📞 الهاتف"),
-                "address": st.column_config.TextColumn("📍 العنوان"),
-            }
-        )
-        
-        st.caption(f"إجمالي العملاء: {len(df_cust)}")
-    else:
-        st.info("📭 لا يوجد عملاء مسجلين بعد")
-
-# ==========================================
-# صفحة 5: المصاريف
-# ==========================================
-elif page == "💸 المصاريف":
-    st.markdown("## 💸 إدارة المصاريف")
-    
-    col_form, col_summary = st.columns([1, 1])
-    
-    with col_form:
-        st.markdown("#### ➕ تسجيل مصروف جديد")
-        with st.form("exp_form"):
-            amt = st.number_input("💵 المبلغ", min_value=0.0)
-            category = st.selectbox("📁 التصنيف", ["عام", "رواتب", "إيجار", "فواتير", "مشتريات", "نقل", "أخرى"])
-            rsn = st.text_input("📝 السبب/الوصف")
-            
-            if st.form_submit_button("✅ تسجيل", type="primary", use_container_width=True):
-                if amt > 0:
-                    run_query(
-                        "INSERT INTO public.expenses (amount, reason, category, date) VALUES (%s, %s, %s, %s)", 
-                        (amt, rsn, category, get_time()), commit=True, fetch=False
-                    )
-                    st.toast("✅ تم تسجيل المصروف", icon="✅")
-                    st.rerun()
-                else:
-                    st.error("❌ أدخل مبلغاً صحيحاً")
-    
-    with col_summary:
-        st.markdown("#### 📊 ملخص المصاريف")
-        df_exp = get_expenses()
-        
-        if df_exp is not None and not df_exp.empty:
-            df_exp['date'] = pd.to_datetime(df_exp['date'])
-            today = pd.Timestamp.now().normalize()
-            month_start = today.replace(day=1)
-            
-            monthly = df_exp[df_exp['date'] >= month_start]['amount'].sum()
-            total = df_exp['amount'].sum()
-            
-            st.metric("هذا الشهر", f"{monthly:,.0f} د.ع")
-            st.metric("الإجمالي الكلي", f"{total:,.0f} د.ع")
-            
-            # Export
-            csv = df_exp.to_csv(index=False).encode('utf-8-sig')
-            st.download_button("📥 تصدير المصاريف", csv, "expenses.csv", "text/csv")
-        else:
-            st.info("لا توجد مصاريف مسجلة")
-    
-    # سجل المصاريف
-    st.divider()
-    st.markdown("#### 📜 سجل المصاريف")
-    df_exp = get_expenses()
-    if df_exp is not None and not df_exp.empty:
-        st.dataframe(
-            df_exp.head(20),
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "id": None,
-                "amount": st.column_config.NumberColumn("المبلغ", format="%d د.ع"),
-                "reason": st.column_config.TextColumn("السبب"),
-                "category": st.column_config.TextColumn("التصنيف"),
-                "date": st.column_config.DatetimeColumn("التاريخ", format="D MMM YYYY - h:mm a"),
-            }
-        )
-    else:
-        st.info("📭 لا توجد مصاريف مسجلة")
-
-# ==========================================
-# صفحة 6: السجل والرواجع
-# ==========================================
-elif page == "📜 السجل":
-    st.markdown("## 📜 سجل العمليات")
-    
-    df_sales_log = get_sales(100)
-    
-    if df_sales_log is not None and not df_sales_log.empty:
-        st.dataframe(
-            df_sales_log,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "id": st.column_config.NumberColumn("رقم"),
-                "product_name": st.column_config.TextColumn("المنتج"),
-                "qty": st.column_config.NumberColumn("الكمية"),
-                "total": st.column_config.NumberColumn("المبلغ", format="%d د.ع"),
-                "profit": st.column_config.NumberColumn("الربح", format="%d د.ع"),
-                "date": st.column_config.DatetimeColumn("التاريخ", format="D MMM - h:mm a"),
-                "invoice_id": st.column_config.TextColumn("الفاتورة"),
-                "delivery_duration": st.column_config.TextColumn("التوصيل"),
-                "customer_id": None,
-                "variant_id": None,
-            }
-        )
-    else:
-        st.info("📭 لا توجد عمليات مسجلة")
-    
-    st.divider()
-    st.markdown("### ↩️ إرجاع منتج")
-    
-    with st.form("return_form"):
-        ret_id = st.number_input("أدخل رقم العملية (ID) للإرجاع:", min_value=1, step=1)
-        submitted = st.form_submit_button("🔍 بحث عن العملية")
-        
-        if submitted and df_sales_log is not None:
-            sale_rec = df_sales_log[df_sales_log['id'] == ret_id]
-            if not sale_rec.empty:
-                r = sale_rec.iloc[0]
-                st.session_state.return_sale = r.to_dict()
-                st.session_state.show_return_confirm = True
-            else:
-                st.error("❌ رقم العملية غير صحيح")
-    
-    # تأكيد الإرجاع (خارج الفورم لتجنب مشكلة الأزرار المتداخلة)
-    if st.session_state.get('show_return_confirm') and st.session_state.get('return_sale'):
-        r = st.session_state.return_sale
-        st.warning(f"⚠️ هل أنت متأكد من إرجاع: **{r['product_name']}** (العدد: {r['qty']})؟")
-        
-        col_yes, col_no = st.columns(2)
-        with col_yes:
-            if st.button("✅ تأكيد الإرجاع", type="primary", use_container_width=True):
-                with st.spinner("جاري المعالجة..."):
-                    # إرجاع للمخزن
-                    run_query(
-                        "UPDATE public.variants SET stock = stock + %s WHERE id = %s", 
-                        (int(r['qty']), int(r['variant_id'])), commit=True, fetch=False
-                    )
-                    # تسجيل المرتجع
-                    run_query(
-                        "INSERT INTO public.returns (sale_id, product_name, qty, return_amount, return_date, status) VALUES (%s,%s,%s,%s,%s,%s)",
-                        (int(r['id']), r['product_name'], int(r['qty']), float(r['total']), get_time(), 'Returned'), 
-                        commit=True, fetch=False
-                    )
-                    # تسجيل كمصروف
-                    run_query(
-                        "INSERT INTO public.expenses (amount, reason, category, date) VALUES (%s, %s, %s, %s)", 
-                        (float(r['total']), f"مرتجع فاتورة #{r['id']}", "مرتجعات", get_time()), 
-                        commit=True, fetch=False
-                    )
-                    
-                    clear_all_cache()
-                    del st.session_state.show_return_confirm
-                    del st.session_state.return_sale
-                    st.success("✅ تمت عملية الإرجاع بنجاح")
-                    time.sleep(1)
-                    st.rerun()
-        
-        with col_no:
-            if st.button("❌ إلغاء", use_container_width=True):
-                del st.session_state.show_return_confirm
-                del st.session_state.return_sale
-                st.rerun()
+# قياس زمن إعادة تشغيل الصفحة كاملة (للمقارنة مع أزمنة الأجزاء عند ?perf=1)
+st.session_state.setdefault('perf', {})['full_rerun'] = (time.perf_counter() - _run_started) * 1000
+if perf_enabled():
+    with st.sidebar:
+        for label, ms in st.session_state.perf.items():
+            st.caption(f"⏱️ {label}: {ms:.1f} ms")
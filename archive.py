@@ -0,0 +1,165 @@
+"""Cold-history archival: move closed months out of the hot tables into Parquet.
+
+Months older than the configured age are written to compressed Parquet
+(archive/<table>/<YYYY-MM>.parquet), their totals are recorded in
+public.archive_log, and only then are they removed from the live database
+(partitions are detached and dropped, anything else is deleted by range).
+
+    python archive.py --months 12
+"""
+import argparse
+import glob
+import os
+
+import pandas as pd
+import psycopg2
+import streamlit as st
+
+from database import get_db_connection, run_query, clear_all_cache, register_table_cache, SALES_DTYPES, EXPENSES_DTYPES
+
+DEFAULT_ARCHIVE_DIR = "archive"
+DEFAULT_MAX_AGE_MONTHS = 12
+
+# table -> date column, amount column, profit column (or None), declared dtypes
+ARCHIVE_TABLES = {
+    "sales": ("date", "total", "profit", SALES_DTYPES),
+    "expenses": ("date", "amount", None, EXPENSES_DTYPES),
+    "returns": ("return_date", "return_amount", None, None),
+}
+
+def archive_dir():
+    """Archive root from the [archive] secrets section (./archive by default)"""
+    try:
+        return st.secrets["archive"]["path"]
+    except (KeyError, FileNotFoundError):
+        return DEFAULT_ARCHIVE_DIR
+
+def _month_file(table, month):
+    return os.path.join(archive_dir(), table, f"{month:%Y-%m}.parquet")
+
+def closed_months(table, max_age_months=DEFAULT_MAX_AGE_MONTHS):
+    """First day of every month in `table` older than `max_age_months` full months"""
+    date_col = ARCHIVE_TABLES[table][0]
+    df = run_query(
+        f"""SELECT DISTINCT date_trunc('month', {date_col})::date AS month FROM public.{table}
+            WHERE {date_col} < date_trunc('month', now()) - make_interval(months => %s)
+            ORDER BY month""",
+        (max_age_months,),
+    )
+    return [] if df is None else list(df['month'])
+
+def _write_parquet(table, month, df):
+    path = _month_file(table, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        # A previous run may have written the file but failed before deleting the rows
+        df = pd.concat([pd.read_parquet(path), df], ignore_index=True).drop_duplicates('id', keep='last')
+    # Nullable strings keep NULLs as nulls (astype(str) would write 'nan'); files from
+    # different runs then share one column type
+    for col in df.select_dtypes('category').columns:
+        df[col] = df[col].astype("string")
+    tmp = f"{path}.tmp"
+    df.to_parquet(tmp, compression="zstd", index=False)
+    os.replace(tmp, path)
+    return path
+
+def archive_month(table, month):
+    """Archive one month of `table`; returns the number of rows moved"""
+    date_col, amount_col, profit_col, dtypes = ARCHIVE_TABLES[table]
+    start = pd.Timestamp(month).date()
+    end = (pd.Timestamp(month) + pd.DateOffset(months=1)).date()
+    rng = f"{date_col} >= %s AND {date_col} < %s"
+
+    df = run_query(f"SELECT * FROM public.{table} WHERE {rng}", (start, end), dtypes=dtypes)
+    if df is None:
+        raise RuntimeError(f"could not read {table} for {start:%Y-%m}")
+    if df.empty:
+        return 0
+    path = _write_parquet(table, month, df)
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as c:
+            # Capture the period's totals before the rows leave the database
+            c.execute(
+                """INSERT INTO public.archive_log (table_name, month, row_count, amount, profit, file_path, archived_at)
+                   VALUES (%s, %s, %s, %s, %s, %s, now())
+                   ON CONFLICT (table_name, month) DO UPDATE SET
+                       row_count = archive_log.row_count + EXCLUDED.row_count,
+                       amount = archive_log.amount + EXCLUDED.amount,
+                       profit = archive_log.profit + EXCLUDED.profit,
+                       file_path = EXCLUDED.file_path, archived_at = EXCLUDED.archived_at""",
+                (table, start, len(df), float(df[amount_col].sum()),
+                 float(df[profit_col].sum()) if profit_col else 0.0, path),
+            )
+            part = f"public.{table}_{start:%Y_%m}"
+            c.execute(
+                "SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s) AND inhparent = to_regclass(%s)",
+                (part, f"public.{table}"),
+            )
+            if c.fetchone():
+                c.execute(f"ALTER TABLE public.{table} DETACH PARTITION {part}")
+                c.execute(f"DROP TABLE {part}")
+            # Rows of that month outside its partition (default partition / plain table)
+            c.execute(f"DELETE FROM public.{table} WHERE {rng}", (start, end))
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    return len(df)
+
+def archive_old_periods(max_age_months=DEFAULT_MAX_AGE_MONTHS):
+    """Archive every closed month older than `max_age_months`; returns {(table, month): rows}"""
+    moved = {}
+    for table in ARCHIVE_TABLES:
+        for month in closed_months(table, max_age_months):
+            moved[(table, month)] = archive_month(table, month)
+    if moved:
+        clear_all_cache()
+    return moved
+
+# --- Read path ---
+
+def archived_files(table, since=None):
+    files = sorted(glob.glob(os.path.join(archive_dir(), table, "*.parquet")))
+    if since is not None:
+        files = [f for f in files if os.path.basename(f)[:7] >= f"{since:%Y-%m}"]
+    return files
+
+def iter_archived(table, since=None):
+    """Yield archived rows of `table` one month (one file) at a time"""
+    for path in archived_files(table, since):
+        yield pd.read_parquet(path)
+
+def read_archived(table, since=None):
+    """All archived rows of `table` as one frame (None when nothing is archived)"""
+    frames = list(iter_archived(table, since))
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_archived_totals(table):
+    """Totals captured for archived months of `table` (no Parquet reads)"""
+    df = run_query(
+        """SELECT COALESCE(SUM(row_count), 0) AS row_count, COALESCE(SUM(amount), 0) AS amount,
+                  COALESCE(SUM(profit), 0) AS profit
+           FROM public.archive_log WHERE table_name = %s""",
+        (table,),
+    )
+    if df is None or df.empty:
+        return {"row_count": 0, "amount": 0.0, "profit": 0.0}
+    row = df.iloc[0]
+    return {"row_count": int(row["row_count"]), "amount": float(row["amount"]), "profit": float(row["profit"])}
+
+register_table_cache(get_archived_totals, ARCHIVE_TABLES)
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive closed months to Parquet")
+    parser.add_argument("--months", type=int, default=DEFAULT_MAX_AGE_MONTHS,
+                        help="keep this many full months in the live tables")
+    args = parser.parse_args()
+    for (table, month), rows in archive_old_periods(args.months).items():
+        print(f"{table:<9} {month:%Y-%m}: {rows} rows archived")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Rerun cost of the POS page: the full script vs. the sale fragment.
+
+Drives app.py headlessly with streamlit's AppTest against a throwaway SQLite
+database seeded with `--variants` products, and reads the timings the app
+records in session state (the same numbers ?perf=1 shows). `full_rerun` is
+what an interaction cost when it triggered st.rerun(); `sale` is what it
+costs now that the cart is updated inside the fragment.
+
+    python benchmarks/bench_pos_rerun.py --variants 2000 --repeat 20
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _seed(path, variants):
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO variants (name, color, size, stock, cost, price, sku) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(f"Dress {i}", f"Color {i % 12}", "M", 1000, 10000.0, 15000.0, f"SKU{i:06d}") for i in range(variants)],
+    )
+    db.commit()
+    db.close()
+
+
+def _timings(at):
+    perf = at.session_state["perf"]
+    return perf["full_rerun"], perf["sale"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.join(tmp, "bench.sqlite3")
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.secrets["database"] = {"backend": "sqlite", "path": db_path}
+    at.secrets["cache"] = {"backend": "memory"}
+    at.secrets["journal"] = {"path": os.path.join(tmp, "journal.sqlite3")}
+    at.run()  # creates the schema
+    _seed(db_path, args.variants)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at.run()  # warms the caches with the seeded inventory
+
+    results = {"scan": [], "select + add": [], "delete": []}
+    for i in range(args.repeat):
+        at.text_input(key="pos_scan").input(f"SKU{i:06d}").run()
+        results["scan"].append(_timings(at))
+        at.selectbox(key="pos_selection").select(f"Dress {i} | Color {i % 12} (M)").run()
+        next(b for b in at.button if b.label == "➕ إضافة للسلة").click().run()
+        results["select + add"].append(_timings(at))
+        at.button(key="del_0").click().run()
+        results["delete"].append(_timings(at))
+
+    print(f"{args.variants} variants, {args.repeat} runs, median ms")
+    print(f"{'interaction':<14} {'full rerun':>11} {'sale fragment':>14}")
+    for label, runs in results.items():
+        full = statistics.median(r[0] for r in runs)
+        sale = statistics.median(r[1] for r in runs)
+        print(f"{label:<14} {full:>11.1f} {sale:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
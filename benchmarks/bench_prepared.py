@@ -0,0 +1,103 @@
+"""Per-sale latency: plain text statements vs. prepared statements.
+
+Replays the checkout statements (customer insert, invoice header, customer
+stats, stock decrements, sale lines, ledger movements) against a real database. Every simulated sale is rolled back, so the
+data is left untouched.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_prepared.py --sales 200 --lines 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import execute_batch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import HOT_STATEMENTS, _plain_sql, _plain_params  # noqa: E402
+
+
+def _sale_rows(variant_id, invoice_ref, lines):
+    now = datetime.now()
+    stock_rows = [(0, variant_id)] * lines
+    sales_rows = [
+        (None, variant_id, "bench", 1, 1000.0, 100.0, now, str(invoice_ref), "24 ساعة", 0.0, invoice_ref)
+    ] * lines
+    return stock_rows, sales_rows
+
+
+def _run(conn, variant_id, sales, lines, prepared):
+    with conn.cursor() as cur:
+        if prepared:
+            for name, (arg_types, body) in HOT_STATEMENTS.items():
+                cur.execute(f"PREPARE {name} {arg_types} AS {body}")
+            conn.commit()
+
+        def stmt(name, n):
+            if prepared:
+                return f"EXECUTE {name} ({', '.join(['%s'] * n)})"
+            return _plain_sql(name)
+
+        def args(params):
+            return params if prepared else _plain_params(params)
+
+        def rows(batch):
+            return batch if prepared else [_plain_params(row) for row in batch]
+
+        timings = []
+        for _ in range(sales):
+            start = time.perf_counter()
+            cur.execute(stmt("customer_insert", 4), args(("bench", "", "", "bench")))
+            cust_id = cur.fetchone()[0]
+            cur.execute(stmt("invoice_insert", 9), args((cust_id, datetime.now(), 0.0, 0.0, "24 ساعة", lines, 0.0, 0.0, None)))
+            invoice_ref = cur.fetchone()[0]
+            cur.execute(stmt("customer_stats_upsert", 5), args((cust_id, lines, 0.0, 0.0, datetime.now())))
+            stock_rows, sales_rows = _sale_rows(variant_id, invoice_ref, lines)
+            execute_batch(cur, stmt("stock_decrement", 2), rows(stock_rows), page_size=lines)
+            execute_batch(cur, stmt("sales_insert", 11), rows(sales_rows), page_size=lines)
+            movement_rows = [(variant_id, -1, "sale", invoice_ref, datetime.now())] * lines
+            execute_batch(cur, stmt("movement_insert", 5), rows(movement_rows), page_size=lines)
+            timings.append(time.perf_counter() - start)
+            conn.rollback()
+
+        if prepared:
+            cur.execute("DEALLOCATE ALL")
+            conn.commit()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--sales", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=3, help="cart lines per sale")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("pass --dsn or set DATABASE_URL")
+
+    conn = psycopg2.connect(args.dsn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM public.variants LIMIT 1")
+        row = cur.fetchone()
+    conn.rollback()
+    variant_id = row[0] if row else 0
+
+    results = {}
+    for label, prepared in (("plain", False), ("prepared", True)):
+        _run(conn, variant_id, 10, args.lines, prepared)  # warm up
+        results[label] = _run(conn, variant_id, args.sales, args.lines, prepared)
+    conn.close()
+
+    for label, timings in results.items():
+        ms = [t * 1000 for t in timings]
+        print(f"{label:>9}: median {statistics.median(ms):7.2f} ms  "
+              f"p95 {sorted(ms)[int(len(ms) * 0.95) - 1]:7.2f} ms")
+    saving = statistics.median(results["plain"]) - statistics.median(results["prepared"])
+    print(f"   saving: {saving * 1000:7.2f} ms per sale")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Import-time cost of the app shell and of each page.
+
+Each entry runs in a fresh interpreter, so the numbers are cold-start costs:
+the shell (app.py's imports) is paid on every rerun of every page, a page's
+own imports only when that page is opened.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _imports_of(path):
+    """Top-level import statements of a script, as source lines"""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def _time_imports(lines, preload=()):
+    """Seconds spent executing `lines` in a fresh interpreter after `preload`"""
+    code = "\n".join([
+        *preload,
+        "import time",
+        "_t = time.perf_counter()",
+        *lines,
+        "print(time.perf_counter() - _t)",
+    ])
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    shell = _imports_of(os.path.join(ROOT, "app.py"))
+    rows = [("app shell", shell, ())]
+    views_dir = os.path.join(ROOT, "views")
+    for name in sorted(os.listdir(views_dir)):
+        if name.endswith(".py"):
+            # Pages run after the shell, so only their extra imports count
+            rows.append((f"views/{name}", _imports_of(os.path.join(views_dir, name)), shell))
+
+    print(f"{'target':<24} {'median ms':>10} {'min ms':>8}")
+    for label, lines, preload in rows:
+        runs = [_time_imports(lines, preload) * 1000 for _ in range(args.repeat)]
+        print(f"{label:<24} {statistics.median(runs):>10.1f} {min(runs):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
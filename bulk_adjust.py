@@ -0,0 +1,139 @@
+"""Bulk price / cost / stock adjustments applied in one transaction with an undo record."""
+import json
+
+import streamlit as st
+
+from database import (get_db_connection, get_backend, is_postgres, log_movements, run_query,
+                      register_table_cache, get_time, DB_ERRORS)
+
+ADJUST_FIELDS = ("price", "cost", "stock")
+ADJUST_MODES = ("pct", "abs")
+
+def _where(filters):
+    """SQL filter over variants `o` from {models, colors, sizes, stock_min, stock_max}"""
+    clauses, params = [], []
+    for key, col in (("models", "name"), ("colors", "color"), ("sizes", "size")):
+        if filters.get(key):
+            values = list(filters[key])
+            clauses.append(f"o.{col} IN ({', '.join(['%s'] * len(values))})")
+            params.extend(values)
+    if filters.get("stock_min") is not None:
+        clauses.append("o.stock >= %s")
+        params.append(int(filters["stock_min"]))
+    if filters.get("stock_max") is not None:
+        clauses.append("o.stock <= %s")
+        params.append(int(filters["stock_max"]))
+    return " AND ".join(clauses) or "TRUE", params
+
+def _locked(sql):
+    """Row locks on Postgres; SQLite already holds the write lock from the transaction's first write"""
+    return f"{sql} FOR UPDATE" if is_postgres() else sql
+
+def _batch(cur, sql, rows):
+    if rows:
+        get_backend().execute_batch(cur, sql, rows)
+
+def _new_value(field, mode):
+    """Expression for the adjusted value of `o.<field>`; takes the amount as one parameter"""
+    if field not in ADJUST_FIELDS or mode not in ADJUST_MODES:
+        raise ValueError(f"unsupported adjustment {field}/{mode}")
+    expr = f"o.{field} * (1 + %s / 100.0)" if mode == "pct" else f"o.{field} + %s"
+    # Prices are whole dinars and stock whole pieces; nothing goes below zero
+    expr = f"GREATEST(0, ROUND(({expr})::numeric))"
+    return f"{expr}::integer" if field == "stock" else f"{expr}::real"
+
+def preview_adjustment(filters, field, mode, amount):
+    """Matching variants with their current and adjusted values (nothing is written)"""
+    where, params = _where(filters)
+    return run_query(
+        f"""SELECT o.id, o.name, o.color, o.size, o.{field} AS old_value, {_new_value(field, mode)} AS new_value
+            FROM public.variants o WHERE {where} ORDER BY o.name, o.color, o.size""",
+        [amount] + params,
+    )
+
+def apply_adjustment(filters, field, mode, amount):
+    """Apply the adjustment in one transaction with its undo rows; returns (adjustment id, rows changed)"""
+    where, params = _where(filters)
+    now = get_time()
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute(
+                """INSERT INTO public.bulk_adjustments (field, mode, amount, filters, created_at)
+                   VALUES (%s, %s, %s, %s, %s) RETURNING id""",
+                (field, mode, amount, json.dumps(filters, ensure_ascii=False), now),
+            )
+            adj_id = c.fetchone()[0]
+            c.execute(
+                _locked(f"SELECT o.id, o.{field}, {_new_value(field, mode)} FROM public.variants o WHERE {where}"),
+                [amount] + params,
+            )
+            changed = c.fetchall()
+            _batch(c, f"UPDATE public.variants SET {field} = %s WHERE id = %s",
+                   [(new, vid) for vid, old, new in changed if new != old])
+            _batch(c, """INSERT INTO public.bulk_adjustment_items (adjustment_id, variant_id, old_value, new_value)
+                         VALUES (%s, %s, %s, %s)""",
+                   [(adj_id, vid, old, new) for vid, old, new in changed])
+            # Stock changes also go to the ledger, in the same transaction
+            if field == "stock":
+                log_movements(c, [(vid, new - old, "adjust", adj_id, now) for vid, old, new in changed])
+            rows = len(changed)
+            c.execute("UPDATE public.bulk_adjustments SET row_count = %s WHERE id = %s", (rows, adj_id))
+        conn.commit()
+    except DB_ERRORS:
+        conn.rollback()
+        raise
+    return adj_id, rows
+
+def undo_adjustment(adj_id):
+    """Revert an adjustment; returns (rows restored, rows skipped).
+
+    Price and cost go back to their old values only where the variant still
+    holds the adjusted value; rows changed since (by a later adjustment or an
+    edit) are skipped. Stock is reverted by the applied delta, so sales made
+    since the adjustment are kept.
+    """
+    now = get_time()
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute(
+                _locked("SELECT field FROM public.bulk_adjustments WHERE id = %s AND undone_at IS NULL"),
+                (adj_id,),
+            )
+            row = c.fetchone()
+            if row is None or row[0] not in ADJUST_FIELDS:
+                conn.rollback()
+                return 0, 0
+            field = row[0]
+            c.execute(
+                _locked(f"""SELECT v.id, v.{field}, i.old_value, i.new_value
+                            FROM public.bulk_adjustment_items i JOIN public.variants v ON v.id = i.variant_id
+                            WHERE i.adjustment_id = %s"""),
+                (adj_id,),
+            )
+            items = c.fetchall()
+            if field == "stock":
+                restored = [(vid, cur, max(0, cur - int(new - old))) for vid, cur, old, new in items]
+                log_movements(c, [(vid, value - cur, "adjust_undo", adj_id, now) for vid, cur, value in restored])
+            else:
+                restored = [(vid, cur, old) for vid, cur, old, new in items if cur == new]
+            _batch(c, f"UPDATE public.variants SET {field} = %s WHERE id = %s",
+                   [(value, vid) for vid, cur, value in restored if value != cur])
+            c.execute("UPDATE public.bulk_adjustments SET undone_at = %s WHERE id = %s", (now, adj_id))
+        conn.commit()
+    except DB_ERRORS:
+        conn.rollback()
+        raise
+    return len(restored), len(items) - len(restored)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_adjustments(limit=20):
+    """Most recent bulk adjustments, newest first"""
+    return run_query(
+        """SELECT id, created_at, field, mode, amount, row_count, undone_at
+           FROM public.bulk_adjustments ORDER BY id DESC LIMIT %s""",
+        (limit,),
+    )
+
+register_table_cache(get_adjustments, ("variants",))
@@ -0,0 +1,273 @@
+"""Shared cross-process cache tier for the database readers.
+
+Keys carry `CACHE_FORMAT_VERSION` and a per-table generation token that is
+replaced on every change, so stale entries are never read, only left to
+expire. Disk and memory backends sweep expired entries on write and cap
+their size; Redis expires them itself. Payloads are HMAC-signed with the
+backend's secret and unsigned or tampered ones read as a miss, so a shared
+store can't feed the app arbitrary pickles. Backends store bytes and treat
+their own I/O errors as a cache miss.
+"""
+import collections
+import hashlib
+import hmac
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+import uuid
+
+CACHE_FORMAT_VERSION = 2
+DEFAULT_DISK_PATH = os.path.join(tempfile.gettempdir(), "boutique-cache")
+DEFAULT_DISK_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MEMORY_MAX_ENTRIES = 256
+SWEEP_INTERVAL = 300          # seconds between expiry sweeps of the disk / memory backends
+_GEN_PREFIX = "gen:"
+
+# Disk entry header: magic + expiry (0 = never), so a sweep reads 11 bytes per file
+_DISK_HEADER = struct.Struct("<3sd")
+_DISK_MAGIC = b"BC2"
+_SECRET_FILE = ".secret"
+
+
+class DiskCache:
+    """Files under one directory, shared by every replica on the host.
+
+    Every `sweep_interval` seconds a write also deletes expired entries and,
+    past `max_bytes`, the least recently written ones. Entries without a TTL
+    (generation tokens) are never evicted.
+    """
+
+    def __init__(self, path=DEFAULT_DISK_PATH, secret=None, max_bytes=DEFAULT_DISK_MAX_BYTES,
+                 sweep_interval=SWEEP_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0
+        os.makedirs(path, exist_ok=True)
+        self.secret = secret or self._shared_secret()
+
+    def _shared_secret(self):
+        """Signing key kept next to the entries (owner-only), created by the first replica"""
+        key_file = os.path.join(self.path, _SECRET_FILE)
+        try:
+            fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(key_file, "rb") as f:
+                return f.read()
+        with os.fdopen(fd, "wb") as f:
+            secret = os.urandom(32)
+            f.write(secret)
+        return secret
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._file(key), "rb") as f:
+                magic, expires_at = _DISK_HEADER.unpack(f.read(_DISK_HEADER.size))
+                if magic != _DISK_MAGIC:
+                    return None
+                if expires_at and expires_at < time.time():
+                    expired = True
+                else:
+                    return f.read()
+        except (OSError, struct.error):
+            return None
+        if expired:
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+        return None
+
+    def set(self, key, payload, ttl=None):
+        expires_at = time.time() + ttl if ttl else 0.0
+        # Write-then-rename so readers never see a half-written entry
+        tmp = f"{self._file(key)}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_DISK_HEADER.pack(_DISK_MAGIC, expires_at))
+                f.write(payload)
+            os.replace(tmp, self._file(key))
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        if time.time() >= self._next_sweep:
+            self._next_sweep = time.time() + self.sweep_interval
+            self.sweep()
+
+    def sweep(self):
+        """Delete expired, unreadable and leftover temp entries, then the oldest past `max_bytes`; returns files removed"""
+        now = time.time()
+        removed = 0
+        live = []
+        try:
+            entries = list(os.scandir(self.path))
+        except OSError:
+            return 0
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                info = entry.stat()
+                if entry.name.endswith(".tmp"):
+                    # a writer that died between write and rename
+                    stale = info.st_mtime < now - self.sweep_interval
+                else:
+                    with open(entry.path, "rb") as f:
+                        magic, expires_at = _DISK_HEADER.unpack(f.read(_DISK_HEADER.size))
+                    stale = magic != _DISK_MAGIC or (expires_at and expires_at < now)
+                    if not stale and expires_at:
+                        live.append((info.st_mtime, info.st_size, entry.path))
+                if stale:
+                    os.remove(entry.path)
+                    removed += 1
+            except (OSError, struct.error):
+                # unreadable header (e.g. an older format): drop it, or skip if it is already gone
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError:
+                    pass
+        total = sum(size for _, size, _ in live)
+        for _, size, path in sorted(live):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+        return removed
+
+
+class MemoryCache:
+    """In-process stand-in with the same interface (single replica, local runs).
+
+    Holds at most `max_entries` entries with a TTL, least recently used
+    evicted first; expired ones are swept every `sweep_interval` seconds.
+    """
+
+    def __init__(self, secret=None, max_entries=DEFAULT_MEMORY_MAX_ENTRIES, sweep_interval=SWEEP_INTERVAL):
+        self.secret = secret or os.urandom(32)
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0
+        self._data = collections.OrderedDict()
+        self._pinned = {}   # entries without a TTL (generation tokens), never evicted
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._pinned:
+                return self._pinned[key]
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return payload
+
+    def set(self, key, payload, ttl=None):
+        with self._lock:
+            if not ttl:
+                self._pinned[key] = payload
+                return
+            now = time.time()
+            self._data[key] = (now + ttl, payload)
+            self._data.move_to_end(key)
+            if now >= self._next_sweep:
+                self._next_sweep = now + self.sweep_interval
+                for stale in [k for k, (expires_at, _) in self._data.items() if expires_at < now]:
+                    del self._data[stale]
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class RedisCache:
+    """Any Redis-compatible server; pass `client` to use a stand-in such as fakeredis"""
+
+    def __init__(self, url=None, client=None, prefix="boutique:", secret=None):
+        if not secret:
+            # Every replica must share it; a per-process key would make all entries misses
+            raise ValueError("the redis cache backend needs a `secret` to sign entries")
+        if client is None:
+            # Imported on demand so disk/memory deployments never pay for it
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.secret = secret
+
+    def get(self, key):
+        try:
+            return self.client.get(self.prefix + key)
+        except Exception:
+            return None
+
+    def set(self, key, payload, ttl=None):
+        try:
+            self.client.set(self.prefix + key, payload, ex=int(ttl) if ttl else None)
+        except Exception:
+            pass
+
+
+def make_backend(cfg):
+    """Build the backend described by the [cache] secrets section (None disables it)"""
+    kind = cfg.get("backend", "disk")
+    secret = cfg.get("secret")
+    secret = secret.encode("utf-8") if isinstance(secret, str) else secret
+    if kind == "disk":
+        return DiskCache(cfg.get("path", DEFAULT_DISK_PATH), secret,
+                         int(cfg.get("max_mb", DEFAULT_DISK_MAX_BYTES // (1024 * 1024))) * 1024 * 1024)
+    if kind == "redis":
+        return RedisCache(cfg["url"], secret=secret)
+    if kind == "memory":
+        return MemoryCache(secret, int(cfg.get("max_entries", DEFAULT_MEMORY_MAX_ENTRIES)))
+    if kind == "none":
+        return None
+    raise ValueError(f"unknown cache backend: {kind}")
+
+
+def get_generation(backend, table):
+    payload = backend.get(_GEN_PREFIX + table)
+    return payload.decode("utf-8") if payload else "0"
+
+
+def bump_generation(backend, table, token=None):
+    """Mark every cached entry built from `table` as outdated"""
+    token = token or uuid.uuid4().hex
+    backend.set(_GEN_PREFIX + table, str(token).encode("utf-8"))
+
+
+def frame_key(name, args, kwargs, backend, tables):
+    generations = ",".join(f"{t}={get_generation(backend, t)}" for t in tables)
+    call = repr((args, sorted(kwargs.items())))
+    return f"v{CACHE_FORMAT_VERSION}:{name}:{call}:{generations}"
+
+
+def _signature(secret, body):
+    return hmac.new(secret, body, hashlib.sha256).digest()
+
+
+def dumps(frame, secret):
+    body = pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+    return _signature(secret, body) + body
+
+
+def loads(payload, secret):
+    """Unpickle a payload signed by `dumps`; None (a miss) when the signature does not match"""
+    mac, body = payload[:32], payload[32:]
+    if not hmac.compare_digest(mac, _signature(secret, body)):
+        return None
+    return pickle.loads(body)
@@ -0,0 +1,35 @@
+"""Model-level reads keyed by the integer product/color dimensions.
+
+variants.product_id / color_id and sales.product_id reference
+public.products and public.colors (kept in step by the catalog_keys
+trigger), so model grouping and rankings are indexed integer joins.
+"""
+import streamlit as st
+
+from database import run_query, register_table_cache
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_model_summary():
+    """Stock, distinct colors and sale value per model"""
+    return run_query(
+        """SELECT p.id AS product_id, p.name, SUM(v.stock) AS stock,
+                  COUNT(DISTINCT v.color_id) AS colors, SUM(v.stock * v.price) AS sale_value
+           FROM public.variants v JOIN public.products p ON p.id = v.product_id
+           GROUP BY p.id, p.name
+           ORDER BY p.name"""
+    )
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_top_products(limit=5, since=None):
+    """Best-selling models by quantity (all time, or since a date)"""
+    return run_query(
+        """SELECT p.name, SUM(s.qty) AS qty
+           FROM public.sales s JOIN public.products p ON p.id = s.product_id
+           WHERE %(since)s IS NULL OR s.date >= %(since)s
+           GROUP BY p.id, p.name
+           ORDER BY qty DESC LIMIT %(limit)s""",
+        {"since": since, "limit": limit},
+    )
+
+register_table_cache(get_model_summary, ("variants",))
+register_table_cache(get_top_products, ("sales",))
@@ -0,0 +1,218 @@
+"""Local durable checkout journal (SQLite in WAL mode) with background replay to Postgres.
+
+checkout_callback appends each sale here and prints the receipt at local
+disk latency. A worker thread then replays pending entries through
+database.replay_sale, which is idempotent by the entry's id
+(public.invoices.client_ref). A stalled or lost connection only delays
+the sync. Sales that oversold stock are recorded and kept here as
+conflicts for review. With the embedded SQLite backend the database is
+already on local disk, so save_checkout writes straight to it instead.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import psycopg2
+import streamlit as st
+
+from database import _connect_kwargs, replay_sale, record_sale, invalidate_tables, get_time, is_postgres
+
+DEFAULT_JOURNAL_PATH = os.path.join("journal", "checkout.sqlite3")
+REPLAY_INTERVAL = 5        # seconds between sweeps when nothing wakes the worker
+MAX_ATTEMPTS = 5           # entries failing with data errors this often wait for review
+KEEP_SYNCED_DAYS = 30
+REPLAYED_TABLES = ("variants", "sales", "customers", "invoices", "customer_stats")
+
+_wake = threading.Event()
+
+def journal_path():
+    """Journal file from the [journal] secrets section (./journal/checkout.sqlite3 by default)"""
+    try:
+        return st.secrets["journal"]["path"]
+    except (KeyError, FileNotFoundError):
+        return DEFAULT_JOURNAL_PATH
+
+@st.cache_resource(show_spinner=False)
+def _init_journal(path):
+    """Create the journal file and table once per process"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with closing(sqlite3.connect(path, timeout=10)) as db, db:
+        # WAL is a property of the file, so it only needs setting once
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""CREATE TABLE IF NOT EXISTS checkout_journal (
+            client_ref TEXT PRIMARY KEY, created_at TEXT, payload TEXT, status TEXT DEFAULT 'pending',
+            invoice_id TEXT, attempts INTEGER DEFAULT 0, error TEXT, conflicts TEXT
+        )""")
+    return True
+
+def _open():
+    path = journal_path()
+    _init_journal(path)
+    db = sqlite3.connect(path, timeout=10)
+    # WAL lets the worker read while tills append; FULL fsyncs every commit
+    db.execute("PRAGMA synchronous=FULL")
+    return db
+
+def _json_default(value):
+    # numpy scalars from DataFrame rows
+    return value.item() if hasattr(value, "item") else str(value)
+
+def receipt_number(client_ref):
+    """Number printed on the receipt at checkout, before Postgres has assigned an invoice id.
+
+    It is the start of the entry's client_ref, so `synced_invoice` finds the
+    invoice once the sale has been replayed.
+    """
+    return client_ref[:8].upper()
+
+def synced_invoice(receipt):
+    """Invoice id for a journaled receipt number (None while it is not synced yet)"""
+    with closing(_open()) as db:
+        row = db.execute(
+            "SELECT invoice_id FROM checkout_journal WHERE substr(client_ref, 1, 8) = ? AND invoice_id IS NOT NULL",
+            (receipt.lower(),),
+        ).fetchone()
+    return row[0] if row else None
+
+def journal_sale(customer, items, discount_pct=0, delivery_duration="24 ساعة"):
+    """Durably record one checkout locally and wake the replayer; returns the receipt number"""
+    client_ref = uuid.uuid4().hex
+    sold_at = get_time()
+    payload = json.dumps({
+        "customer": customer, "items": items, "discount_pct": discount_pct,
+        "delivery_duration": delivery_duration, "sold_at": sold_at.isoformat(),
+    }, ensure_ascii=False, default=_json_default)
+    with closing(_open()) as db, db:
+        db.execute(
+            "INSERT INTO checkout_journal (client_ref, created_at, payload) VALUES (?, ?, ?)",
+            (client_ref, sold_at.isoformat(), payload),
+        )
+    _wake.set()
+    return receipt_number(client_ref)
+
+def save_checkout(customer, items, discount_pct=0, delivery_duration="24 ساعة"):
+    """Record one checkout: journaled for Postgres, written directly to an embedded database"""
+    if is_postgres():
+        return journal_sale(customer, items, discount_pct, delivery_duration)
+    inv_id = record_sale(customer, items, discount_pct, delivery_duration)
+    invalidate_tables(REPLAYED_TABLES)
+    return inv_id
+
+def _mark(client_ref, status, **fields):
+    sets = ", ".join(f"{k} = ?" for k in fields)
+    with closing(_open()) as db, db:
+        db.execute(
+            f"UPDATE checkout_journal SET status = ?{', ' + sets if sets else ''} WHERE client_ref = ?",
+            (status, *fields.values(), client_ref),
+        )
+
+def _replay_pending(conn):
+    """Replay every pending entry once; returns True if anything reached Postgres"""
+    with closing(_open()) as db:
+        rows = db.execute(
+            """SELECT client_ref, payload, attempts FROM checkout_journal
+               WHERE status IN ('pending', 'failed') AND attempts < ? ORDER BY created_at""",
+            (MAX_ATTEMPTS,),
+        ).fetchall()
+    wrote = False
+    for client_ref, payload, attempts in rows:
+        try:
+            sale = json.loads(payload)
+            inv_id, shortfalls = replay_sale(
+                conn, client_ref, datetime.fromisoformat(sale["sold_at"]), sale["customer"],
+                sale["items"], sale["discount_pct"], sale["delivery_duration"],
+            )
+        except psycopg2.Error as e:
+            if conn.closed or isinstance(e, psycopg2.OperationalError):
+                raise  # connection trouble: keep pending, retry on a fresh connection
+            _mark(client_ref, "failed", attempts=attempts + 1, error=str(e))
+            continue
+        except Exception as e:
+            # A malformed entry or an unexpected error must not hold back the entries behind it
+            if not conn.closed:
+                conn.rollback()
+            _mark(client_ref, "failed", attempts=attempts + 1, error=f"{type(e).__name__}: {e}")
+            continue
+        _mark(client_ref, "conflict" if shortfalls else "synced", invoice_id=inv_id,
+              conflicts=json.dumps(shortfalls) if shortfalls else None, error=None)
+        wrote = True
+    return wrote
+
+def _purge_synced():
+    cutoff = (get_time() - timedelta(days=KEEP_SYNCED_DAYS)).isoformat()
+    with closing(_open()) as db, db:
+        db.execute("DELETE FROM checkout_journal WHERE status = 'synced' AND created_at < ?", (cutoff,))
+
+def _replay_loop(conn_kwargs):
+    backoff = 1
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**conn_kwargs)
+            while True:
+                if _replay_pending(conn):
+                    invalidate_tables(REPLAYED_TABLES)
+                _purge_synced()
+                backoff = 1
+                _wake.wait(REPLAY_INTERVAL)
+                _wake.clear()
+        except Exception:
+            # Connection loss, a locked or unwritable journal (sqlite3.Error) or a bug:
+            # back off and start over rather than let the daemon thread die
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+        finally:
+            if conn is not None and not conn.closed:
+                conn.close()
+
+@st.cache_resource
+def start_checkout_replayer():
+    """Start one background replay thread per process; returns it (or None if unconfigured)"""
+    try:
+        if not is_postgres():
+            return None
+        conn_kwargs = {"connect_timeout": 10, **_connect_kwargs()}
+    except KeyError:
+        return None
+    thread = threading.Thread(target=_replay_loop, args=(conn_kwargs,), name="checkout-replayer", daemon=True)
+    thread.start()
+    return thread
+
+def journal_status():
+    """Entry count per status (pending / synced / conflict / failed / reviewed)"""
+    with closing(_open()) as db:
+        return dict(db.execute("SELECT status, COUNT(*) FROM checkout_journal GROUP BY status").fetchall())
+
+def journal_problems():
+    """Entries needing attention: oversold conflicts and sales that keep failing"""
+    with closing(_open()) as db:
+        rows = db.execute(
+            """SELECT client_ref, created_at, status, invoice_id, attempts, error, conflicts, payload
+               FROM checkout_journal
+               WHERE status = 'conflict' OR (status = 'failed' AND attempts >= ?)
+               ORDER BY created_at""",
+            (MAX_ATTEMPTS,),
+        ).fetchall()
+    problems = []
+    for client_ref, created_at, status, invoice_id, attempts, error, conflicts, payload in rows:
+        names = {int(item["id"]): f"{item['name']} ({item.get('size', '')})" for item in json.loads(payload)["items"]}
+        problems.append({
+            "client_ref": client_ref, "receipt": receipt_number(client_ref), "created_at": created_at,
+            "status": status, "invoice_id": invoice_id, "error": error,
+            "shortfalls": [(names.get(vid, f"#{vid}"), qty, stock) for vid, qty, stock in json.loads(conflicts or "[]")],
+        })
+    return problems
+
+def acknowledge(client_ref):
+    """Mark a conflict as reviewed"""
+    _mark(client_ref, "reviewed")
+
+def retry(client_ref):
+    """Give a failed entry a fresh set of attempts"""
+    _mark(client_ref, "pending", attempts=0)
+    _wake.set()
@@ -1,17 +1,138 @@
 import streamlit as st
 import pandas as pd
 import psycopg2
-from psycopg2.extras import execute_values
+from psycopg2.extras import execute_batch
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from psycopg2 import errors as pg_errors
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import functools
+import importlib.util
+import io
+import itertools
 import pytz
+import cache_backend
+import db_backend
+import re
+import select
+import threading
+import time
+import uuid
+import weakref
+
+# pyarrow is only probed here; it is imported by pandas on the first columnar read
+_CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+
+# Shared cached frames are handed out as shallow views; copy-on-write keeps a
+# caller's edits (new columns, in-place casts) out of the process-wide copy.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Append-only tables range-partitioned by month on their date column
+PARTITIONED_TABLES = ("sales", "expenses")
+# Future monthly partitions kept ready ahead of the current month
+PARTITION_MONTHS_AHEAD = 3
+
+# Stock below this is flagged as running low
+LOW_STOCK_THRESHOLD = 3
+
+# Upper bound on concurrent connections used by batched reads
+POOL_MAX_CONN = 6
+# Seconds a pooled read waits for a free connection before giving up
+POOL_WAIT_TIMEOUT = 30
+
+# Rows per round trip / per yielded chunk for server-side cursor streaming
+STREAM_ITERSIZE = 5000
+
+# Declared column types for columnar (COPY-based) reads of the heavy tables.
+# Nullable integer dtypes because legacy rows may carry NULL ids/quantities.
+SALES_DTYPES = {
+    "id": "Int64", "customer_id": "Int64", "variant_id": "Int64",
+    "product_name": "category", "qty": "Int32", "total": "float64",
+    "profit": "float64", "date": "datetime64[ns]", "invoice_id": "category",
+    "delivery_duration": "category", "discount": "float64", "product_id": "Int32",
+}
+INVENTORY_DTYPES = {
+    "id": "int64", "name": "category", "color": "category", "size": "category",
+    "cost": "float64", "price": "float64", "stock": "int32",
+    "product_id": "Int32", "color_id": "Int32",
+}
+EXPENSES_DTYPES = {
+    "id": "Int64", "amount": "float64", "reason": "object",
+    "category": "category", "date": "datetime64[ns]",
+}
 
 # --- 2. Database Layer ---
 
+# Keys in [postgres] secrets that configure the app rather than libpq
+APP_OPTION_KEYS = ("prepared_statements",)
+
+def _connect_kwargs():
+    """libpq connection arguments from secrets (raises KeyError when missing)"""
+    cfg = dict(st.secrets["postgres"])
+    for key in APP_OPTION_KEYS:
+        cfg.pop(key, None)
+    return cfg
+
+# Errors raised by either backend (psycopg2 or sqlite3)
+DB_ERRORS = db_backend.DB_ERRORS
+UNIQUE_VIOLATIONS = db_backend.UNIQUE_VIOLATIONS
+
+@st.cache_resource
+def get_backend():
+    """Database backend from the [database] secrets section (Postgres unless backend = "sqlite")"""
+    try:
+        cfg = dict(st.secrets["database"])
+    except (KeyError, FileNotFoundError):
+        cfg = {}
+    return db_backend.make_backend(cfg, _connect_kwargs)
+
+def is_postgres():
+    return get_backend().name == "postgres"
+
 @st.cache_resource
 def get_db_connection():
     """Create a singleton connection"""
     try:
-        return psycopg2.connect(**st.secrets["postgres"])
+        return get_backend().connect()
+    except DB_ERRORS as e:
+        st.error(f"❌ Database connection error: {e}")
+        st.stop()
+    except KeyError:
+        st.error("❌ Database configuration not found in secrets.toml")
+        st.stop()
+
+class QueuedConnectionPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool whose getconn() waits for a free connection instead of raising PoolError.
+
+    Every session's batched reads and streamed exports share one pool, so
+    callers queue when all `maxconn` connections are checked out.
+    """
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=POOL_WAIT_TIMEOUT):
+            raise PoolError(f"no pooled connection free after {POOL_WAIT_TIMEOUT}s")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+@st.cache_resource
+def get_db_pool():
+    """Create a shared connection pool for concurrent reads"""
+    try:
+        return QueuedConnectionPool(1, POOL_MAX_CONN, **_connect_kwargs())
     except psycopg2.Error as e:
         st.error(f"❌ Database connection error: {e}")
         st.stop()
@@ -19,16 +140,179 @@ def get_db_connection():
         st.error("❌ Database configuration not found in secrets.toml")
         st.stop()
 
-def run_query(query, params=None, fetch=True, commit=False):
-    """Helper to execute queries safely"""
+def _fetch_columnar(cur, query, params, dtypes):
+    """COPY a query's result to a buffer and parse it straight into typed columns.
+
+    Skips the per-row Python tuples of `fetchall()`; numeric and timestamp
+    columns never pass through object dtype.
+    """
+    sql = cur.mogrify(query, params).decode("utf-8")
+    buf = io.BytesIO()
+    cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)", buf)
+    buf.seek(0)
+
+    if _CSV_ENGINE == "pyarrow":
+        return _apply_dtypes(_read_csv_pyarrow(buf, dtypes), dtypes)
+    typed = {c: t for c, t in dtypes.items() if not t.startswith("datetime64")}
+    return _apply_dtypes(pd.read_csv(buf, dtype=typed), dtypes)
+
+# Declared dtypes whose CSV text must stay text (never inferred as numbers)
+_TEXT_DTYPES = ("category", "object", "string", "str")
+
+def _read_csv_pyarrow(buf, dtypes):
+    """Parse COPY csv with pyarrow, keeping declared text columns as strings like the C engine"""
+    from pyarrow import csv as pa_csv, string as pa_string
+
+    options = pa_csv.ConvertOptions(
+        column_types={c: pa_string() for c, t in dtypes.items() if t in _TEXT_DTYPES},
+        # COPY writes NULL unquoted and '' quoted
+        strings_can_be_null=True, quoted_strings_can_be_null=False,
+    )
+    return pa_csv.read_csv(buf, convert_options=options).to_pandas()
+
+def _apply_dtypes(df, dtypes):
+    """Cast the declared columns that are present in `df`"""
+    for col, dtype in dtypes.items():
+        if col not in df.columns:
+            continue
+        if dtype.startswith("datetime64"):
+            df[col] = pd.to_datetime(df[col])
+        elif dtype.startswith("int") and df[col].isna().any():
+            df[col] = df[col].fillna(0).astype(dtype)
+        elif df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def _fetch_pooled(pool, query, params, dtypes=None):
+    """Run a single read query on a pooled connection (worker thread, no st.* calls)"""
+    conn = pool.getconn()
+    broken = False
+    try:
+        with conn.cursor() as cur:
+            if dtypes is not None:
+                df = _fetch_columnar(cur, query, params, dtypes)
+            else:
+                cur.execute(query, params)
+                df = None
+                if cur.description:
+                    col_names = [desc[0] for desc in cur.description]
+                    df = pd.DataFrame(cur.fetchall(), columns=col_names)
+        conn.rollback()  # end the read transaction, keep the connection clean
+        return df
+    except psycopg2.Error:
+        broken = conn.closed != 0
+        if not broken:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=broken)
+
+def run_queries(queries):
+    """Run independent read queries concurrently and return all frames together.
+
+    `queries` maps a name to either a SQL string or a `(sql, params)` /
+    `(sql, params, dtypes)` tuple; with dtypes the read is columnar. The result maps the same names to DataFrames (None for a failed query), so
+    the page waits for the slowest query instead of the sum of all of them.
+    """
+    jobs = {
+        name: (q, None, None) if isinstance(q, str) else (tuple(q) + (None,))[:3]
+        for name, q in queries.items()
+    }
+    if not jobs:
+        return {}
+    if not is_postgres():
+        # In-process database: nothing to overlap, one connection is fastest
+        return {name: run_query(sql, params, dtypes=dtypes) for name, (sql, params, dtypes) in jobs.items()}
+
+    pool = get_db_pool()
+    results = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=min(len(jobs), POOL_MAX_CONN)) as executor:
+        futures = {
+            name: executor.submit(_fetch_pooled, pool, sql, params, dtypes)
+            for name, (sql, params, dtypes) in jobs.items()
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except psycopg2.Error as e:
+                results[name] = None
+                errors.append(f"{name}: {e}")
+
+    # Report from the script thread, worker threads have no Streamlit context
+    for err in errors:
+        st.error(f"❌ Database error: {err}")
+    return results
+
+def stream_query(query, params=None, itersize=STREAM_ITERSIZE, dtypes=None):
+    """Yield a query's result as DataFrame chunks of at most `itersize` rows.
+
+    Uses a named (server-side) cursor on a pooled connection, so memory stays
+    bounded by one chunk however large the table grows. Raises psycopg2.Error
+    (sqlite3.Error on SQLite, which steps through the rows on its own connection).
+    """
+    if not is_postgres():
+        conn = get_backend().connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                while True:
+                    rows = cur.fetchmany(itersize)
+                    if not rows:
+                        break
+                    df = pd.DataFrame(rows, columns=[desc[0] for desc in cur.description])
+                    yield _apply_dtypes(df, dtypes) if dtypes else df
+        finally:
+            conn.close()
+        return
+
+    pool = get_db_pool()
+    conn = pool.getconn()
+    try:
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(itersize)
+                if not rows:
+                    break
+                df = pd.DataFrame(rows, columns=[desc[0] for desc in cur.description])
+                yield _apply_dtypes(df, dtypes) if dtypes else df
+    finally:
+        # Also runs when the consumer stops early; ends the read transaction
+        if not conn.closed:
+            conn.rollback()
+        pool.putconn(conn, close=bool(conn.closed))
+
+def export_csv(out, query, params=None, itersize=STREAM_ITERSIZE, leading_chunks=()):
+    """Stream a query as CSV (UTF-8 with BOM for Excel) into the binary file `out`, one chunk at a time.
+
+    `leading_chunks` (e.g. archived months) are written before the live rows.
+    Draws nothing, so it can run outside the script thread (deferred
+    downloads). Raises psycopg2.Error (sqlite3.Error on SQLite).
+    """
+    chunks = itertools.chain(leading_chunks, stream_query(query, params, itersize))
+    for i, chunk in enumerate(chunks):
+        out.write(chunk.to_csv(index=False, header=(i == 0)).encode('utf-8-sig' if i == 0 else 'utf-8'))
+    return out
+
+def run_query(query, params=None, fetch=True, commit=False, dtypes=None):
+    """Helper to execute queries safely.
+
+    Passing `dtypes` (column -> pandas dtype) switches to a columnar COPY fetch
+    that builds typed columns directly instead of going through `fetchall()`
+    (on SQLite the fetched frame is cast instead).
+    """
     conn = get_db_connection()
     try:
-        # Basic check if connection is alive (psycopg2 connection object has 'closed' attribute)
+        # Basic check if connection is alive (both backends' connections have 'closed')
         if conn.closed:
-            st.cache_resource.clear()
+            get_db_connection.clear()
             conn = get_db_connection()
             
         with conn.cursor() as cur:
+            if dtypes is not None and fetch and not commit and is_postgres():
+                return _fetch_columnar(cur, query, params, dtypes)
             cur.execute(query, params)
             if commit:
                 conn.commit()
@@ -37,31 +321,186 @@ def run_query(query, params=None, fetch=True, commit=False):
                 if cur.description:
                     col_names = [desc[0] for desc in cur.description]
                     data = cur.fetchall()
-                    return pd.DataFrame(data, columns=col_names)
+                    df = pd.DataFrame(data, columns=col_names)
+                    return _apply_dtypes(df, dtypes) if dtypes else df
                 return None
-    except psycopg2.Error as e:
+    except DB_ERRORS as e:
         conn.rollback()
         st.error(f"❌ Database error: {e}")
         return None
 
+# --- Prepared statements for the hot checkout path ---
+
+# name -> (argument types, statement with $n placeholders in positional order)
+HOT_STATEMENTS = {
+    "customer_insert": (
+        "(text, text, text, text)",
+        "INSERT INTO public.customers (name, phone, address, username) VALUES ($1, $2, $3, $4) RETURNING id",
+    ),
+    "stock_decrement": (
+        "(integer, integer)",
+        "UPDATE public.variants SET stock = stock - $1 WHERE id = $2",
+    ),
+    "invoice_insert": (
+        "(integer, timestamptz, real, real, text, integer, real, real, text)",
+        "INSERT INTO public.invoices (customer_id, date, discount_pct, discount, delivery_duration, item_count, total, profit, client_ref) "
+        "VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9) RETURNING id",
+    ),
+    "sales_insert": (
+        "(integer, integer, text, integer, real, real, timestamptz, text, text, real, bigint)",
+        "INSERT INTO public.sales (customer_id, variant_id, product_name, qty, total, profit, date, invoice_id, delivery_duration, discount, invoice_ref, product_id) "
+        "VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, (SELECT product_id FROM public.variants WHERE id = $2))",
+    ),
+    "customer_stats_upsert": (
+        "(integer, integer, real, real, timestamptz)",
+        "INSERT INTO public.customer_stats (customer_id, orders, items, spend, profit, returns, first_purchase, last_purchase) "
+        "VALUES ($1, 1, $2, $3, $4, 0, $5, $5) "
+        "ON CONFLICT (customer_id) DO UPDATE SET orders = customer_stats.orders + 1, "
+        "items = customer_stats.items + EXCLUDED.items, spend = customer_stats.spend + EXCLUDED.spend, "
+        "profit = customer_stats.profit + EXCLUDED.profit, "
+        "first_purchase = LEAST(customer_stats.first_purchase, EXCLUDED.first_purchase), "
+        "last_purchase = GREATEST(customer_stats.last_purchase, EXCLUDED.last_purchase)",
+    ),
+    "movement_insert": (
+        "(integer, integer, text, bigint, timestamptz)",
+        "INSERT INTO public.stock_movements (variant_id, delta, reason, ref_id, created_at) VALUES ($1, $2, $3, $4, $5)",
+    ),
+}
+
+# Transaction-mode poolers (pgbouncer / Supabase on 6543) hand each transaction
+# to a different backend, so session-level PREPAREs are not visible later.
+TRANSACTION_POOLER_PORTS = {6543}
+
+_prepared_on_conn = weakref.WeakKeyDictionary()
+_prepared_state = {"enabled": None}
+
+def _plain_sql(name):
+    """Text-protocol equivalent of a registered statement ($n -> %(n)s, so parameters may repeat)"""
+    return re.sub(r"\$(\d+)", r"%(\1)s", HOT_STATEMENTS[name][1])
+
+def _plain_params(params):
+    """Positional parameters keyed the way `_plain_sql` placeholders expect"""
+    return {str(i): value for i, value in enumerate(params, 1)}
+
+def prepared_statements_enabled():
+    """Whether server-side prepared statements are safe on this deployment"""
+    if _prepared_state["enabled"] is None:
+        if not is_postgres():
+            _prepared_state["enabled"] = False
+            return False
+        try:
+            cfg = st.secrets["postgres"]
+            enabled = cfg.get("prepared_statements", True)
+            if int(cfg.get("port", 5432)) in TRANSACTION_POOLER_PORTS:
+                enabled = False
+        except (KeyError, ValueError):
+            enabled = True
+        _prepared_state["enabled"] = bool(enabled)
+    return _prepared_state["enabled"]
+
+def disable_prepared_statements():
+    """Fall back to plain text statements for the rest of the process"""
+    _prepared_state["enabled"] = False
+    _prepared_on_conn.clear()
+
+def prepare_statements(conn):
+    """PREPARE every hot statement once per connection (must run outside other work)"""
+    if not prepared_statements_enabled():
+        return
+    done = _prepared_on_conn.setdefault(conn, set())
+    missing = [name for name in HOT_STATEMENTS if name not in done]
+    if not missing:
+        return
+    with conn.cursor() as cur:
+        for name in missing:
+            arg_types, body = HOT_STATEMENTS[name]
+            cur.execute(f"PREPARE {name} {arg_types} AS {body}")
+    conn.commit()
+    done.update(missing)
+
+def execute_hot(cur, name, params):
+    """Execute a registered statement by name, or as plain text when unprepared"""
+    if name in _prepared_on_conn.get(cur.connection, ()):
+        placeholders = ", ".join(["%s"] * len(params))
+        cur.execute(f"EXECUTE {name} ({placeholders})", params)
+    else:
+        cur.execute(_plain_sql(name), _plain_params(params))
+
+def execute_hot_batch(cur, name, rows):
+    """Execute a registered statement for many rows in a single round trip"""
+    if not rows:
+        return
+    if name in _prepared_on_conn.get(cur.connection, ()):
+        placeholders = ", ".join(["%s"] * len(rows[0]))
+        execute_batch(cur, f"EXECUTE {name} ({placeholders})", rows, page_size=len(rows))
+    else:
+        get_backend().execute_batch(cur, _plain_sql(name), [_plain_params(row) for row in rows])
+
+def _is_prepared_failure(err):
+    return isinstance(err, (
+        pg_errors.InvalidSqlStatementName,
+        pg_errors.DuplicatePreparedStatement,
+    ))
+
 def init_db():
-    """Initialize tables on first run"""
+    """Initialize tables on first run (SERIAL keys become AUTOINCREMENT on SQLite)"""
     conn = get_db_connection()
     with conn.cursor() as c:
         # Table: Products (variants)
         c.execute("""CREATE TABLE IF NOT EXISTS public.variants (
             id SERIAL PRIMARY KEY, name TEXT, color TEXT, size TEXT, 
-            cost REAL, price REAL, stock INTEGER
+            cost REAL, price REAL, stock INTEGER, sku TEXT, product_id INTEGER, color_id INTEGER
+        )""")
+        # Tables: Catalog dimensions (model and color keys for variants and sales)
+        c.execute("""CREATE TABLE IF NOT EXISTS public.products (
+            id SERIAL PRIMARY KEY, name TEXT UNIQUE NOT NULL
+        )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS public.colors (
+            id SERIAL PRIMARY KEY, name TEXT UNIQUE NOT NULL
         )""")
         # Table: Customers
         c.execute("""CREATE TABLE IF NOT EXISTS public.customers (
             id SERIAL PRIMARY KEY, name TEXT, phone TEXT, address TEXT, username TEXT
         )""")
+        # Table: Customer stats (lifetime totals kept up to date by checkout and returns)
+        c.execute("""CREATE TABLE IF NOT EXISTS public.customer_stats (
+            customer_id INTEGER PRIMARY KEY, orders INTEGER, items INTEGER, spend REAL, profit REAL,
+            returns REAL, first_purchase TIMESTAMP, last_purchase TIMESTAMP
+        )""")
         # Table: Sales
         c.execute("""CREATE TABLE IF NOT EXISTS public.sales (
             id SERIAL PRIMARY KEY, customer_id INTEGER, variant_id INTEGER, product_name TEXT, 
             qty INTEGER, total REAL, profit REAL, date TIMESTAMP, invoice_id TEXT, delivery_duration TEXT,
-            discount REAL
+            discount REAL, invoice_ref BIGINT, product_id INTEGER
+        )""")
+        # Table: Invoices (one header per checkout, sale lines reference it)
+        c.execute("""CREATE TABLE IF NOT EXISTS public.invoices (
+            id BIGSERIAL PRIMARY KEY, customer_id INTEGER, date TIMESTAMP, discount_pct REAL,
+            discount REAL, delivery_duration TEXT, item_count INTEGER, total REAL, profit REAL,
+            legacy_id TEXT, client_ref TEXT
+        )""")
+        # Table: Archive log (totals of months moved to Parquet by archive.py)
+        c.execute("""CREATE TABLE IF NOT EXISTS public.archive_log (
+            table_name TEXT, month DATE, row_count INTEGER, amount REAL, profit REAL,
+            file_path TEXT, archived_at TIMESTAMP, PRIMARY KEY (table_name, month)
+        )""")
+        # Table: Bulk adjustments (undo log for bulk_adjust.py: one header + old value per variant)
+        c.execute("""CREATE TABLE IF NOT EXISTS public.bulk_adjustments (
+            id BIGSERIAL PRIMARY KEY, field TEXT, mode TEXT, amount REAL, filters TEXT,
+            row_count INTEGER, created_at TIMESTAMP, undone_at TIMESTAMP
+        )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS public.bulk_adjustment_items (
+            adjustment_id BIGINT, variant_id INTEGER, old_value REAL, new_value REAL,
+            PRIMARY KEY (adjustment_id, variant_id)
+        )""")
+        # Table: Inventory valuation snapshots (valuation.py; one row per variant / model per day)
+        c.execute("""CREATE TABLE IF NOT EXISTS public.inventory_valuation (
+            day DATE, variant_id INTEGER, name TEXT, color TEXT, size TEXT, stock INTEGER,
+            cost_value REAL, sale_value REAL, PRIMARY KEY (day, variant_id)
+        )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS public.model_valuation (
+            day DATE, name TEXT, variants INTEGER, stock INTEGER,
+            cost_value REAL, sale_value REAL, PRIMARY KEY (day, name)
         )""")
         # Table: Expenses
         c.execute("""CREATE TABLE IF NOT EXISTS public.expenses (
@@ -73,39 +512,440 @@ def init_db():
             product_name TEXT, product_details TEXT, qty INTEGER, return_amount REAL, 
             return_date TIMESTAMP, status TEXT
         )""")
+        # Table: Stock movements (append-only ledger; reason + ref_id say why stock changed)
+        c.execute("""CREATE TABLE IF NOT EXISTS public.stock_movements (
+            id BIGSERIAL PRIMARY KEY, variant_id INTEGER, delta INTEGER, reason TEXT,
+            ref_id BIGINT, created_at TIMESTAMP
+        )""")
+        # Table: Schema migrations (one-time data migrations already applied)
+        c.execute("""CREATE TABLE IF NOT EXISTS public.schema_migrations (
+            name TEXT PRIMARY KEY, applied_at TIMESTAMP
+        )""")
+        # Table: Stock snapshots (per-variant balance of movements folded by compaction)
+        c.execute("""CREATE TABLE IF NOT EXISTS public.stock_snapshots (
+            variant_id INTEGER PRIMARY KEY, as_of TIMESTAMP, stock INTEGER
+        )""")
         conn.commit()
 
+@st.cache_resource(show_spinner=False)
+def setup_db():
+    """Create and migrate the schema once per process (not once per browser session)"""
+    init_db()
+    migrate_db()
+    return True
+
 # --- 3. Data Fetching (Caching) ---
 
-@st.cache_data(ttl=60)
+def _shared_view(result):
+    if isinstance(result, pd.DataFrame):
+        return result.copy(deep=False)
+    if isinstance(result, tuple):
+        return tuple(_shared_view(r) for r in result)
+    return result
+
+@st.cache_resource
+def get_shared_cache():
+    """Cross-replica cache backend from the [cache] secrets section (disk by default)"""
+    try:
+        cfg = dict(st.secrets["cache"])
+    except (KeyError, FileNotFoundError):
+        cfg = {}
+    return cache_backend.make_backend(cfg)
+
+def shared_frame_cache(ttl, dtypes=None, tables=()):
+    """Cache one compact frame per process and hand every caller a zero-copy view.
+
+    Unlike `st.cache_data`, nothing is pickled or copied per rerun; with
+    copy-on-write enabled a caller's mutations never reach the shared frame.
+    On a local miss the frame is looked up in the shared tier (keyed by the
+    generations of `tables`) before the database is queried.
+    """
+    def decorator(func):
+        def load(*args, **kwargs):
+            backend = get_shared_cache() if tables else None
+            key = None
+            if backend is not None:
+                key = cache_backend.frame_key(func.__qualname__, args, kwargs, backend, tables)
+                payload = backend.get(key)
+                if payload is not None:
+                    result = cache_backend.loads(payload, backend.secret)
+                    if result is not None:
+                        return result
+
+            result = func(*args, **kwargs)
+            if dtypes and isinstance(result, pd.DataFrame):
+                result = _apply_dtypes(result, dtypes)
+            if key is not None and result is not None:
+                backend.set(key, cache_backend.dumps(result, backend.secret), ttl)
+            return result
+
+        # st.cache_resource keys on the qualified name; keep one cache per reader
+        load.__name__ = func.__name__
+        load.__qualname__ = f"{func.__qualname__}.shared"
+        cached = st.cache_resource(ttl=ttl, show_spinner=False)(load)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return _shared_view(cached(*args, **kwargs))
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+@shared_frame_cache(ttl=60, dtypes=INVENTORY_DTYPES, tables=("variants",))
 def get_inventory():
     return run_query("SELECT * FROM public.variants ORDER BY name")
 
-@st.cache_data(ttl=300)
+@st.cache_resource(ttl=60, show_spinner=False)
+def get_sku_index():
+    """sku -> variant record, built once per inventory refresh for O(1) scanner lookups"""
+    df = get_inventory()
+    if df is None or df.empty or 'sku' not in df.columns:
+        return {}
+    df = df[df['sku'].notna() & (df['sku'] != "")]
+    records = df[['id', 'name', 'color', 'size', 'cost', 'price', 'stock']].to_dict('records')
+    return dict(zip(df['sku'].astype(str).str.strip(), records))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_stock_summary():
+    """Sidebar numbers from one aggregate row (never loads the full inventory)"""
+    df = run_query(
+        """SELECT COUNT(*) AS variants, COALESCE(SUM(stock), 0) AS total_items,
+                  COUNT(*) FILTER (WHERE stock < %s) AS low_stock
+           FROM public.variants""",
+        (LOW_STOCK_THRESHOLD,),
+    )
+    if df is None or df.empty:
+        return None
+    return {k: int(v) for k, v in df.iloc[0].items()}
+
+@shared_frame_cache(ttl=300, tables=("customers",))
 def get_customers():
     return run_query("SELECT * FROM public.customers ORDER BY name")
 
-@st.cache_data(ttl=60)
+@shared_frame_cache(ttl=60, tables=("sales",))
 def get_sales(limit=100):
-    return run_query(f"SELECT * FROM public.sales ORDER BY date DESC LIMIT {limit}")
+    return run_query("SELECT * FROM public.sales ORDER BY date DESC LIMIT %s", (limit,), dtypes=SALES_DTYPES)
 
-@st.cache_data(ttl=300)
+@shared_frame_cache(ttl=300, tables=("expenses",))
 def get_expenses():
-    return run_query("SELECT * FROM public.expenses ORDER BY date DESC")
+    return run_query("SELECT * FROM public.expenses ORDER BY date DESC", dtypes=EXPENSES_DTYPES)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_expense_summary():
+    """Per-category month / all-time totals and entry counts, aggregated in SQL"""
+    return run_query(
+        """SELECT category,
+                  COALESCE(SUM(amount) FILTER (WHERE date >= date_trunc('month', now())), 0) AS month_total,
+                  COALESCE(SUM(amount), 0) AS total,
+                  COUNT(*) AS entries
+           FROM public.expenses GROUP BY category ORDER BY total DESC"""
+    )
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_expense_log(page=0, page_size=20, category=None):
+    """One page of the expense log, newest first, optionally for one category"""
+    return run_query(
+        """SELECT * FROM public.expenses
+           WHERE %(category)s IS NULL OR category = %(category)s
+           ORDER BY date DESC LIMIT %(limit)s OFFSET %(offset)s""",
+        {"category": category, "limit": page_size, "offset": page * page_size},
+        dtypes=EXPENSES_DTYPES,
+    )
+
+@shared_frame_cache(ttl=60, tables=("sales", "invoices"))
+def get_report_data(since=None, limit=1000):
+    """Dashboard inputs for one period (all time when `since` is None), fetched concurrently.
+
+    Returns (latest `limit` sale lines of the period for the charts,
+    {"sales", "profit", "orders", "avg_basket"} over the whole period), or
+    None when a query failed. Customer rankings come from rfm.py.
+    """
+    window = {"since": since, "limit": limit}
+    frames = run_queries({
+        "lines": (
+            """SELECT * FROM public.sales WHERE %(since)s IS NULL OR date >= %(since)s
+               ORDER BY date DESC LIMIT %(limit)s""",
+            window, SALES_DTYPES,
+        ),
+        "sales": (
+            """SELECT COALESCE(SUM(total), 0) AS sales, COALESCE(SUM(profit), 0) AS profit
+               FROM public.sales WHERE %(since)s IS NULL OR date >= %(since)s""",
+            window,
+        ),
+        # order count and average basket from invoice headers (indexed on date)
+        "invoices": (
+            """SELECT COUNT(*) AS orders, COALESCE(AVG(total), 0) AS avg_basket
+               FROM public.invoices WHERE %(since)s IS NULL OR date >= %(since)s""",
+            window,
+        ),
+    })
+    if any(df is None for df in frames.values()):
+        return None
+    totals, inv = frames["sales"].iloc[0], frames["invoices"].iloc[0]
+    return frames["lines"], {
+        "sales": float(totals["sales"]), "profit": float(totals["profit"]),
+        "orders": int(inv["orders"]), "avg_basket": float(inv["avg_basket"]),
+    }
 
 def clear_all_cache():
     """Clear cache to refresh data"""
+    for fn in {fn for fns in _registered_caches.values() for fn in fns}:
+        fn.clear()
     get_inventory.clear()
+    get_sku_index.clear()
+    get_stock_summary.clear()
     get_customers.clear()
     get_sales.clear()
     get_expenses.clear()
+    get_expense_summary.clear()
+    get_expense_log.clear()
+    get_report_data.clear()
+    backend = get_shared_cache()
+    if backend is not None:
+        for table in NOTIFY_TABLES:
+            cache_backend.bump_generation(backend, table)
 
 def get_time():
     return datetime.now(pytz.timezone('Asia/Baghdad'))
 
+# --- Cross-session cache invalidation (LISTEN/NOTIFY) ---
+
+CHANGE_CHANNEL = "boutique_changes"
+NOTIFY_TABLES = ("variants", "sales", "customers", "expenses", "invoices", "returns", "customer_stats")
+
+# Cached readers defined outside this module, by table they read
+_registered_caches = {}
+
+def register_table_cache(fn, tables):
+    """Have a cached reader from another module cleared whenever one of `tables` changes"""
+    for table in tables:
+        _registered_caches.setdefault(table, set()).add(fn)
+    return fn
+
+def _table_caches():
+    """Which cached readers depend on which table"""
+    mapping = {
+        "variants": (get_inventory, get_sku_index, get_stock_summary),
+        "sales": (get_sales, get_report_data),
+        "customers": (get_customers,),
+        "expenses": (get_expenses, get_expense_summary, get_expense_log),
+        "invoices": (get_report_data,),
+    }
+    for table, fns in _registered_caches.items():
+        mapping[table] = tuple(mapping.get(table, ())) + tuple(fns)
+    return mapping
+
+def invalidate_tables(tables):
+    """Clear only the caches that read from the given tables.
+
+    `tables` maps table name -> generation token (e.g. the writer's txid), or is
+    a plain iterable of names to get fresh tokens. Tokens are shared across
+    replicas, so every listener bumping the same change writes the same value.
+    """
+    if not isinstance(tables, dict):
+        tables = {table: None for table in tables}
+    backend = get_shared_cache()
+    if backend is not None:
+        for table, token in tables.items():
+            cache_backend.bump_generation(backend, table, token)
+    mapping = _table_caches()
+    for fn in {fn for table in tables for fn in mapping.get(table, ())}:
+        fn.clear()
+
+def _listen_loop(conn_kwargs):
+    backoff = 1
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**conn_kwargs)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANGE_CHANNEL}")
+            # Anything may have changed while we were not listening
+            invalidate_tables({table: None for table in NOTIFY_TABLES})
+            backoff = 1
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                # payload is "<table>:<txid>"
+                tables = dict(n.payload.partition(":")[::2] for n in conn.notifies)
+                conn.notifies.clear()
+                if tables:
+                    invalidate_tables(tables)
+        except (psycopg2.Error, OSError):
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+        finally:
+            if conn is not None and not conn.closed:
+                conn.close()
+
+@st.cache_resource
+def start_change_listener():
+    """Start one background LISTEN thread per process; returns it (or None if unavailable)"""
+    try:
+        # An embedded database has no other writers to hear from
+        if not is_postgres():
+            return None
+        conn_kwargs = _connect_kwargs()
+    except KeyError:
+        return None
+    # LISTEN needs a session of its own; transaction poolers can't deliver it
+    if int(conn_kwargs.get("port", 5432)) in TRANSACTION_POOLER_PORTS:
+        return None
+    thread = threading.Thread(target=_listen_loop, args=(conn_kwargs,), name="db-change-listener", daemon=True)
+    thread.start()
+    return thread
+
+ENSURE_PARTITIONS_FN = """CREATE OR REPLACE FUNCTION public.ensure_month_partitions(
+        parent text, from_month date, months_ahead integer) RETURNS void AS $$
+    DECLARE
+        m date := date_trunc('month', from_month)::date;
+        last_month date := (date_trunc('month', now()) + make_interval(months => months_ahead))::date;
+        next_month date;
+        part text;
+    BEGIN
+        WHILE m <= last_month LOOP
+            part := format('%s_%s', parent, to_char(m, 'YYYY_MM'));
+            next_month := (m + interval '1 month')::date;
+            IF to_regclass('public.' || part) IS NULL THEN
+                BEGIN
+                    -- Built detached so rows of that month that already landed in the
+                    -- default partition can move into it before it is attached
+                    EXECUTE format('CREATE TABLE public.%I (LIKE public.%I INCLUDING DEFAULTS)', part, parent);
+                    IF to_regclass(format('public.%I', parent || '_default')) IS NOT NULL THEN
+                        EXECUTE format('WITH moved AS (DELETE FROM public.%I WHERE date >= %L AND date < %L RETURNING *)
+                                        INSERT INTO public.%I SELECT * FROM moved',
+                                       parent || '_default', m, next_month, part);
+                    END IF;
+                    EXECUTE format('ALTER TABLE public.%I ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                                   parent, part, m, next_month);
+                EXCEPTION WHEN others THEN
+                    RAISE WARNING 'partition % not created: %', part, SQLERRM;
+                END;
+            END IF;
+            m := next_month;
+        END LOOP;
+    END;
+    $$ LANGUAGE plpgsql"""
+
+CATALOG_KEYS_FN = """CREATE OR REPLACE FUNCTION public.variants_catalog_keys() RETURNS trigger AS $$
+    BEGIN
+        NEW.product_id := NULL;
+        NEW.color_id := NULL;
+        IF NEW.name IS NOT NULL THEN
+            INSERT INTO public.products (name) VALUES (NEW.name) ON CONFLICT (name) DO NOTHING;
+            SELECT id INTO NEW.product_id FROM public.products WHERE name = NEW.name;
+        END IF;
+        IF NEW.color IS NOT NULL THEN
+            INSERT INTO public.colors (name) VALUES (NEW.color) ON CONFLICT (name) DO NOTHING;
+            SELECT id INTO NEW.color_id FROM public.colors WHERE name = NEW.color;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql"""
+
+def _partition_table(c, table):
+    """Convert a plain heap table into a monthly range-partitioned one (no-op if already done)"""
+    c.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (f"public.{table}",))
+    row = c.fetchone()
+    if row is None or row[0] == "p":
+        return
+    c.execute("SELECT pg_get_serial_sequence(%s, 'id')", (f"public.{table}",))
+    seq = c.fetchone()[0]
+
+    c.execute(f"ALTER TABLE public.{table} RENAME TO {table}_heap")
+    # Primary keys on a partitioned table must include the partition key, and legacy
+    # rows may have NULL dates, so id gets a plain index instead
+    c.execute(f"CREATE TABLE public.{table} (LIKE public.{table}_heap INCLUDING DEFAULTS) PARTITION BY RANGE (date)")
+    c.execute(f"CREATE TABLE public.{table}_default PARTITION OF public.{table} DEFAULT")
+    c.execute(f"SELECT COALESCE(MIN(date), now())::date FROM public.{table}_heap")
+    first_month = c.fetchone()[0]
+    c.execute("SELECT public.ensure_month_partitions(%s, %s, %s)", (table, first_month, PARTITION_MONTHS_AHEAD))
+    c.execute(f"INSERT INTO public.{table} SELECT * FROM public.{table}_heap")
+    if seq:
+        c.execute(f"ALTER SEQUENCE {seq} OWNED BY NONE")
+    c.execute(f"DROP TABLE public.{table}_heap")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {table}_date_brin ON public.{table} USING brin (date)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {table}_id_idx ON public.{table} (id)")
+    if table == "sales":
+        c.execute("CREATE INDEX IF NOT EXISTS sales_invoice_ref_idx ON public.sales (invoice_ref)")
+        c.execute("CREATE INDEX IF NOT EXISTS sales_product_idx ON public.sales (product_id)")
+
+def maintain_partitions():
+    """Make sure next months' partitions exist; returns the problems reported (empty when all is well)"""
+    conn = get_db_connection()
+    del conn.notices[:]
+    try:
+        with conn.cursor() as c:
+            for table in PARTITIONED_TABLES:
+                c.execute("SELECT public.ensure_month_partitions(%s, now()::date, %s)", (table, PARTITION_MONTHS_AHEAD))
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        return [str(e).strip()]
+    return [n.strip().removeprefix("WARNING:").strip() for n in conn.notices if "not created" in n]
+
+@st.cache_resource(show_spinner=False)
+def ensure_partitions(month):
+    """Run partition maintenance once per process per month (keyed by "YYYY-MM"); returns its problems"""
+    if not is_postgres():
+        return []
+    return maintain_partitions()
+
+# SQLite stand-in for the catalog_keys trigger: fills the keys after the row is written
+SQLITE_CATALOG_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS catalog_keys_{event.split()[0].lower()} AFTER {event} ON variants
+    BEGIN
+        INSERT OR IGNORE INTO products (name) SELECT NEW.name WHERE NEW.name IS NOT NULL;
+        INSERT OR IGNORE INTO colors (name) SELECT NEW.color WHERE NEW.color IS NOT NULL;
+        UPDATE variants SET product_id = (SELECT id FROM products WHERE name = NEW.name),
+                            color_id = (SELECT id FROM colors WHERE name = NEW.color)
+        WHERE id = NEW.id;
+    END"""
+    for event in ("INSERT", "UPDATE OF name, color")
+]
+
+def _migrate_sqlite(conn):
+    """Indexes and catalog triggers for an embedded database (init_db already has every column)"""
+    with conn.cursor() as c:
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS variants_sku_idx ON variants (sku)")
+        c.execute("CREATE INDEX IF NOT EXISTS variants_product_idx ON variants (product_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS stock_movements_variant_idx ON stock_movements (variant_id, created_at)")
+        c.execute("CREATE INDEX IF NOT EXISTS sales_date_idx ON sales (date)")
+        c.execute("CREATE INDEX IF NOT EXISTS sales_invoice_ref_idx ON sales (invoice_ref)")
+        c.execute("CREATE INDEX IF NOT EXISTS sales_product_idx ON sales (product_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS invoices_date_idx ON invoices (date)")
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS invoices_client_ref_idx ON invoices (client_ref)")
+        c.execute("CREATE INDEX IF NOT EXISTS expenses_date_idx ON expenses (date)")
+        c.execute("CREATE INDEX IF NOT EXISTS customer_stats_spend_idx ON customer_stats (spend DESC)")
+        c.execute("CREATE INDEX IF NOT EXISTS customer_stats_last_idx ON customer_stats (last_purchase)")
+        for trigger in SQLITE_CATALOG_TRIGGERS:
+            c.execute(trigger)
+    conn.commit()
+
+def _has_trigger(c, table, name):
+    c.execute("SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(%s) AND tgname = %s", (f"public.{table}", name))
+    return c.fetchone() is not None
+
+def _claim_migration(c, name):
+    """Record a one-time migration step in the current transaction; False if it already ran"""
+    c.execute(
+        "INSERT INTO public.schema_migrations (name, applied_at) VALUES (%s, now()) ON CONFLICT (name) DO NOTHING",
+        (name,),
+    )
+    return c.rowcount == 1
+
 def migrate_db():
     """Apply schema updates to existing databases"""
     conn = get_db_connection()
+    if not is_postgres():
+        try:
+            _migrate_sqlite(conn)
+        except DB_ERRORS:
+            conn.rollback()
+        return
     try:
         with conn.cursor() as c:
             # Add discount column if strictly not exists
@@ -114,5 +954,328 @@ def migrate_db():
                 conn.commit()
             except psycopg2.Error:
                 conn.rollback()
+
+            # Barcode / SKU per variant (NULLs allowed until labels are printed)
+            try:
+                c.execute("ALTER TABLE public.variants ADD COLUMN IF NOT EXISTS sku TEXT")
+                c.execute("CREATE UNIQUE INDEX IF NOT EXISTS variants_sku_idx ON public.variants (sku)")
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+
+            # Stock ledger: index for per-variant history, and an opening balance
+            # for variants that predate the ledger
+            try:
+                c.execute("CREATE INDEX IF NOT EXISTS stock_movements_variant_idx ON public.stock_movements (variant_id, created_at)")
+                c.execute("""INSERT INTO public.stock_snapshots (variant_id, as_of, stock)
+                    SELECT v.id, now(), COALESCE(v.stock, 0) FROM public.variants v
+                    WHERE NOT EXISTS (SELECT 1 FROM public.stock_snapshots s WHERE s.variant_id = v.id)
+                      AND NOT EXISTS (SELECT 1 FROM public.stock_movements m WHERE m.variant_id = v.id)""")
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+
+            # Invoice headers: link sale lines and backfill headers for legacy lines.
+            # Legacy ids were per-minute, so (invoice_id, customer_id) is the best split.
+            try:
+                c.execute("ALTER TABLE public.sales ADD COLUMN IF NOT EXISTS invoice_ref BIGINT")
+                c.execute("CREATE INDEX IF NOT EXISTS sales_invoice_ref_idx ON public.sales (invoice_ref)")
+                c.execute("CREATE INDEX IF NOT EXISTS invoices_date_idx ON public.invoices (date)")
+                # Journaled (offline) checkouts carry their local id; unique so replays are idempotent
+                c.execute("ALTER TABLE public.invoices ADD COLUMN IF NOT EXISTS client_ref TEXT")
+                c.execute("CREATE UNIQUE INDEX IF NOT EXISTS invoices_client_ref_idx ON public.invoices (client_ref)")
+                c.execute("""INSERT INTO public.invoices
+                        (customer_id, date, discount, delivery_duration, item_count, total, profit, legacy_id)
+                    SELECT customer_id, MIN(date), SUM(COALESCE(discount, 0)), MIN(delivery_duration),
+                           SUM(qty), SUM(total), SUM(profit), invoice_id
+                    FROM public.sales WHERE invoice_ref IS NULL
+                    GROUP BY invoice_id, customer_id""")
+                c.execute("""UPDATE public.sales s SET invoice_ref = i.id
+                    FROM public.invoices i
+                    WHERE s.invoice_ref IS NULL AND i.legacy_id IS NOT DISTINCT FROM s.invoice_id
+                      AND i.customer_id IS NOT DISTINCT FROM s.customer_id""")
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+
+            # Customer lifetime stats: indexes for top-customer / recency reads and a
+            # one-time backfill from sales and returns (incremental afterwards)
+            try:
+                c.execute("CREATE INDEX IF NOT EXISTS customer_stats_spend_idx ON public.customer_stats (spend DESC)")
+                c.execute("CREATE INDEX IF NOT EXISTS customer_stats_last_idx ON public.customer_stats (last_purchase)")
+                c.execute("""INSERT INTO public.customer_stats
+                        (customer_id, orders, items, spend, profit, returns, first_purchase, last_purchase)
+                    SELECT s.customer_id, COUNT(DISTINCT COALESCE(s.invoice_ref::text, s.invoice_id)),
+                           SUM(s.qty) - COALESCE(MAX(r.qty), 0), SUM(s.total) - COALESCE(MAX(r.amount), 0),
+                           SUM(s.profit) - COALESCE(MAX(r.profit), 0), COALESCE(MAX(r.amount), 0),
+                           MIN(s.date), MAX(s.date)
+                    FROM public.sales s
+                    LEFT JOIN (
+                        SELECT rs.customer_id, SUM(rt.qty) AS qty, SUM(rt.return_amount) AS amount, SUM(rs.profit) AS profit
+                        FROM public.returns rt JOIN public.sales rs ON rs.id = rt.sale_id
+                        GROUP BY rs.customer_id
+                    ) r ON r.customer_id = s.customer_id
+                    WHERE s.customer_id IS NOT NULL
+                      AND NOT EXISTS (SELECT 1 FROM public.customer_stats)
+                    GROUP BY s.customer_id
+                    ON CONFLICT (customer_id) DO NOTHING""")
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+
+            # Monthly range partitions + BRIN on date for the append-only tables
+            try:
+                c.execute(ENSURE_PARTITIONS_FN)
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+            for table in PARTITIONED_TABLES:
+                try:
+                    _partition_table(c, table)
+                    conn.commit()
+                except psycopg2.Error:
+                    conn.rollback()
+            maintain_partitions()
+
+            # Catalog keys: products/colors dimensions, a trigger that keeps
+            # variants' keys in step with their name/color text, and a backfill
+            try:
+                c.execute("ALTER TABLE public.variants ADD COLUMN IF NOT EXISTS product_id INTEGER")
+                c.execute("ALTER TABLE public.variants ADD COLUMN IF NOT EXISTS color_id INTEGER")
+                c.execute("ALTER TABLE public.sales ADD COLUMN IF NOT EXISTS product_id INTEGER")
+                c.execute(CATALOG_KEYS_FN)
+                if not _has_trigger(c, "variants", "catalog_keys"):
+                    c.execute("""CREATE TRIGGER catalog_keys
+                        BEFORE INSERT OR UPDATE OF name, color ON public.variants
+                        FOR EACH ROW EXECUTE PROCEDURE public.variants_catalog_keys()""")
+                # Full scans of sales: once per database; the trigger and sales_insert keep keys filled afterwards
+                if _claim_migration(c, "catalog_keys_backfill"):
+                    c.execute("""INSERT INTO public.products (name)
+                        SELECT name FROM public.variants WHERE name IS NOT NULL
+                        UNION SELECT product_name FROM public.sales WHERE product_name IS NOT NULL
+                        ON CONFLICT (name) DO NOTHING""")
+                    c.execute("""INSERT INTO public.colors (name)
+                        SELECT DISTINCT color FROM public.variants WHERE color IS NOT NULL
+                        ON CONFLICT (name) DO NOTHING""")
+                    c.execute("""UPDATE public.variants v SET product_id = p.id FROM public.products p
+                        WHERE p.name = v.name AND v.product_id IS DISTINCT FROM p.id""")
+                    c.execute("""UPDATE public.variants v SET color_id = k.id FROM public.colors k
+                        WHERE k.name = v.color AND v.color_id IS DISTINCT FROM k.id""")
+                    c.execute("""UPDATE public.sales s SET product_id = p.id FROM public.products p
+                        WHERE s.product_id IS NULL AND p.name = s.product_name""")
+                c.execute("CREATE INDEX IF NOT EXISTS variants_product_idx ON public.variants (product_id)")
+                c.execute("CREATE INDEX IF NOT EXISTS sales_product_idx ON public.sales (product_id)")
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+
+            # Statement-level change notifications for the listener thread
+            try:
+                c.execute(f"""CREATE OR REPLACE FUNCTION public.notify_table_change() RETURNS trigger AS $$
+                    BEGIN
+                        PERFORM pg_notify('{CHANGE_CHANNEL}', TG_TABLE_NAME || ':' || txid_current());
+                        RETURN NULL;
+                    END;
+                    $$ LANGUAGE plpgsql""")
+                for table in NOTIFY_TABLES:
+                    # Creating a trigger locks the table; only do it when it is missing
+                    if _has_trigger(c, table, "notify_change"):
+                        continue
+                    c.execute(f"""CREATE TRIGGER notify_change
+                        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.{table}
+                        FOR EACH STATEMENT EXECUTE PROCEDURE public.notify_table_change()""")
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
     except Exception:
         pass
+
+# --- 4. Checkout Writes ---
+
+def log_movements(cur, rows):
+    """Append (variant_id, delta, reason, ref_id, created_at) rows to the stock ledger in one round trip.
+
+    Runs inside the caller's transaction, so the ledger never disagrees with
+    the stock update it records. Zero deltas are skipped.
+    """
+    execute_hot_batch(cur, "movement_insert", [row for row in rows if row[1]])
+
+def add_variant(name, color, size, stock, cost, price, sku=None):
+    """Insert a new variant and its opening 'import' ledger movement in one transaction; returns its id.
+
+    Raises psycopg2.Error (sqlite3.Error on SQLite) after rolling back on
+    failure; a duplicate sku is one of UNIQUE_VIOLATIONS.
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """INSERT INTO public.variants (name, color, size, stock, cost, price, sku)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id""",
+                (name, color, size, stock, cost, price, sku),
+            )
+            variant_id = cur.fetchone()[0]
+            log_movements(cur, [(variant_id, stock, "import", None, get_time())])
+        conn.commit()
+    except DB_ERRORS:
+        conn.rollback()
+        raise
+    return variant_id
+
+def _write_sale(conn, customer, items, discount_pct, delivery_duration, client_ref=None, sold_at=None):
+    with conn.cursor() as cur:
+        if customer.get("id") is None:
+            execute_hot(cur, "customer_insert", (
+                customer["name"], customer.get("phone", ""), customer.get("address", ""), customer["name"]
+            ))
+            cust_id = cur.fetchone()[0]
+        else:
+            cust_id = int(customer["id"])
+
+        now = sold_at or get_time()
+        stock_rows = []
+        lines = []
+        for item in items:
+            stock_rows.append((item['qty'], item['id']))
+
+            # Apply Discount
+            orig_total = item['total']
+            discount_amt = orig_total * (discount_pct / 100.0)
+            final_total = orig_total - discount_amt
+            profit = final_total - (item['cost'] * item['qty'])
+            lines.append((item, final_total, profit, discount_amt))
+
+        # Invoice header first: its sequence id is the collision-free invoice number
+        execute_hot(cur, "invoice_insert", (
+            cust_id, now, discount_pct,
+            sum(discount_amt for *_, discount_amt in lines), delivery_duration,
+            sum(item['qty'] for item, *_ in lines),
+            sum(final_total for _, final_total, _, _ in lines),
+            sum(profit for _, _, profit, _ in lines), client_ref,
+        ))
+        invoice_ref = cur.fetchone()[0]
+        inv_id = str(invoice_ref)
+        execute_hot(cur, "customer_stats_upsert", (
+            cust_id, sum(item['qty'] for item, *_ in lines),
+            sum(final_total for _, final_total, _, _ in lines),
+            sum(profit for _, _, profit, _ in lines), now,
+        ))
+
+        sales_rows = [
+            (cust_id, item['id'], item['name'], item['qty'], final_total,
+             profit, now, inv_id, delivery_duration, discount_amt, invoice_ref)
+            for item, final_total, profit, discount_amt in lines
+        ]
+        execute_hot_batch(cur, "stock_decrement", stock_rows)
+        execute_hot_batch(cur, "sales_insert", sales_rows)
+        log_movements(cur, [(item_id, -qty, "sale", invoice_ref, now) for qty, item_id in stock_rows])
+    conn.commit()
+    return inv_id
+
+def record_sale(customer, items, discount_pct=0, delivery_duration="24 ساعة"):
+    """Persist one checkout (customer, invoice header, customer stats, stock decrements, sale lines, ledger) in one transaction.
+
+    `customer` is either `{"id": ...}` for an existing customer or
+    `{"name", "phone", "address"}` for a new one. Returns the invoice number.
+    Raises psycopg2.Error (sqlite3.Error on SQLite) after rolling back on failure.
+    """
+    conn = get_db_connection()
+    if conn.closed:
+        get_db_connection.clear()
+        conn = get_db_connection()
+    try:
+        prepare_statements(conn)
+        return _write_sale(conn, customer, items, discount_pct, delivery_duration)
+    except DB_ERRORS as e:
+        conn.rollback()
+        if not _is_prepared_failure(e):
+            raise
+        # Statements vanished under us (transaction pooler); retry once as plain text
+        disable_prepared_statements()
+        try:
+            return _write_sale(conn, customer, items, discount_pct, delivery_duration)
+        except DB_ERRORS:
+            conn.rollback()
+            raise
+
+def replay_sale(conn, client_ref, sold_at, customer, items, discount_pct=0, delivery_duration="24 ساعة"):
+    """Write a journaled checkout exactly once, keyed by its `client_ref`.
+
+    Runs on the caller's own connection (the journal worker's). Returns
+    (invoice number, shortfalls), where shortfalls lists (variant_id, qty,
+    stock) for lines that oversell current stock. The sale is recorded
+    anyway because the goods have already left the shop. Raises
+    psycopg2.Error after rolling back on failure.
+    """
+    wanted = {}
+    for item in items:
+        wanted[int(item['id'])] = wanted.get(int(item['id']), 0) + int(item['qty'])
+
+    def attempt():
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM public.invoices WHERE client_ref = %s", (client_ref,))
+            row = cur.fetchone()
+            if row is not None:
+                conn.rollback()
+                return str(row[0]), []
+            cur.execute("SELECT id, stock FROM public.variants WHERE id = ANY(%s) ORDER BY id FOR UPDATE", (list(wanted),))
+            stock = dict(cur.fetchall())
+        shortfalls = [(vid, qty, stock.get(vid)) for vid, qty in wanted.items()
+                      if stock.get(vid) is None or stock[vid] < qty]
+        return _write_sale(conn, customer, items, discount_pct, delivery_duration, client_ref, sold_at), shortfalls
+
+    try:
+        prepare_statements(conn)
+        return attempt()
+    except psycopg2.Error as e:
+        conn.rollback()
+        if _is_prepared_failure(e):
+            disable_prepared_statements()
+        elif not isinstance(e, pg_errors.UniqueViolation):
+            raise
+        # Plain-text retry, or another replayer committed this client_ref first
+        try:
+            return attempt()
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+
+def record_return(sale, returns_category="مرتجعات"):
+    """Return one sale line: restock, returns row, expense entry, customer stats and ledger movement in one transaction.
+
+    `sale` is a row of public.sales as a dict. Raises psycopg2.Error
+    (sqlite3.Error on SQLite) after rolling back on failure.
+    """
+    conn = get_db_connection()
+    if conn.closed:
+        get_db_connection.clear()
+        conn = get_db_connection()
+    now = get_time()
+    qty, variant_id, amount = int(sale['qty']), int(sale['variant_id']), float(sale['total'])
+    customer_id = int(sale['customer_id']) if pd.notna(sale.get('customer_id')) else None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE public.variants SET stock = stock + %s WHERE id = %s", (qty, variant_id))
+            cur.execute(
+                """INSERT INTO public.returns (sale_id, variant_id, customer_id, product_name, qty, return_amount, return_date, status)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id""",
+                (int(sale['id']), variant_id, customer_id, sale['product_name'], qty, amount, now, 'Returned'),
+            )
+            return_id = cur.fetchone()[0]
+            cur.execute(
+                "INSERT INTO public.expenses (amount, reason, category, date) VALUES (%s, %s, %s, %s)",
+                (amount, f"مرتجع فاتورة #{sale['id']}", returns_category, now),
+            )
+            if customer_id is not None:
+                cur.execute(
+                    """UPDATE public.customer_stats
+                       SET items = items - %s, spend = spend - %s, profit = profit - %s, returns = returns + %s
+                       WHERE customer_id = %s""",
+                    (qty, amount, float(sale.get('profit') or 0), amount, customer_id),
+                )
+            log_movements(cur, [(variant_id, qty, "return", return_id, now)])
+        conn.commit()
+    except DB_ERRORS:
+        conn.rollback()
+        raise
+    return return_id
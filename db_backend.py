@@ -0,0 +1,246 @@
+"""Database backends under database.py: Postgres (psycopg2) and embedded SQLite.
+
+The app's SQL is written for Postgres. SQLiteBackend hands out
+psycopg2-shaped connections whose cursors translate it on the way in:
+`%s` / `%(name)s` placeholders, the `public.` schema, SERIAL keys, simple
+casts, ADD COLUMN IF NOT EXISTS and (on SQLite before 3.35) RETURNING id.
+The few server functions the core reads use (now, date_trunc, GREATEST,
+LEAST) are registered per connection. Postgres-only features (COPY,
+server-side cursors, LISTEN/NOTIFY, partitions, prepared statements) are
+gated on `backend.name` by the callers.
+
+    [database]              # secrets.toml; omit for Postgres from [postgres]
+    backend = "sqlite"
+    path = "boutique.sqlite3"
+"""
+import re
+import sqlite3
+from datetime import date, datetime
+
+import psycopg2
+import pytz
+from psycopg2 import errors as pg_errors
+from psycopg2.extras import execute_batch
+
+DEFAULT_SQLITE_PATH = "boutique.sqlite3"
+
+# Errors callers catch whichever backend is configured
+DB_ERRORS = (psycopg2.Error, sqlite3.Error)
+UNIQUE_VIOLATIONS = (pg_errors.UniqueViolation, sqlite3.IntegrityError)
+
+
+class PostgresBackend:
+    """Managed or self-hosted Postgres through psycopg2 (the default)"""
+
+    name = "postgres"
+
+    def __init__(self, conn_kwargs):
+        self.conn_kwargs = conn_kwargs
+
+    def connect(self):
+        return psycopg2.connect(**self.conn_kwargs)
+
+    def execute_batch(self, cur, sql, rows):
+        execute_batch(cur, sql, rows, page_size=len(rows))
+
+
+class SQLiteBackend:
+    """One local database file: in-process queries for single-till shops and local runs"""
+
+    name = "sqlite"
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        self.path = path
+
+    def connect(self):
+        return SQLiteConnection(self.path)
+
+    def execute_batch(self, cur, sql, rows):
+        cur.executemany(sql, rows)
+
+
+def make_backend(cfg, postgres_kwargs):
+    """Build the backend described by the [database] secrets section.
+
+    `postgres_kwargs` is called only for Postgres (it raises KeyError when
+    the [postgres] section is missing).
+    """
+    kind = cfg.get("backend", "postgres")
+    if kind == "postgres":
+        return PostgresBackend(postgres_kwargs())
+    if kind == "sqlite":
+        return SQLiteBackend(cfg.get("path", DEFAULT_SQLITE_PATH))
+    raise ValueError(f"unknown database backend: {kind}")
+
+
+# --- SQLite: types and server functions ---
+
+def _parse_timestamp(raw):
+    return datetime.fromisoformat(raw.decode("utf-8"))
+
+
+def _parse_date(raw):
+    return date.fromisoformat(raw.decode("utf-8")[:10])
+
+
+# Timestamps are stored as naive wall-clock ISO text (get_time() is Baghdad-aware),
+# so they sort and compare as strings the way Postgres TIMESTAMP columns do
+sqlite3.register_adapter(datetime, lambda d: d.replace(tzinfo=None).isoformat(" "))
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_converter("TIMESTAMP", _parse_timestamp)
+sqlite3.register_converter("DATE", _parse_date)
+
+
+def _as_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _now():
+    # Same wall clock as database.get_time(), which is how stored timestamps are written
+    return datetime.now(pytz.timezone('Asia/Baghdad')).replace(tzinfo=None).isoformat(" ")
+
+
+def _date_trunc(unit, value):
+    value = _as_datetime(value)
+    if value is None:
+        return None
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == "month":
+        value = value.replace(day=1)
+    elif unit == "year":
+        value = value.replace(month=1, day=1)
+    elif unit == "week":
+        value = value.fromordinal(value.toordinal() - value.weekday())
+    elif unit != "day":
+        raise ValueError(f"date_trunc unit not supported on sqlite: {unit}")
+    return value.isoformat(" ")
+
+
+def _greatest(*values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+def _least(*values):
+    values = [v for v in values if v is not None]
+    return min(values) if values else None
+
+
+_FUNCTIONS = (("now", 0, _now), ("date_trunc", 2, _date_trunc), ("greatest", -1, _greatest), ("least", -1, _least))
+
+
+# --- SQLite: statement translation ---
+
+_SCHEMA_RE = re.compile(r"\bpublic\.")
+_SERIAL_RE = re.compile(r"\b(?:BIG)?SERIAL\s+PRIMARY\s+KEY", re.IGNORECASE)
+_CAST_RE = re.compile(r"::(?:integer|bigint|numeric|real|text|date|timestamp)\b", re.IGNORECASE)
+_NAMED_RE = re.compile(r"%\((\w+)\)s")
+_ADD_COLUMN_RE = re.compile(
+    r"^\s*ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+(.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+_RETURNING_RE = re.compile(r"\s+RETURNING\s+id\s*$", re.IGNORECASE)
+_NATIVE_RETURNING = sqlite3.sqlite_version_info >= (3, 35)
+
+
+def translate(sql, params=None):
+    """Postgres statement with psycopg2 placeholders -> SQLite statement"""
+    sql = _SCHEMA_RE.sub("", sql)
+    sql = _SERIAL_RE.sub("INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+    sql = _CAST_RE.sub("", sql)
+    if isinstance(params, dict):
+        sql = _NAMED_RE.sub(r":\1", sql)
+    else:
+        sql = sql.replace("%s", "?")
+    return sql.replace("%%", "%")
+
+
+class SQLiteConnection:
+    """psycopg2-shaped wrapper: `closed`, commit/rollback, cursors usable in `with`"""
+
+    def __init__(self, path):
+        # Shared by the Streamlit sessions like the cached Postgres connection
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        for name, n_args, fn in _FUNCTIONS:
+            self._db.create_function(name, n_args, fn)
+        self.closed = 0
+
+    def cursor(self, name=None):
+        # Named (server-side) cursors have no SQLite equivalent; rows stream from the statement anyway
+        return SQLiteCursor(self)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+        self.closed = 1
+
+
+class SQLiteCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cur = connection._db.cursor()
+        self._returned = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._cur.close()
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def execute(self, sql, params=None):
+        self._returned = None
+        sql = translate(sql, params)
+        added = _ADD_COLUMN_RE.match(sql)
+        if added:
+            table, column, spec = added.groups()
+            existing = {row[1] for row in self._cur.execute(f"PRAGMA table_info({table})").fetchall()}
+            if column in existing:
+                return
+            sql = f"ALTER TABLE {table} ADD COLUMN {column} {spec}"
+        if not _NATIVE_RETURNING and _RETURNING_RE.search(sql):
+            self._cur.execute(_RETURNING_RE.sub("", sql), params or ())
+            self._returned = [(self._cur.lastrowid,)]
+            return
+        self._cur.execute(sql, params or ())
+
+    def executemany(self, sql, rows):
+        self._returned = None
+        rows = list(rows)
+        if rows:
+            self._cur.executemany(translate(sql, rows[0]), rows)
+
+    def fetchone(self):
+        if self._returned is not None:
+            return self._returned.pop(0) if self._returned else None
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        if self._returned is not None:
+            rows, self._returned = self._returned, []
+            return rows
+        return self._cur.fetchall()
+
+    def fetchmany(self, size):
+        if self._returned is not None:
+            rows, self._returned = self._returned[:size], self._returned[size:]
+            return rows
+        return self._cur.fetchmany(size)
@@ -0,0 +1,63 @@
+"""Sales-velocity and stock-out forecasting for reorder planning.
+
+Daily sold quantities per variant are loaded as one aggregate query and laid
+out as a (variants x days) matrix, so every rolling window is a single
+vectorised sum over all variants at once.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from database import run_query, register_table_cache, get_time
+
+# Rolling windows (days) and their weight in the blended velocity
+VELOCITY_WINDOWS = {7: 0.5, 28: 0.3, 56: 0.2}
+LEAD_TIME_DAYS = 7
+COVER_DAYS = 21
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_reorder_report(lead_time_days=LEAD_TIME_DAYS, cover_days=COVER_DAYS):
+    """Per-variant velocity, days to stock-out and suggested reorder quantity"""
+    horizon = max(VELOCITY_WINDOWS)
+    today = get_time().date()
+    variants = run_query("SELECT id, name, color, size, stock FROM public.variants")
+    # Days are bucketed in SQL; the day arithmetic is done here so it means the same on every backend
+    daily = run_query(
+        """SELECT variant_id, date_trunc('day', date) AS day, SUM(qty) AS qty
+           FROM public.sales
+           WHERE date >= %s AND variant_id IS NOT NULL
+           GROUP BY 1, 2""",
+        (today - timedelta(days=horizon - 1),),
+    )
+    if variants is None or variants.empty:
+        return None
+
+    # Row i of the matrix is variants.iloc[i], column d is "d days ago"
+    sold = np.zeros((len(variants), horizon))
+    if daily is not None and not daily.empty:
+        rows = pd.Index(variants['id']).get_indexer(daily['variant_id'])
+        days = (pd.Timestamp(today) - pd.to_datetime(daily['day'])).dt.days.to_numpy(dtype=int)
+        # Deleted variants and future-dated lines fall outside the matrix
+        keep = (rows >= 0) & (days >= 0) & (days < horizon)
+        np.add.at(sold, (rows[keep], days[keep]), daily['qty'].to_numpy(dtype=float)[keep])
+
+    velocity = np.zeros(len(variants))
+    for window, weight in VELOCITY_WINDOWS.items():
+        rate = sold[:, :window].sum(axis=1) / window
+        variants[f'velocity_{window}d'] = rate
+        velocity += weight * rate
+
+    stock = variants['stock'].fillna(0).to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_left = np.where(velocity > 0, np.maximum(stock, 0) / velocity, np.inf)
+    target = np.ceil(velocity * (lead_time_days + cover_days))
+
+    variants['velocity'] = velocity
+    variants['days_to_stockout'] = days_left
+    variants['reorder_qty'] = np.maximum(target - stock, 0).astype(int)
+    variants['urgent'] = days_left <= lead_time_days
+    return variants.sort_values(['urgent', 'days_to_stockout'], ascending=[False, True]).reset_index(drop=True)
+
+register_table_cache(get_reorder_report, ("sales", "variants"))
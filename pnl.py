@@ -0,0 +1,83 @@
+"""Profit & loss report computed in one SQL pass over sales, returns and expenses."""
+import pandas as pd
+import streamlit as st
+
+from database import run_queries, register_table_cache
+
+PNL_GRAINS = {"يومي": "day", "أسبوعي": "week", "شهري": "month"}
+# Returns are also logged as expenses in this category; counted once, under returns
+RETURNS_CATEGORY = "مرتجعات"
+
+PNL_QUERY = """
+WITH s AS (
+    SELECT date_trunc(%(grain)s, date) AS period,
+           SUM(total + COALESCE(discount, 0)) AS gross_sales,
+           SUM(COALESCE(discount, 0)) AS discounts,
+           SUM(total) AS net_sales,
+           SUM(total - profit) AS cogs,
+           SUM(profit) AS gross_profit
+    FROM public.sales
+    WHERE date >= %(since)s AND date < %(until)s
+    GROUP BY 1
+), r AS (
+    -- A returned line gives back its revenue and puts its cost back in stock
+    SELECT date_trunc(%(grain)s, r.return_date) AS period,
+           SUM(r.return_amount) AS returns,
+           SUM(COALESCE(s.total - s.profit, 0)) AS returns_cogs
+    FROM public.returns r LEFT JOIN public.sales s ON s.id = r.sale_id
+    WHERE r.return_date >= %(since)s AND r.return_date < %(until)s
+    GROUP BY 1
+), e AS (
+    SELECT date_trunc(%(grain)s, date) AS period, SUM(amount) AS expenses
+    FROM public.expenses
+    WHERE date >= %(since)s AND date < %(until)s AND category IS DISTINCT FROM %(returns_category)s
+    GROUP BY 1
+)
+SELECT COALESCE(s.period, r.period, e.period) AS period,
+       COALESCE(s.gross_sales, 0) AS gross_sales,
+       COALESCE(s.discounts, 0) AS discounts,
+       COALESCE(s.net_sales, 0) AS net_sales,
+       COALESCE(s.cogs, 0) AS cogs,
+       COALESCE(s.gross_profit, 0) AS gross_profit,
+       COALESCE(r.returns, 0) AS returns,
+       COALESCE(r.returns, 0) - COALESCE(r.returns_cogs, 0) AS returns_profit,
+       COALESCE(e.expenses, 0) AS expenses,
+       COALESCE(s.gross_profit, 0) - (COALESCE(r.returns, 0) - COALESCE(r.returns_cogs, 0))
+           - COALESCE(e.expenses, 0) AS net_profit
+FROM s
+FULL JOIN r ON r.period = s.period
+FULL JOIN e ON e.period = COALESCE(s.period, r.period)
+ORDER BY period
+"""
+
+# Per-category split of the same expenses, pivoted into columns in pandas
+# (no JSON aggregate, so it runs on every backend)
+EXPENSES_BY_CATEGORY_QUERY = """
+SELECT date_trunc(%(grain)s, date) AS period, COALESCE(category, 'عام') AS category, SUM(amount) AS amount
+FROM public.expenses
+WHERE date >= %(since)s AND date < %(until)s AND category IS DISTINCT FROM %(returns_category)s
+GROUP BY 1, 2
+"""
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_pnl(grain, since, until):
+    """P&L per day/week/month in [since, until); expense categories become `exp:<category>` columns"""
+    if grain not in PNL_GRAINS.values():
+        raise ValueError(f"unsupported grain: {grain}")
+    params = {"grain": grain, "since": since, "until": until, "returns_category": RETURNS_CATEGORY}
+    frames = run_queries({
+        "pnl": (PNL_QUERY, params),
+        "by_category": (EXPENSES_BY_CATEGORY_QUERY, params),
+    })
+    df, by_cat = frames["pnl"], frames["by_category"]
+    if df is None or df.empty:
+        return df
+    df['period'] = pd.to_datetime(df['period'])
+    if by_cat is None or by_cat.empty:
+        return df
+    by_cat['period'] = pd.to_datetime(by_cat['period'])
+    by_cat = by_cat.pivot_table(index='period', columns='category', values='amount', aggfunc='sum')
+    by_cat = by_cat.reindex(df['period']).fillna(0).add_prefix("exp:")
+    return pd.concat([df, by_cat.set_index(df.index)], axis=1)
+
+register_table_cache(get_pnl, ("sales", "returns", "expenses"))
@@ -0,0 +1,68 @@
+"""Customer rankings and RFM segments from the precomputed public.customer_stats table.
+
+customer_stats holds one row of lifetime totals per customer, updated in
+the checkout and return transactions, so these reads cover all history
+(archived months included) without scanning sales.
+"""
+import streamlit as st
+
+from database import run_query, register_table_cache
+
+# segment key -> label; rules are applied in this order on 1-5 quintile scores
+RFM_SEGMENTS = {
+    "champions": "🏆 الأبطال",
+    "loyal": "💎 الأوفياء",
+    "new": "🌱 جدد",
+    "at_risk": "⚠️ معرضون للفقد",
+    "lost": "💤 منقطعون",
+    "potential": "✨ واعدون",
+}
+
+RFM_QUERY = """
+WITH scored AS (
+    SELECT cs.customer_id, c.name, c.phone, cs.orders, cs.spend, cs.profit, cs.last_purchase,
+           NTILE(5) OVER (ORDER BY cs.last_purchase) AS r,
+           NTILE(5) OVER (ORDER BY cs.orders) AS f,
+           NTILE(5) OVER (ORDER BY cs.spend) AS m
+    FROM public.customer_stats cs
+    JOIN public.customers c ON c.id = cs.customer_id
+    WHERE cs.orders > 0
+)
+SELECT *, CASE
+        WHEN r >= 4 AND f >= 4 THEN 'champions'
+        WHEN f >= 4 THEN 'loyal'
+        WHEN r >= 4 AND f <= 2 THEN 'new'
+        WHEN r <= 2 AND f >= 3 THEN 'at_risk'
+        WHEN r <= 2 THEN 'lost'
+        ELSE 'potential'
+    END AS segment
+FROM scored
+ORDER BY spend DESC
+"""
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_top_customers(limit=5, since=None):
+    """Best customers by spend: lifetime from customer_stats, or since a date from invoice headers"""
+    if since is None:
+        return run_query(
+            """SELECT c.name, cs.spend AS total
+               FROM public.customer_stats cs JOIN public.customers c ON c.id = cs.customer_id
+               ORDER BY cs.spend DESC LIMIT %s""",
+            (limit,),
+        )
+    return run_query(
+        """SELECT COALESCE(c.name, 'ID ' || i.customer_id) AS name, SUM(i.total) AS total
+           FROM public.invoices i LEFT JOIN public.customers c ON c.id = i.customer_id
+           WHERE i.date >= %s
+           GROUP BY i.customer_id, c.name
+           ORDER BY total DESC LIMIT %s""",
+        (since, limit),
+    )
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_rfm_segments():
+    """Every buying customer with recency/frequency/monetary quintiles and a segment key"""
+    return run_query(RFM_QUERY)
+
+register_table_cache(get_top_customers, ("customer_stats", "invoices", "customers"))
+register_table_cache(get_rfm_segments, ("customer_stats", "customers"))
@@ -0,0 +1,35 @@
+"""Bundle a local Cairo font file as a content-hashed static asset.
+
+Copies the given .woff2 to static/fonts/cairo-<hash>.woff2 (removing older
+copies) so it can be served by Streamlit static serving and cached forever:
+a new font gets a new URL. styles.get_main_style() picks it up on start.
+
+    python scripts/bundle_font.py ~/Downloads/Cairo-Variable.woff2
+"""
+import glob
+import hashlib
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONTS_DIR = os.path.join(ROOT, "static", "fonts")
+
+
+def main():
+    if len(sys.argv) != 2 or not sys.argv[1].endswith(".woff2"):
+        sys.exit(f"usage: {sys.argv[0]} path/to/Cairo.woff2")
+    src = sys.argv[1]
+    with open(src, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+
+    os.makedirs(FONTS_DIR, exist_ok=True)
+    for old in glob.glob(os.path.join(FONTS_DIR, "cairo-*.woff2")):
+        os.remove(old)
+    dest = os.path.join(FONTS_DIR, f"cairo-{digest}.woff2")
+    shutil.copyfile(src, dest)
+    print(os.path.relpath(dest, ROOT))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Stock movement ledger: history, compaction into snapshots, and reconciliation.
+
+Every stock change appends a signed movement to public.stock_movements
+(written by checkout, returns, new items, the inventory editor and bulk
+adjustments). A variant's ledger balance is its snapshot plus the sum of
+its remaining movements; compaction folds old movements into the snapshot
+so the ledger stays small.
+
+    python stock_ledger.py --compact-days 90 --reconcile
+"""
+import argparse
+from datetime import timedelta
+
+import streamlit as st
+
+from database import get_db_connection, get_backend, run_query, register_table_cache, clear_all_cache, get_time, log_movements, DB_ERRORS
+
+DEFAULT_COMPACT_DAYS = 90
+
+MOVEMENT_REASONS = {
+    "sale": "بيع", "return": "مرتجع", "import": "إدخال", "edit": "تعديل يدوي",
+    "adjust": "تعديل جماعي", "adjust_undo": "تراجع عن تعديل", "reconcile": "تسوية",
+}
+
+def compact_movements(older_than_days=DEFAULT_COMPACT_DAYS):
+    """Fold movements older than the cutoff into per-variant snapshots; returns movements folded"""
+    cutoff = get_time() - timedelta(days=older_than_days)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as c:
+            # DELETE ... RETURNING claims the rows, so a concurrent run cannot fold them twice;
+            # summing here instead of in a data-modifying CTE keeps it runnable on SQLite
+            c.execute(
+                "DELETE FROM public.stock_movements WHERE created_at < %s RETURNING variant_id, delta",
+                (cutoff,),
+            )
+            sums = {}
+            folded = 0
+            for variant_id, delta in c.fetchall():
+                sums[variant_id] = sums.get(variant_id, 0) + delta
+                folded += 1
+            if sums:
+                get_backend().execute_batch(
+                    c,
+                    """INSERT INTO public.stock_snapshots (variant_id, as_of, stock) VALUES (%s, %s, %s)
+                       ON CONFLICT (variant_id) DO UPDATE SET
+                           stock = stock_snapshots.stock + EXCLUDED.stock,
+                           as_of = GREATEST(stock_snapshots.as_of, EXCLUDED.as_of)""",
+                    [(variant_id, cutoff, delta) for variant_id, delta in sums.items()],
+                )
+        conn.commit()
+    except DB_ERRORS:
+        conn.rollback()
+        raise
+    if folded:
+        clear_all_cache()
+    return folded
+
+RECONCILE_QUERY = """
+SELECT v.id, v.name, v.color, v.size, v.stock,
+       COALESCE(s.stock, 0) + COALESCE(m.delta, 0) AS ledger_stock
+FROM public.variants v
+LEFT JOIN public.stock_snapshots s ON s.variant_id = v.id
+LEFT JOIN (
+    SELECT variant_id, SUM(delta) AS delta FROM public.stock_movements GROUP BY variant_id
+) m ON m.variant_id = v.id
+WHERE v.stock IS DISTINCT FROM COALESCE(s.stock, 0) + COALESCE(m.delta, 0)
+ORDER BY v.name, v.color, v.size
+"""
+
+def reconcile_stock():
+    """Variants whose stock differs from their ledger balance (empty when everything agrees)"""
+    df = run_query(RECONCILE_QUERY)
+    if df is not None:
+        df['drift'] = df['stock'].fillna(0) - df['ledger_stock']
+    return df
+
+def settle_drift(df_drift):
+    """Record a `reconcile` movement per drifting variant so the ledger matches variants.stock"""
+    now = get_time()
+    rows = [(int(r['id']), int(r['drift']), "reconcile", None, now) for _, r in df_drift.iterrows()]
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as c:
+            log_movements(c, rows)
+        conn.commit()
+    except DB_ERRORS:
+        conn.rollback()
+        raise
+    return len(rows)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_stock_history(variant_id, limit=200):
+    """Latest movements of one variant with the running ledger balance after each"""
+    return run_query(
+        """SELECT created_at, delta, reason, ref_id,
+                  COALESCE((SELECT stock FROM public.stock_snapshots WHERE variant_id = %(id)s), 0)
+                  + SUM(delta) OVER (ORDER BY created_at, id) AS balance
+           FROM public.stock_movements WHERE variant_id = %(id)s
+           ORDER BY created_at DESC, id DESC LIMIT %(limit)s""",
+        {"id": variant_id, "limit": limit},
+    )
+
+register_table_cache(get_stock_history, ("variants",))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact and reconcile the stock ledger")
+    parser.add_argument("--compact-days", type=int, default=DEFAULT_COMPACT_DAYS,
+                        help="fold movements older than this many days into snapshots")
+    parser.add_argument("--reconcile", action="store_true", help="report variants whose stock disagrees with the ledger")
+    args = parser.parse_args()
+    print(f"{compact_movements(args.compact_days)} movements compacted")
+    if args.reconcile:
+        drift = reconcile_stock()
+        if drift is None:
+            raise SystemExit("reconciliation query failed")
+        for _, r in drift.iterrows():
+            print(f"{r['id']:>6} {r['name']} {r['color']} ({r['size']}): stock {r['stock']}, ledger {r['ledger_stock']}")
+        print(f"{len(drift)} variants out of balance")
+
+
+if __name__ == "__main__":
+    main()
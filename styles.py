@@ -1,8 +1,17 @@
-def get_main_style():
-    return """
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Cairo:wght@300;400;600;700;800&display=swap');
-    
+import functools
+import glob
+import hashlib
+import os
+import re
+import warnings
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# Served by Streamlit static serving (server.enableStaticServing in .streamlit/config.toml)
+STATIC_URL = "app/static"
+
+# Theme sheet. The Cairo font is self-hosted (see scripts/bundle_font.py) instead of
+# a remote Google Fonts @import, so first paint never waits on, or fails without, the internet.
+THEME_CSS = """
     :root {
         --primary: #D48896;
         --primary-dark: #B86B7A;
@@ -21,7 +30,7 @@ def get_main_style():
 
     /* تطبيق الخط العربي فقط على المحتوى - بدون التأثير على أيقونات Streamlit */
     .stApp, .stMarkdown, .stText, p, h1, h2, h3, h4, h5, h6, span, label, button { 
-        font-family: 'Cairo', sans-serif !important; 
+        font-family: 'Cairo', 'Segoe UI', Tahoma, sans-serif !important; 
     }
     
     /* اتجاه RTL للمحتوى فقط */
@@ -370,5 +379,60 @@ def get_main_style():
         height: 12px;
         border-radius: 4px;
     }
-</style>
 """
+
+@functools.lru_cache(maxsize=1)
+def bundled_font():
+    """Static path of the content-hashed Cairo file in static/fonts (None when not bundled)"""
+    fonts = sorted(glob.glob(os.path.join(STATIC_DIR, "fonts", "cairo-*.woff2")))
+    return f"fonts/{os.path.basename(fonts[-1])}" if fonts else None
+
+def _bundled_font_face():
+    font = bundled_font()
+    if font is None:
+        warnings.warn(
+            "Cairo font is not bundled; text falls back to system fonts. "
+            "Run scripts/bundle_font.py path/to/Cairo.woff2 and commit static/fonts.",
+            stacklevel=2,
+        )
+        return ""
+    # Relative to the stylesheet in static/css
+    return (
+        "@font-face{font-family:'Cairo';"
+        f"src:url('../{font}') format('woff2');"
+        "font-weight:200 1000;font-display:swap;}"
+    )
+
+def _minify(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css)
+    return re.sub(r":\s+", ":", css).replace(";}", "}").strip()
+
+def _write_stylesheet(css):
+    """Write `css` to static/css/theme-<hash>.css unless present; returns its static path"""
+    name = f"css/theme-{hashlib.sha256(css.encode('utf-8')).hexdigest()[:12]}.css"
+    path = os.path.join(STATIC_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for old in glob.glob(os.path.join(STATIC_DIR, "css", "theme-*.css")):
+            os.remove(old)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(css)
+        os.replace(tmp, path)
+    return name
+
+@functools.lru_cache(maxsize=1)
+def get_main_style():
+    """<link> to the theme stylesheet, served statically and cached by the browser.
+
+    Each rerun sends only this tag instead of the whole sheet. Falls back to an
+    inline <style> block when static/ is not writable.
+    """
+    css = _bundled_font_face() + _minify(THEME_CSS)
+    try:
+        name = _write_stylesheet(css)
+    except OSError:
+        return f"<style>{css.replace('../fonts/', f'{STATIC_URL}/fonts/')}</style>"
+    return f'<link rel="stylesheet" href="{STATIC_URL}/{name}">'
@@ -0,0 +1,44 @@
+"""Fixtures running the app's readers and reports against the embedded SQLite backend."""
+import os
+import sys
+
+import pytest
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cache_backend  # noqa: E402
+import database  # noqa: E402
+import db_backend  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Fresh migrated SQLite database; yields its connection"""
+    backend = db_backend.SQLiteBackend(str(tmp_path / "boutique.sqlite3"))
+    # get_backend() builds whatever make_backend returns, for every module that imported it
+    monkeypatch.setattr(db_backend, "make_backend", lambda cfg, postgres_kwargs: backend)
+    # Keep the shared frame tier per test instead of the on-disk default
+    monkeypatch.setattr(cache_backend, "make_backend", lambda cfg: cache_backend.MemoryCache())
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    database.init_db()
+    database.migrate_db()
+    conn = database.get_db_connection()
+    yield conn
+    conn.close()
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+@pytest.fixture
+def insert(db):
+    """insert(table, **columns) -> new row id"""
+    def insert(table, **columns):
+        names = ", ".join(columns)
+        marks = ", ".join(["%s"] * len(columns))
+        with db.cursor() as c:
+            c.execute(f"INSERT INTO public.{table} ({names}) VALUES ({marks}) RETURNING id", tuple(columns.values()))
+            row_id = c.fetchone()[0]
+        db.commit()
+        return row_id
+    return insert
@@ -0,0 +1,66 @@
+"""Bulk adjustments with undo on the embedded SQLite backend."""
+from bulk_adjust import apply_adjustment, get_adjustments, preview_adjustment, undo_adjustment
+from stock_ledger import get_stock_history
+
+
+def _values(db, field):
+    with db.cursor() as c:
+        c.execute(f"SELECT id, {field} FROM public.variants ORDER BY id")
+        return dict(c.fetchall())
+
+
+def _seed(insert):
+    return [
+        insert("variants", name="Dress", color="Red", size="M", cost=10.0, price=20.0, stock=5),
+        insert("variants", name="Dress", color="Blue", size="L", cost=10.0, price=30.0, stock=2),
+        insert("variants", name="Skirt", color="Red", size="S", cost=8.0, price=15.0, stock=9),
+    ]
+
+
+def test_preview_filters_by_lists_and_stock_range(insert):
+    red, blue, skirt = _seed(insert)
+
+    prev = preview_adjustment({"models": ["Dress", "Skirt"], "colors": ["Red"], "stock_max": 6}, "price", "pct", 10)
+
+    assert prev["id"].tolist() == [red]
+    assert prev["old_value"].tolist() == [20.0]
+    assert prev["new_value"].tolist() == [22.0]
+    assert len(preview_adjustment({}, "stock", "abs", -3)) == 3
+
+
+def test_apply_and_undo_price(db, insert):
+    red, blue, skirt = _seed(insert)
+
+    adj_id, rows = apply_adjustment({"models": ["Dress"]}, "price", "pct", -10)
+
+    assert rows == 2
+    assert _values(db, "price") == {red: 18.0, blue: 27.0, skirt: 15.0}
+    assert get_adjustments()["row_count"].tolist() == [2]
+    assert undo_adjustment(adj_id) == (2, 0)
+    assert _values(db, "price") == {red: 20.0, blue: 30.0, skirt: 15.0}
+    assert undo_adjustment(adj_id) == (0, 0)
+
+
+def test_stock_adjustment_is_ledgered_and_undone_by_delta(db, insert):
+    red, blue, skirt = _seed(insert)
+
+    adj_id, rows = apply_adjustment({"sizes": ["M", "L"]}, "stock", "abs", -3)
+    assert rows == 2
+    assert _values(db, "stock") == {red: 2, blue: 0, skirt: 9}
+    # A sale after the adjustment survives the undo
+    with db.cursor() as c:
+        c.execute("UPDATE public.variants SET stock = stock - 1 WHERE id = %s", (red,))
+    db.commit()
+
+    assert undo_adjustment(adj_id) == (2, 0)
+    assert _values(db, "stock") == {red: 4, blue: 2, skirt: 9}
+    assert get_stock_history(blue)["balance"].tolist() == [0, -2]
+
+
+def test_undo_skips_prices_changed_by_a_later_adjustment(db, insert):
+    red, blue, skirt = _seed(insert)
+    first, _ = apply_adjustment({"models": ["Dress"]}, "price", "abs", 5)
+    apply_adjustment({"colors": ["Blue"]}, "price", "abs", 10)
+
+    assert undo_adjustment(first) == (1, 1)
+    assert _values(db, "price") == {red: 20.0, blue: 45.0, skirt: 15.0}
@@ -0,0 +1,112 @@
+"""Reports and ledger maintenance on the embedded SQLite backend."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import get_report_data, get_time, log_movements, record_sale
+from forecast import get_reorder_report
+from pnl import get_pnl
+from rfm import get_rfm_segments
+from stock_ledger import compact_movements, get_stock_history, reconcile_stock
+from valuation import get_valuation_trend, snapshot_valuation
+
+
+def _naive(dt):
+    return dt.replace(tzinfo=None)
+
+
+def test_reorder_report_counts_days_ago(insert):
+    now = get_time()
+    vid = insert("variants", name="Dress", color="Red", size="M", cost=10.0, price=20.0, stock=5)
+    insert("sales", variant_id=vid, qty=7, total=140.0, profit=70.0, date=now)
+    insert("sales", variant_id=vid, qty=14, total=280.0, profit=140.0, date=now - timedelta(days=10))
+    insert("sales", variant_id=vid, qty=99, total=1.0, profit=1.0, date=now - timedelta(days=100))
+
+    report = get_reorder_report()
+
+    row = report.iloc[0]
+    assert row["velocity_7d"] == pytest.approx(7 / 7)
+    assert row["velocity_28d"] == pytest.approx(21 / 28)
+    assert row["velocity_56d"] == pytest.approx(21 / 56)
+
+
+def test_pnl_splits_expenses_by_category(insert):
+    day = _naive(get_time()).replace(hour=12, minute=0, second=0, microsecond=0)
+    sale = insert("sales", qty=1, total=100.0, profit=40.0, discount=10.0, date=day)
+    insert("returns", sale_id=sale, qty=1, return_amount=100.0, return_date=day)
+    insert("expenses", amount=30.0, category="إيجار", date=day)
+    insert("expenses", amount=5.0, category=None, date=day)
+    insert("expenses", amount=100.0, category="مرتجعات", date=day)
+
+    pnl = get_pnl("day", day.date(), (day + timedelta(days=1)).date())
+
+    assert len(pnl) == 1
+    row = pnl.iloc[0]
+    assert row["gross_sales"] == 110.0
+    assert row["net_sales"] == 100.0
+    assert row["returns_profit"] == 40.0
+    assert row["expenses"] == 35.0
+    assert row["exp:إيجار"] == 30.0
+    assert row["exp:عام"] == 5.0
+    assert "exp:مرتجعات" not in pnl.columns
+    assert row["net_profit"] == 40.0 - 40.0 - 35.0
+
+
+def test_valuation_trend_for_selected_models(insert):
+    insert("variants", name="Dress", color="Red", size="M", cost=10.0, price=25.0, stock=4)
+    insert("variants", name="Dress", color="Blue", size="L", cost=10.0, price=25.0, stock=1)
+    insert("variants", name="Skirt", color="Red", size="S", cost=8.0, price=15.0, stock=3)
+    insert("variants", name="Scarf", color="Red", size="-", cost=2.0, price=5.0, stock=9)
+    today = get_time().date()
+
+    assert snapshot_valuation(today) == 3
+    trend = get_valuation_trend(today, ("Dress", "Skirt"))
+
+    assert trend["name"].tolist() == ["Dress", "Skirt"]
+    assert trend["stock"].tolist() == [5, 3]
+    assert trend["cost_value"].tolist() == [50.0, 24.0]
+    assert get_valuation_trend(today)["stock"].tolist() == [17]
+
+
+def test_compaction_folds_old_movements_into_snapshots(db, insert):
+    now = _naive(get_time())
+    vid = insert("variants", name="Dress", color="Red", size="M", cost=10.0, price=20.0, stock=6)
+    with db.cursor() as c:
+        log_movements(c, [
+            (vid, 10, "import", None, now - timedelta(days=200)),
+            (vid, -3, "sale", None, now - timedelta(days=120)),
+            (vid, -1, "sale", None, now - timedelta(days=1)),
+        ])
+    db.commit()
+
+    assert compact_movements(90) == 2
+    assert compact_movements(90) == 0
+
+    with db.cursor() as c:
+        c.execute("SELECT stock FROM public.stock_snapshots WHERE variant_id = %s", (vid,))
+        assert c.fetchone()[0] == 7
+        c.execute("SELECT COUNT(*) FROM public.stock_movements")
+        assert c.fetchone()[0] == 1
+    assert reconcile_stock().empty
+
+
+def test_checkout_feeds_sales_report_and_customer_stats(insert):
+    vid = insert("variants", name="Dress", color="Red", size="M", cost=10.0, price=20.0, stock=5)
+    line = {"id": vid, "name": "Dress", "color": "Red", "size": "M", "price": 20.0, "qty": 2, "cost": 10.0, "total": 40.0}
+
+    record_sale({"name": "Sara", "phone": "", "address": ""}, [line])
+    lines, kpis = get_report_data()
+
+    assert len(lines) == 1
+    assert kpis == {"sales": 40.0, "profit": 20.0, "orders": 1, "avg_basket": 40.0}
+    rfm = get_rfm_segments()
+    assert rfm["name"].tolist() == ["Sara"]
+    assert rfm["orders"].tolist() == [1]
+    assert get_stock_history(vid)["balance"].tolist() == [-2]
+
+
+def test_sql_now_matches_stored_wall_clock(db):
+    with db.cursor() as c:
+        c.execute("SELECT now()")
+        sql_now = datetime.fromisoformat(c.fetchone()[0])
+    assert abs(sql_now - _naive(get_time())) < timedelta(seconds=5)
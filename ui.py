@@ -0,0 +1,63 @@
+import streamlit as st
+import functools
+import tempfile
+import time
+
+from database import export_csv, LOW_STOCK_THRESHOLD
+
+# --- دوال مساعدة للواجهة (مشتركة بين الصفحات) ---
+
+def get_stock_status(stock):
+    """الحصول على حالة المخزون بشكل مرئي"""
+    if stock <= 0:
+        return ("🔴 نفذ", "danger")
+    elif stock < LOW_STOCK_THRESHOLD:
+        return ("🟡 قليل", "warning")
+    else:
+        return ("🟢 متوفر", "success")
+
+def render_stock_bar(stock, max_stock=20):
+    """رسم شريط تقدم المخزون"""
+    percentage = min(100, (stock / max_stock) * 100)
+    color = "#EF4444" if stock < LOW_STOCK_THRESHOLD else "#F59E0B" if stock < 2 * LOW_STOCK_THRESHOLD else "#10B981"
+    return f"""
+    <div class="stock-bar">
+        <div class="stock-bar-fill" style="width: {percentage}%; background: {color};"></div>
+    </div>
+    """
+
+def render_export_button(container, label, key, query, file_name, archive_table=None):
+    """تصدير كامل السجل عند النقر فقط: يُكتب الملف على القرص دفعة بدفعة ولا يُحفظ في الجلسة"""
+    include_archive = archive_table is not None and container.checkbox(
+        "📦 تضمين الأرشيف", key=f"arch_{key}", help="إضافة الأشهر المؤرشفة (Parquet) إلى الملف"
+    )
+
+    def build_file():
+        leading = ()
+        if include_archive:
+            from archive import iter_archived
+            leading = iter_archived(archive_table)
+        out = tempfile.TemporaryFile()
+        export_csv(out, query, leading_chunks=leading)
+        out.seek(0)
+        return out
+
+    container.download_button(label, build_file, file_name, "text/csv", key=f"dl_{key}")
+
+def perf_enabled():
+    return st.query_params.get("perf") == "1"
+
+def timed_fragment(label):
+    """st.fragment مع قياس زمن إعادة التشغيل (يظهر عند ?perf=1)"""
+    def decorator(func):
+        @st.fragment
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            func(*args, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            st.session_state.setdefault('perf', {})[label] = elapsed_ms
+            if perf_enabled():
+                st.caption(f"⏱️ {label}: {elapsed_ms:.1f} ms")
+        return wrapper
+    return decorator
@@ -0,0 +1,97 @@
+"""Daily inventory valuation snapshots (per variant and per model) and their trend.
+
+One set-based INSERT ... SELECT per level copies today's stock, capital
+(stock * cost) and sale potential into public.inventory_valuation and
+public.model_valuation. Trend charts read the small per-model table
+instead of replaying sales history. Run it daily from cron; the app also
+takes the day's snapshot on first use if the job has not run.
+
+    python valuation.py        # snapshot today (overwrites today's rows)
+"""
+import argparse
+
+import streamlit as st
+
+from database import get_db_connection, run_query, register_table_cache, get_time, DB_ERRORS
+
+def snapshot_valuation(day=None, overwrite=True):
+    """Write the valuation snapshot for `day` (default today) from current stock; returns models written"""
+    day = day or get_time().date()
+    if overwrite:
+        on_variant = """DO UPDATE SET name = EXCLUDED.name, color = EXCLUDED.color, size = EXCLUDED.size,
+            stock = EXCLUDED.stock, cost_value = EXCLUDED.cost_value, sale_value = EXCLUDED.sale_value"""
+        on_model = """DO UPDATE SET variants = EXCLUDED.variants, stock = EXCLUDED.stock,
+            cost_value = EXCLUDED.cost_value, sale_value = EXCLUDED.sale_value"""
+    else:
+        on_variant = on_model = "DO NOTHING"
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute(
+                f"""INSERT INTO public.inventory_valuation
+                        (day, variant_id, name, color, size, stock, cost_value, sale_value)
+                    SELECT %s, id, name, color, size, COALESCE(stock, 0),
+                           COALESCE(stock, 0) * COALESCE(cost, 0), COALESCE(stock, 0) * COALESCE(price, 0)
+                    FROM public.variants
+                    WHERE TRUE  -- lets SQLite parse ON CONFLICT after INSERT ... SELECT
+                    ON CONFLICT (day, variant_id) {on_variant}""",
+                (day,),
+            )
+            c.execute(
+                f"""INSERT INTO public.model_valuation (day, name, variants, stock, cost_value, sale_value)
+                    SELECT day, COALESCE(name, ''), COUNT(*), SUM(stock), SUM(cost_value), SUM(sale_value)
+                    FROM public.inventory_valuation WHERE day = %s
+                    GROUP BY day, COALESCE(name, '')
+                    ON CONFLICT (day, name) {on_model}""",
+                (day,),
+            )
+            models = c.rowcount
+        conn.commit()
+    except DB_ERRORS:
+        conn.rollback()
+        raise
+    get_valuation_trend.clear()
+    get_valued_models.clear()
+    return models
+
+@st.cache_resource(show_spinner=False)
+def ensure_daily_snapshot(day):
+    """Take `day`'s snapshot once per process if the scheduled job has not (keyed by day)"""
+    try:
+        return snapshot_valuation(day, overwrite=False)
+    except DB_ERRORS:
+        return 0
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_valuation_trend(since, models=()):
+    """Daily stock, capital and sale potential since `since`; per model when `models` is given"""
+    if models:
+        # One placeholder per model (rather than = ANY(array)) so SQLite runs it too
+        marks = ", ".join(["%s"] * len(models))
+        return run_query(
+            f"""SELECT day, name, stock, cost_value, sale_value FROM public.model_valuation
+                WHERE day >= %s AND name IN ({marks}) ORDER BY day, name""",
+            (since, *models),
+        )
+    return run_query(
+        """SELECT day, SUM(stock) AS stock, SUM(cost_value) AS cost_value, SUM(sale_value) AS sale_value
+           FROM public.model_valuation WHERE day >= %s GROUP BY day ORDER BY day""",
+        (since,),
+    )
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_valued_models(since):
+    """Model names with snapshots since `since`"""
+    df = run_query("SELECT DISTINCT name FROM public.model_valuation WHERE day >= %s ORDER BY name", (since,))
+    return [] if df is None else df['name'].tolist()
+
+register_table_cache(get_valuation_trend, ("model_valuation",))
+register_table_cache(get_valued_models, ("model_valuation",))
+
+def main():
+    argparse.ArgumentParser(description="Snapshot today's inventory valuation").parse_args()
+    print(f"{snapshot_valuation()} models valued")
+
+
+if __name__ == "__main__":
+    main()
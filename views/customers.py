@@ -0,0 +1,75 @@
+import streamlit as st
+
+from database import get_customers
+from rfm import RFM_SEGMENTS, get_rfm_segments
+
+# ==========================================
+# صفحة 4: العملاء
+# ==========================================
+
+st.markdown("## 👥 دليل العملاء")
+
+df_cust = get_customers()
+
+if df_cust is not None and not df_cust.empty:
+    # بحث
+    search = st.text_input("🔍 بحث عن عميل:", placeholder="اكتب الاسم أو الهاتف...")
+
+    df_display = df_cust
+    if search:
+        df_display = df_cust[
+            df_cust['name'].str.contains(search, case=False, na=False) |
+            df_cust['phone'].str.contains(search, case=False, na=False)
+        ]
+
+    st.dataframe(
+        df_display,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "id": None,
+            "username": None,
+            "name": st.column_config.TextColumn("الاسم"),
+            "phone": st.column_config.TextColumn("📞 الهاتف"),
+            "address": st.column_config.TextColumn("📍 العنوان"),
+        }
+    )
+
+    st.caption(f"إجمالي العملاء: {len(df_cust)}")
+else:
+    st.info("📭 لا يوجد عملاء مسجلين بعد")
+
+# ==========================================
+# شرائح العملاء (RFM) من الإحصاءات المحسوبة مسبقاً
+# ==========================================
+st.divider()
+st.markdown("### 🎯 شرائح العملاء")
+
+df_rfm = get_rfm_segments()
+if df_rfm is not None and not df_rfm.empty:
+    counts = df_rfm['segment'].value_counts()
+    cols = st.columns(len(RFM_SEGMENTS))
+    for col, (key, label) in zip(cols, RFM_SEGMENTS.items()):
+        col.metric(label, int(counts.get(key, 0)))
+
+    segment = st.selectbox("عرض شريحة", list(RFM_SEGMENTS), format_func=RFM_SEGMENTS.get, key="rfm_segment")
+    st.dataframe(
+        df_rfm[df_rfm['segment'] == segment],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "customer_id": None,
+            "segment": None,
+            "name": st.column_config.TextColumn("الاسم"),
+            "phone": st.column_config.TextColumn("📞 الهاتف"),
+            "orders": st.column_config.NumberColumn("الطلبات", format="%d"),
+            "spend": st.column_config.NumberColumn("الإنفاق", format="%d د.ع"),
+            "profit": st.column_config.NumberColumn("الربح", format="%d د.ع"),
+            "last_purchase": st.column_config.DatetimeColumn("آخر شراء", format="D MMM YYYY"),
+            "r": st.column_config.NumberColumn("R"),
+            "f": st.column_config.NumberColumn("F"),
+            "m": st.column_config.NumberColumn("M"),
+        }
+    )
+else:
+    st.info("لا توجد مشتريات كافية لتقسيم العملاء")
@@ -0,0 +1,95 @@
+import streamlit as st
+
+from database import run_query, get_expense_summary, get_expense_log, clear_all_cache, get_time
+from ui import render_export_button
+
+# ==========================================
+# صفحة 5: المصاريف
+# ==========================================
+
+st.markdown("## 💸 إدارة المصاريف")
+
+col_form, col_summary = st.columns([1, 1])
+
+with col_form:
+    st.markdown("#### ➕ تسجيل مصروف جديد")
+    with st.form("exp_form"):
+        amt = st.number_input("💵 المبلغ", min_value=0.0)
+        category = st.selectbox("📁 التصنيف", ["عام", "رواتب", "إيجار", "فواتير", "مشتريات", "نقل", "أخرى"])
+        rsn = st.text_input("📝 السبب/الوصف")
+
+        if st.form_submit_button("✅ تسجيل", type="primary", use_container_width=True):
+            if amt > 0:
+                run_query(
+                    "INSERT INTO public.expenses (amount, reason, category, date) VALUES (%s, %s, %s, %s)", 
+                    (amt, rsn, category, get_time()), commit=True, fetch=False
+                )
+                clear_all_cache()
+                st.toast("✅ تم تسجيل المصروف", icon="✅")
+                st.rerun()
+            else:
+                st.error("❌ أدخل مبلغاً صحيحاً")
+
+with col_summary:
+    st.markdown("#### 📊 ملخص المصاريف")
+    df_sum = get_expense_summary()
+
+    if df_sum is not None and not df_sum.empty:
+        monthly = df_sum['month_total'].sum()
+        total = df_sum['total'].sum()
+
+        st.metric("هذا الشهر", f"{monthly:,.0f} د.ع")
+        st.metric("الإجمالي الكلي", f"{total:,.0f} د.ع")
+
+        # حسب التصنيف
+        by_cat = df_sum.set_index('category')[['month_total', 'total']]
+        by_cat.columns = ['هذا الشهر', 'الإجمالي']
+        st.dataframe(by_cat, use_container_width=True)
+
+        # Export
+        render_export_button(
+            st, "📥 تصدير المصاريف", "expenses",
+            "SELECT * FROM public.expenses ORDER BY date DESC", "expenses.csv",
+            archive_table="expenses"
+        )
+    else:
+        st.info("لا توجد مصاريف مسجلة")
+
+# سجل المصاريف
+st.divider()
+st.markdown("#### 📜 سجل المصاريف")
+PAGE_SIZE = 20
+categories = [] if df_sum is None else df_sum['category'].dropna().tolist()
+col_cat, col_page = st.columns([2, 1])
+with col_cat:
+    cat_filter = st.selectbox(
+        "📁 التصنيف", ["الكل"] + categories, key="exp_cat",
+        on_change=lambda: st.session_state.update(exp_page=1)
+    )
+selected = None if cat_filter == "الكل" else cat_filter
+if df_sum is None or df_sum.empty:
+    entries = 0
+elif selected is None:
+    entries = int(df_sum['entries'].sum())
+else:
+    entries = int(df_sum.loc[df_sum['category'] == selected, 'entries'].sum())
+pages = max(1, -(-entries // PAGE_SIZE))
+with col_page:
+    page_no = st.number_input(f"الصفحة (من {pages})", 1, pages, 1, key="exp_page")
+
+df_exp = get_expense_log(page_no - 1, PAGE_SIZE, selected)
+if df_exp is not None and not df_exp.empty:
+    st.dataframe(
+        df_exp,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "id": None,
+            "amount": st.column_config.NumberColumn("المبلغ", format="%d د.ع"),
+            "reason": st.column_config.TextColumn("السبب"),
+            "category": st.column_config.TextColumn("التصنيف"),
+            "date": st.column_config.DatetimeColumn("التاريخ", format="D MMM YYYY - h:mm a"),
+        }
+    )
+else:
+    st.info("📭 لا توجد مصاريف مسجلة")
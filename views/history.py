@@ -0,0 +1,78 @@
+import streamlit as st
+import time
+
+from database import get_sales, clear_all_cache, record_return, DB_ERRORS
+
+# ==========================================
+# صفحة 6: السجل والرواجع
+# ==========================================
+
+st.markdown("## 📜 سجل العمليات")
+
+df_sales_log = get_sales(100)
+
+if df_sales_log is not None and not df_sales_log.empty:
+    st.dataframe(
+        df_sales_log,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "id": st.column_config.NumberColumn("رقم"),
+            "product_name": st.column_config.TextColumn("المنتج"),
+            "qty": st.column_config.NumberColumn("الكمية"),
+            "total": st.column_config.NumberColumn("المبلغ", format="%d د.ع"),
+            "profit": st.column_config.NumberColumn("الربح", format="%d د.ع"),
+            "date": st.column_config.DatetimeColumn("التاريخ", format="D MMM - h:mm a"),
+            "invoice_id": st.column_config.TextColumn("الفاتورة"),
+            "delivery_duration": st.column_config.TextColumn("التوصيل"),
+            "customer_id": None,
+            "variant_id": None,
+        }
+    )
+else:
+    st.info("📭 لا توجد عمليات مسجلة")
+
+st.divider()
+st.markdown("### ↩️ إرجاع منتج")
+
+with st.form("return_form"):
+    ret_id = st.number_input("أدخل رقم العملية (ID) للإرجاع:", min_value=1, step=1)
+    submitted = st.form_submit_button("🔍 بحث عن العملية")
+
+    if submitted and df_sales_log is not None:
+        sale_rec = df_sales_log[df_sales_log['id'] == ret_id]
+        if not sale_rec.empty:
+            r = sale_rec.iloc[0]
+            st.session_state.return_sale = r.to_dict()
+            st.session_state.show_return_confirm = True
+        else:
+            st.error("❌ رقم العملية غير صحيح")
+
+# تأكيد الإرجاع (خارج الفورم لتجنب مشكلة الأزرار المتداخلة)
+if st.session_state.get('show_return_confirm') and st.session_state.get('return_sale'):
+    r = st.session_state.return_sale
+    st.warning(f"⚠️ هل أنت متأكد من إرجاع: **{r['product_name']}** (العدد: {r['qty']})؟")
+
+    col_yes, col_no = st.columns(2)
+    with col_yes:
+        if st.button("✅ تأكيد الإرجاع", type="primary", use_container_width=True):
+            with st.spinner("جاري المعالجة..."):
+                # إرجاع للمخزن + تسجيل المرتجع والمصروف وحركة المخزون في معاملة واحدة
+                try:
+                    record_return(r)
+                except DB_ERRORS as e:
+                    st.error(f"❌ فشلت عملية الإرجاع: {e}")
+                    st.stop()
+
+                clear_all_cache()
+                del st.session_state.show_return_confirm
+                del st.session_state.return_sale
+                st.success("✅ تمت عملية الإرجاع بنجاح")
+                time.sleep(1)
+                st.rerun()
+
+    with col_no:
+        if st.button("❌ إلغاء", use_container_width=True):
+            del st.session_state.show_return_confirm
+            del st.session_state.return_sale
+            st.rerun()
@@ -0,0 +1,463 @@
+import streamlit as st
+import time
+import pandas as pd
+
+from database import (
+    get_db_connection, get_inventory, clear_all_cache, get_time, log_movements, add_variant,
+    DB_ERRORS, UNIQUE_VIOLATIONS, LOW_STOCK_THRESHOLD,
+)
+
+# ==========================================
+# صفحة 2: المخزون (عرض احترافي لمتجر ملابس)
+# ==========================================
+
+st.markdown("## 📦 مخزون المتجر")
+
+df = get_inventory()
+if df is not None and not df.empty:
+    # مؤشرات الأداء السريعة
+    df['total_cost_value'] = df['stock'] * df['cost']
+    df['total_sale_potential'] = df['stock'] * df['price']
+
+    c1, c2, c3, c4 = st.columns(4)
+    total_items = df['stock'].sum()
+    total_cost = df['total_cost_value'].sum()
+    total_sales = df['total_sale_potential'].sum()
+    low_stock = len(df[df['stock'] < LOW_STOCK_THRESHOLD])
+
+    c1.metric("📦 إجمالي القطع", f"{total_items:,}")
+    c2.metric("💰 رأس المال", f"{total_cost:,.0f}")
+    c3.metric("📈 القيمة البيعية", f"{total_sales:,.0f}", delta=f"+{(total_sales-total_cost):,.0f} ربح")
+    c4.metric("⚠️ نواقص", f"{low_stock} موديل", delta_color="inverse")
+
+    st.divider()
+
+    # خيارات العرض
+    view_type = st.radio(
+        "طريقة العرض:", 
+        ["👗 عرض المتجر", "📊 ملخص سريع", "🔁 إعادة الطلب", "⚙️ تعديل جماعي", "🧾 حركة المخزون", "📝 تفاصيل للتعديل"], 
+        horizontal=True
+    )
+
+    # ========================================
+    # العرض الجديد: عرض المتجر (نظيف ومرتب)
+    # ========================================
+    if "عرض المتجر" in view_type:
+        # فلتر البحث
+        col_search, col_stock_filter = st.columns([2, 1])
+        with col_search:
+            search_model = st.text_input("🔍 بحث عن موديل:", placeholder="اكتب اسم الموديل...", key="matrix_search")
+        with col_stock_filter:
+            show_filter = st.selectbox("عرض:", ["الكل", "متوفر فقط", "فيه نواقص"], key="matrix_filter")
+
+        st.divider()
+
+        # تجميع البيانات حسب مفتاح الموديل (رقم) في تمريرة واحدة بدل مقارنة الاسم لكل موديل
+        # (مع الاسم، كي لا تختفي المنتجات التي لم يُملأ مفتاحها بعد)
+        models = sorted(df.groupby(['product_id', 'name'], sort=False, dropna=False), key=lambda g: str(g[1]['name'].iloc[0]))
+
+        for _, model_data in models:
+            model_name = str(model_data['name'].iloc[0])
+            # تطبيق فلتر البحث
+            if search_model and search_model.lower() not in model_name.lower():
+                continue
+
+            model_total = int(model_data['stock'].sum())
+            model_has_low = (model_data['stock'] < LOW_STOCK_THRESHOLD).any()
+
+            # تطبيق فلتر المخزون
+            if show_filter == "متوفر فقط" and model_total == 0:
+                continue
+            if show_filter == "فيه نواقص" and not model_has_low:
+                continue
+
+            # حالة المخزون
+            if model_total == 0:
+                status_icon = "🔴"
+                status_text = f"{model_name} - نفذ"
+            elif model_has_low:
+                status_icon = "🟡"
+                status_text = f"{model_name} ({model_total} قطعة)"
+            else:
+                status_icon = "🟢"
+                status_text = f"{model_name} ({model_total} قطعة)"
+
+            # عرض الموديل في Expander
+            with st.expander(f"{status_icon} {status_text}", expanded=False):
+                # جدول لكل لون
+                for _, color_data in model_data.groupby(['color_id', 'color'], sort=False, dropna=False):
+                    color = color_data.iloc[0]['color']
+                    price = color_data.iloc[0]['price']
+
+                    st.markdown(f"**🎨 {color}** - 💵 {price:,.0f} د.ع")
+
+                    # عرض المقاسات في صف واحد
+                    size_cols = st.columns(len(color_data))
+                    for idx, (_, row) in enumerate(color_data.iterrows()):
+                        stock = int(row['stock'])
+                        size = row['size']
+
+                        with size_cols[idx]:
+                            if stock >= LOW_STOCK_THRESHOLD:
+                                st.success(f"{size}: {stock}")
+                            elif stock > 0:
+                                st.warning(f"{size}: {stock}")
+                            else:
+                                st.error(f"{size}: 0")
+
+                    st.markdown("---")
+
+        # زر التصدير
+        st.divider()
+        csv = df.to_csv(index=False).encode('utf-8-sig')
+        st.download_button(
+            "📥 تصدير المخزون كاملاً (CSV)",
+            csv,
+            "inventory_full.csv",
+            "text/csv",
+            use_container_width=False
+        )
+
+    # ========================================
+    # العرض الملخص السريع
+    # ========================================
+    elif "ملخص" in view_type:
+        from catalog import get_model_summary
+
+        grouped = get_model_summary()
+        if grouped is None:
+            st.stop()
+        grouped = grouped[['name', 'stock', 'colors', 'sale_value']]
+        grouped.columns = ['الموديل', 'الكمية', 'الألوان', 'القيمة']
+
+        st.dataframe(
+            grouped,
+            use_container_width=True,
+            column_config={
+                "الكمية": st.column_config.ProgressColumn(
+                    "الكمية",
+                    format="%d",
+                    min_value=0,
+                    max_value=int(grouped['الكمية'].max()) if not grouped.empty else 10
+                ),
+                "القيمة": st.column_config.NumberColumn("القيمة", format="%d د.ع")
+            },
+            hide_index=True
+        )
+
+    # ========================================
+    # تقرير إعادة الطلب (حسب سرعة البيع الفعلية)
+    # ========================================
+    elif "إعادة الطلب" in view_type:
+        from forecast import get_reorder_report, LEAD_TIME_DAYS
+
+        df_fc = get_reorder_report()
+        if df_fc is not None and not df_fc.empty:
+            urgent = int(df_fc['urgent'].sum())
+            to_order = df_fc[df_fc['reorder_qty'] > 0]
+            c_u, c_o = st.columns(2)
+            c_u.metric("🚨 ينفد خلال مدة التوريد", f"{urgent} موديل", help=f"{LEAD_TIME_DAYS} أيام")
+            c_o.metric("📦 قطع مقترح طلبها", f"{int(to_order['reorder_qty'].sum()):,}")
+
+            only_needed = st.toggle("عرض المطلوب فقط", value=True, key="reorder_only")
+            view = to_order if only_needed else df_fc
+            st.dataframe(
+                view[['name', 'color', 'size', 'stock', 'velocity', 'days_to_stockout', 'reorder_qty']],
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "name": st.column_config.TextColumn("الموديل"),
+                    "color": st.column_config.TextColumn("اللون"),
+                    "size": st.column_config.TextColumn("القياس"),
+                    "stock": st.column_config.NumberColumn("المخزون", format="%d"),
+                    "velocity": st.column_config.NumberColumn("قطعة/يوم", format="%.2f"),
+                    "days_to_stockout": st.column_config.NumberColumn("أيام حتى النفاد", format="%.0f"),
+                    "reorder_qty": st.column_config.NumberColumn("الكمية المقترحة", format="%d"),
+                }
+            )
+        else:
+            st.info("لا توجد بيانات كافية للتوقع")
+
+    # ========================================
+    # تعديل جماعي للأسعار والمخزون (تحديث واحد في قاعدة البيانات)
+    # ========================================
+    elif "تعديل جماعي" in view_type:
+        from bulk_adjust import preview_adjustment, apply_adjustment, undo_adjustment, get_adjustments
+
+        field_labels = {"price": "سعر البيع", "cost": "التكلفة", "stock": "المخزون"}
+        mode_labels = {"pct": "نسبة %", "abs": "قيمة ثابتة"}
+
+        f1, f2, f3 = st.columns(3)
+        models = f1.multiselect("👗 الموديل", sorted(df['name'].astype(str).unique()), key="bulk_models")
+        colors = f2.multiselect("🎨 اللون", sorted(df['color'].astype(str).unique()), key="bulk_colors")
+        sizes = f3.multiselect("📐 القياس", sorted(df['size'].astype(str).unique()), key="bulk_sizes")
+        s1, s2 = st.columns(2)
+        stock_min = s1.number_input("المخزون من", min_value=0, value=None, key="bulk_stock_min")
+        stock_max = s2.number_input("المخزون إلى", min_value=0, value=None, key="bulk_stock_max")
+
+        a1, a2, a3 = st.columns(3)
+        field = a1.selectbox("الحقل", list(field_labels), format_func=field_labels.get, key="bulk_field")
+        mode = a2.radio("نوع التغيير", list(mode_labels), format_func=mode_labels.get, horizontal=True, key="bulk_mode")
+        amount = a3.number_input("المقدار (سالب للتخفيض)", value=0.0, key="bulk_amount")
+
+        filters = {"models": models, "colors": colors, "sizes": sizes,
+                   "stock_min": stock_min, "stock_max": stock_max}
+        df_prev = preview_adjustment(filters, field, mode, amount)
+        if df_prev is not None and not df_prev.empty:
+            changed = df_prev[df_prev['old_value'] != df_prev['new_value']]
+            st.caption(f"👁️ معاينة: {len(changed)} من {len(df_prev)} منتج سيتغير")
+            st.dataframe(
+                df_prev,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "id": None,
+                    "name": st.column_config.TextColumn("الموديل"),
+                    "color": st.column_config.TextColumn("اللون"),
+                    "size": st.column_config.TextColumn("القياس"),
+                    "old_value": st.column_config.NumberColumn("القيمة الحالية", format="%d"),
+                    "new_value": st.column_config.NumberColumn("القيمة الجديدة", format="%d"),
+                }
+            )
+            if not (models or colors or sizes or stock_min is not None or stock_max is not None):
+                st.warning("⚠️ لا يوجد فلتر: سيطبق التعديل على كل المنتجات")
+            if st.button("✅ تطبيق التعديل", type="primary", disabled=changed.empty):
+                try:
+                    adj_id, rows = apply_adjustment(filters, field, mode, amount)
+                except DB_ERRORS as e:
+                    st.error(f"❌ فشل التعديل: {e}")
+                else:
+                    clear_all_cache()
+                    st.toast(f"✅ تم تعديل {rows} منتج (رقم {adj_id})", icon="✅")
+                    time.sleep(0.5)
+                    st.rerun()
+        else:
+            st.info("لا توجد منتجات مطابقة للفلتر")
+
+        # سجل التعديلات مع التراجع
+        st.divider()
+        st.markdown("#### ↩️ آخر التعديلات الجماعية")
+        df_adj = get_adjustments()
+        if df_adj is not None and not df_adj.empty:
+            for _, adj in df_adj.iterrows():
+                is_undone = pd.notna(adj['undone_at'])
+                c_info, c_undo = st.columns([5, 1])
+                c_info.caption(
+                    f"#{adj['id']} • {adj['created_at']:%Y-%m-%d %H:%M} • {field_labels.get(adj['field'], adj['field'])} "
+                    f"{adj['amount']:+g}{'%' if adj['mode'] == 'pct' else ''} • {adj['row_count'] or 0} منتج"
+                    + (" • ↩️ تم التراجع" if is_undone else "")
+                )
+                if not is_undone:
+                    if c_undo.button("↩️ تراجع", key=f"undo_adj_{adj['id']}"):
+                        try:
+                            undone, skipped = undo_adjustment(int(adj['id']))
+                        except DB_ERRORS as e:
+                            st.error(f"❌ فشل التراجع: {e}")
+                        else:
+                            clear_all_cache()
+                            st.toast(f"↩️ تمت استعادة {undone} منتج", icon="✅")
+                            # منتجات تغيّرت قيمتها بعد التعديل (تعديل لاحق أو تحرير يدوي) تبقى كما هي
+                            if skipped:
+                                st.toast(f"⚠️ لم تُسترجع {skipped} منتج لأن قيمتها تغيّرت بعد هذا التعديل", icon="⚠️")
+                            time.sleep(0.5)
+                            st.rerun()
+        else:
+            st.info("لا توجد تعديلات جماعية بعد")
+
+    # ========================================
+    # سجل حركة المخزون ومطابقته
+    # ========================================
+    elif "حركة المخزون" in view_type:
+        from stock_ledger import MOVEMENT_REASONS, get_stock_history, reconcile_stock, settle_drift, compact_movements
+
+        labels = (df['name'].astype(str) + " | " + df['color'].astype(str) + " (" + df['size'].astype(str) + ")")
+        variant_id = st.selectbox(
+            "👗 المنتج", df['id'].tolist(), index=None, key="ledger_variant",
+            format_func=dict(zip(df['id'], labels)).get, placeholder="اختر منتجاً لعرض حركته..."
+        )
+        if variant_id is not None:
+            df_hist = get_stock_history(int(variant_id))
+            if df_hist is not None and not df_hist.empty:
+                df_hist['reason'] = df_hist['reason'].map(lambda r: MOVEMENT_REASONS.get(r, r))
+                st.dataframe(
+                    df_hist,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "created_at": st.column_config.DatetimeColumn("التاريخ", format="D MMM YYYY - h:mm a"),
+                        "delta": st.column_config.NumberColumn("التغيير", format="%+d"),
+                        "reason": st.column_config.TextColumn("السبب"),
+                        "ref_id": st.column_config.NumberColumn("المرجع", format="%d"),
+                        "balance": st.column_config.NumberColumn("الرصيد", format="%d"),
+                    }
+                )
+            else:
+                st.info("لا توجد حركات مسجلة لهذا المنتج")
+
+        st.divider()
+        col_rec, col_compact = st.columns(2)
+        with col_rec:
+            if st.button("🧮 مطابقة المخزون مع السجل", use_container_width=True):
+                st.session_state.ledger_drift = reconcile_stock()
+        with col_compact:
+            if st.button("🗜️ ضغط الحركات القديمة", use_container_width=True, help="دمج الحركات الأقدم من 90 يوماً في رصيد افتتاحي"):
+                try:
+                    st.toast(f"✅ تم ضغط {compact_movements()} حركة", icon="✅")
+                except DB_ERRORS as e:
+                    st.error(f"❌ فشل الضغط: {e}")
+
+        drift = st.session_state.get('ledger_drift')
+        if drift is not None:
+            if drift.empty:
+                st.success("✅ المخزون مطابق لسجل الحركة")
+            else:
+                st.warning(f"⚠️ {len(drift)} منتج غير مطابق للسجل")
+                st.dataframe(
+                    drift[['name', 'color', 'size', 'stock', 'ledger_stock', 'drift']],
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "name": st.column_config.TextColumn("الموديل"),
+                        "color": st.column_config.TextColumn("اللون"),
+                        "size": st.column_config.TextColumn("القياس"),
+                        "stock": st.column_config.NumberColumn("المخزون", format="%d"),
+                        "ledger_stock": st.column_config.NumberColumn("رصيد السجل", format="%d"),
+                        "drift": st.column_config.NumberColumn("الفرق", format="%+d"),
+                    }
+                )
+                if st.button("✍️ تسجيل الفروقات كتسوية", type="primary"):
+                    try:
+                        settled = settle_drift(drift)
+                    except DB_ERRORS as e:
+                        st.error(f"❌ فشلت التسوية: {e}")
+                    else:
+                        del st.session_state.ledger_drift
+                        clear_all_cache()
+                        st.toast(f"✅ تمت تسوية {settled} منتج", icon="✅")
+                        st.rerun()
+
+    # ========================================
+    # العرض التفصيلي للتعديل
+    # ========================================
+    else:
+        col_search, col_filter = st.columns([2, 1])
+        with col_search:
+            search = st.text_input("🔍 بحث:", placeholder="اكتب للفلترة...")
+        with col_filter:
+            stock_filter = st.selectbox("📦 فلترة المخزون", ["الكل", "نواقص فقط", "متوفر فقط"])
+
+        # أعمدة نصية قابلة للتعديل بدل الفئات (categorical) المشتركة
+        df_display = df.astype({'name': 'object', 'color': 'object', 'size': 'object'})
+        if search:
+            df_display = df_display[
+                df_display['name'].str.contains(search, case=False, na=False) | 
+                df_display['color'].str.contains(search, case=False, na=False)
+            ]
+        if stock_filter == "نواقص فقط":
+            df_display = df_display[df_display['stock'] < LOW_STOCK_THRESHOLD]
+        elif stock_filter == "متوفر فقط":
+            df_display = df_display[df_display['stock'] >= LOW_STOCK_THRESHOLD]
+
+        edited_df = st.data_editor(
+            df_display,
+            key="editor_inv",
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "id": None, 
+                "total_cost_value": None, 
+                "total_sale_potential": None,
+                "name": st.column_config.TextColumn("الاسم"),
+                "color": st.column_config.TextColumn("اللون"),
+                "size": st.column_config.SelectboxColumn("القياس", options=["S", "M", "L", "XL", "XXL", "Free"]),
+                "stock": st.column_config.NumberColumn("العدد", min_value=0, format="%d 📦"),
+                "price": st.column_config.NumberColumn("البيع", format="%d د.ع"),
+                "cost": st.column_config.NumberColumn("التكلفة", format="%d د.ع"),
+                "sku": st.column_config.TextColumn("الباركود"),
+            }
+        )
+
+        col_save, col_export = st.columns([1, 1])
+        with col_save:
+            if st.button("💾 حفظ التعديلات", type="primary", use_container_width=True):
+                with st.spinner("جاري الحفظ..."):
+                    def _sku(value):
+                        return value.strip() or None if isinstance(value, str) else None
+
+                    # فقط الصفوف المعدلة؛ المخزون يُحدَّث بالفرق حتى لا تُمحى مبيعات تمت أثناء التعديل
+                    before = df_display.set_index('id')
+                    now = get_time()
+                    changes, movements = [], []
+                    for _, row in edited_df.iterrows():
+                        vid = int(row['id'])
+                        old = before.loc[vid]
+                        delta = int(row['stock']) - int(old['stock'])
+                        fields = (float(row['price']), float(row['cost']), row['size'], row['name'], row['color'], _sku(row['sku']))
+                        old_fields = (float(old['price']), float(old['cost']), old['size'], old['name'], old['color'], _sku(old['sku']))
+                        if delta == 0 and fields == old_fields:
+                            continue
+                        changes.append((delta,) + fields + (vid,))
+                        movements.append((vid, delta, "edit", None, now))
+
+                    if changes:
+                        conn = get_db_connection()
+                        try:
+                            with conn.cursor() as cur:
+                                cur.executemany(
+                                    "UPDATE public.variants SET stock=stock+%s, price=%s, cost=%s, size=%s, name=%s, color=%s, sku=%s WHERE id=%s", 
+                                    changes
+                                )
+                                log_movements(cur, movements)
+                                conn.commit()
+                        except UNIQUE_VIOLATIONS:
+                            conn.rollback()
+                            st.error("❌ الباركود مستخدم لمنتج آخر")
+                            st.stop()
+                        clear_all_cache()
+                        st.toast("✅ تم الحفظ بنجاح!", icon="✅")
+                        time.sleep(0.5)
+                        st.rerun()
+
+        with col_export:
+            csv = df.to_csv(index=False).encode('utf-8-sig')
+            st.download_button(
+                "📥 تصدير CSV",
+                csv,
+                "inventory.csv",
+                "text/csv",
+                use_container_width=True
+            )
+
+else:
+    st.info("📭 المخزون فارغ. أضف منتجات للبدء.")
+
+# إضافة صنف جديد
+with st.expander("➕ إضافة منتج جديد"):
+    with st.form("new_item"):
+        c1, c2, c3 = st.columns(3)
+        n = c1.text_input("الاسم *")
+        co = c2.text_input("اللون *")
+        sz = c3.selectbox("القياس", ["S", "M", "L", "XL", "XXL", "Free"])
+
+        c4, c5, c6 = st.columns(3)
+        s = c4.number_input("العدد", min_value=1, value=1)
+        cs = c5.number_input("التكلفة", min_value=0.0, value=0.0)
+        p = c6.number_input("سعر البيع", min_value=0.0, value=0.0)
+        sku = st.text_input("📷 الباركود (اختياري)")
+
+        if st.form_submit_button("💾 حفظ المنتج", type="primary"):
+            if n and co:
+                # إضافة المنتج وحركة الإدخال الأولى في معاملة واحدة
+                try:
+                    add_variant(n, co, sz, s, cs, p, sku.strip() or None)
+                except UNIQUE_VIOLATIONS:
+                    st.error("❌ الباركود مستخدم لمنتج آخر")
+                    st.stop()
+                except DB_ERRORS as e:
+                    st.error(f"❌ فشلت الإضافة: {e}")
+                    st.stop()
+                clear_all_cache()
+                st.toast("✅ تمت الإضافة!", icon="✅")
+                st.rerun()
+            else:
+                st.error("❌ الاسم واللون مطلوبان")
@@ -0,0 +1,386 @@
+import streamlit as st
+
+from database import get_inventory, get_sku_index, get_customers, get_time, is_postgres, LOW_STOCK_THRESHOLD
+from checkout_journal import save_checkout, synced_invoice, journal_status, journal_problems, acknowledge, retry
+from ui import timed_fragment
+
+# ==========================================
+# صفحة 1: نقطة البيع (POS)
+# ==========================================
+
+# --- منطق السلة (Callbacks Logic) ---
+# الدوال تعمل قبل إعادة تشغيل جزء البيع، فتُحفظ رسائلها ليعرضها الجزء نفسه
+
+def _notify(msg, icon=None, error=False):
+    st.session_state.setdefault('pos_notices', []).append((msg, icon, error))
+
+def show_notices():
+    for msg, icon, error in st.session_state.pop('pos_notices', []):
+        if error:
+            st.error(msg)
+        else:
+            st.toast(msg, icon=icon)
+
+def add_to_cart_callback():
+    selection = st.session_state.get('pos_selection')
+    if not selection: 
+        return
+    
+    df = get_inventory()
+    try:
+        prod_name = selection.split(" | ")[0]
+        prod_color = selection.split(" | ")[1].split(" (")[0]
+        item_row = df[(df['name'] == prod_name) & (df['color'] == prod_color)].iloc[0]
+        
+        qty = st.session_state.get('pos_qty', 1)
+        price = st.session_state.get('pos_price', item_row['price'])
+        
+        cart_item = {
+            "id": int(item_row['id']), 
+            "name": item_row['name'],
+            "color": item_row['color'], 
+            "size": item_row['size'],
+            "price": price, 
+            "qty": qty, 
+            "cost": float(item_row['cost']),
+            "total": price * qty
+        }
+        st.session_state.cart.append(cart_item)
+        _notify(f"🛒 أضيف: {item_row['name']}", "✅")
+    except IndexError:
+        _notify("❌ لم يتم العثور على المنتج", error=True)
+    except Exception as e:
+        _notify(f"❌ حدث خطأ أثناء إضافة المنتج: {e}", error=True)
+
+def scan_callback():
+    code = st.session_state.get('pos_scan', '').strip()
+    st.session_state.pos_scan = ""
+    if not code:
+        return
+
+    item = get_sku_index().get(code)
+    if item is None:
+        _notify(f"❌ باركود غير معروف: {code}", "⚠️")
+        return
+
+    # مسح نفس القطعة مرة أخرى يزيد الكمية بدل إضافة سطر جديد
+    line = next((it for it in st.session_state.cart
+                 if it['id'] == item['id'] and it['price'] == item['price']), None)
+    in_cart = line['qty'] if line else 0
+    if in_cart + 1 > int(item['stock']):
+        _notify(f"⚠️ لا يوجد مخزون كافٍ من {item['name']}", "⚠️")
+        return
+
+    if line:
+        line['qty'] += 1
+        line['total'] = line['price'] * line['qty']
+    else:
+        price = float(item['price'])
+        st.session_state.cart.append({
+            "id": int(item['id']),
+            "name": item['name'],
+            "color": item['color'],
+            "size": item['size'],
+            "price": price,
+            "qty": 1,
+            "cost": float(item['cost']),
+            "total": price,
+        })
+    _notify(f"🛒 أضيف: {item['name']} ({in_cart + 1})", "✅")
+
+def remove_from_cart_callback(idx):
+    if 0 <= idx < len(st.session_state.cart):
+        removed = st.session_state.cart.pop(idx)
+        _notify(f"🗑️ أُزيل: {removed['name']}", "✅")
+
+def checkout_callback():
+    if not st.session_state.cart:
+        st.error("❌ السلة فارغة")
+        return
+
+    c_select = st.session_state.get('c_select')
+    c_name = st.session_state.get('c_name')
+    if c_select == "➕ عميل جديد" and not c_name:
+        st.error("❌ الاسم مطلوب")
+        return
+
+    try:
+        # معالجة العميل
+        if c_select == "➕ عميل جديد":
+            customer = {
+                "name": c_name,
+                "phone": st.session_state.get('c_phone', ''),
+                "address": st.session_state.get('c_addr', ''),
+            }
+            customer_display = c_name
+            customer_addr = customer["address"]
+        else:
+            df_cust = get_customers()
+            cust_data = df_cust[df_cust['name'] == c_select].iloc[0]
+            customer = {"id": int(cust_data['id'])}
+            customer_display = cust_data['name']
+            customer_addr = cust_data['address']
+
+        # حفظ البيع في السجل المحلي أولاً (زمن القرص المحلي)؛ المزامنة مع قاعدة البيانات في الخلفية
+        # (مع قاعدة SQLite المحلية يُحفظ البيع فيها مباشرة)
+        inv_id = save_checkout(
+            customer,
+            st.session_state.cart,
+            discount_pct=st.session_state.get('c_discount', 0),
+            delivery_duration=st.session_state.get('c_dur', '24 ساعة'),
+        )
+
+        # إنشاء نص الفاتورة (تنسيق مخصص للطابعات الحرارية)
+        line_len = 32
+        msg = f"{'نواعم بوتيك':^{line_len}}\n"
+        msg += f"{'Nawaem Boutique':^{line_len}}\n"
+        msg += f"{'-'*line_len}\n"
+        msg += f"التاريخ: {get_time().strftime('%Y-%m-%d %H:%M')}\n"
+        msg += f"{'رقم الإيصال' if is_postgres() else 'رقم الفاتورة'}: {inv_id}\n"
+        msg += f"العميل: {customer_display}\n"
+        msg += f"{'-'*line_len}\n"
+        msg += f"{'المنتج':<18} {'السعر':>13}\n"
+        
+        total = 0
+        for it in st.session_state.cart:
+            # Format: ItemName (Qty) ... Price
+            item_line = f"{it['name']} ({it['size']})"
+            # Truncate if too long
+            if len(item_line) > 18: item_line = item_line[:17] + "…"
+            
+            price_line = f"{it['qty']}x{it['price']:,}"
+            total_line = f"{it['total']:,}"
+            
+            msg += f"{item_line:<18} {total_line:>13}\n"
+            msg += f"  @{it['price']:,}\n"
+            total += it['total']
+        
+        msg += f"{'-'*line_len}\n"
+        msg += f"الإجمالي: {total:,.0f} د.ع\n"
+        msg += f"{'-'*line_len}\n"
+        msg += f"📍 {customer_addr}\n"
+        msg += f"{'شكراً لزيارتكم':^{line_len}}"
+        
+        st.session_state.last_inv = msg
+        # مع Postgres يُطبع رقم الإيصال فوراً، ورقم الفاتورة يُعرف بعد المزامنة
+        st.session_state.last_receipt = inv_id if is_postgres() else None
+        st.session_state.cart = []
+        
+    except Exception as e:
+        st.error(f"❌ فشلت العملية: {e}")
+
+def new_order_callback():
+    st.session_state.pop('last_inv', None)
+    st.session_state.pop('last_receipt', None)
+
+# --- أجزاء الصفحة (Fragments) ---
+# البيع (المسح والبحث والسلة) جزء واحد: إضافة منتج أو حذفه يعيد تشغيل هذا الجزء فقط
+# ويظهر أثره في السلة في نفس المرة، دون إعادة تشغيل الصفحة كاملة
+
+def pos_product_picker():
+    st.markdown("### 🔍 البحث والمنتجات")
+    df_inv = get_inventory()
+    
+    if df_inv is not None:
+         low_stock_count = len(df_inv[df_inv['stock'] < LOW_STOCK_THRESHOLD])
+         if low_stock_count > 0:
+             st.warning(f"⚠️ تنبيه: يوجد {low_stock_count} منتجات قاربت على النفاذ!")
+    
+    if df_inv is not None and not df_inv.empty:
+        df_active = df_inv[df_inv['stock'] > 0].copy()
+        df_active['display'] = (
+            df_active['name'].astype(str) + " | " + df_active['color'].astype(str)
+            + " (" + df_active['size'].astype(str) + ")"
+        )
+        
+        st.selectbox(
+            "بحث عن منتج:", 
+            options=df_active['display'].tolist(), 
+            index=None, 
+            key="pos_selection",
+            placeholder="🔎 اكتب اسم المنتج أو اللون للبحث..."
+        )
+
+        # عرض تفاصيل المنتج المختار
+        if st.session_state.get('pos_selection'):
+            sel = st.session_state.pos_selection
+            item = df_active[df_active['display'] == sel].iloc[0]
+            
+            # بطاقة المنتج
+            st.markdown(f"""
+            <div class="product-preview">
+                <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 12px;">
+                    <h4 style="margin: 0; color: var(--text-primary);">{item['name']}</h4>
+                    <span class="status-badge status-{'success' if item['stock'] >= LOW_STOCK_THRESHOLD else 'warning' if item['stock'] > 0 else 'danger'}">
+                        {item['stock']} متوفر
+                    </span>
+                </div>
+                <div style="color: var(--text-secondary); font-size: 14px;">
+                    <span style="margin-left: 16px;">🎨 {item['color']}</span>
+                    <span style="margin-left: 16px;">📐 {item['size']}</span>
+                    <span style="margin-left: 16px;">💵 {item['price']:,.0f} د.ع</span>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # نموذج الإضافة
+            c_qty, c_price, c_btn = st.columns([1, 1, 2])
+            with c_qty:
+                st.number_input("العدد", 1, int(item['stock']), 1, key="pos_qty")
+            with c_price:
+                custom_price = st.number_input("سعر البيع", value=float(item['price']), key="pos_price")
+                # إظهار هامش الربح
+                margin = custom_price - float(item['cost'])
+                margin_pct = (margin / custom_price * 100) if custom_price > 0 else 0
+                color = "#10B981" if margin > 0 else "#EF4444"
+                st.caption(f"<span style='color:{color}'>هامش الربح: {margin:,.0f} ({margin_pct:.0f}%)</span>", unsafe_allow_html=True)
+            with c_btn:
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.button("➕ إضافة للسلة", type="primary", use_container_width=True,
+                          on_click=add_to_cart_callback)
+    else:
+        st.info("📭 لا توجد منتجات متوفرة في المخزون")
+
+def pos_cart():
+    total_bill = sum(item['total'] for item in st.session_state.cart)
+    total_profit = sum((item['price'] - item['cost']) * item['qty'] for item in st.session_state.cart)
+    
+    # عرض الإجمالي
+    st.markdown(f"""
+    <div class="total-card">
+        <div class="total-label">الإجمالي النهائي</div>
+        <div class="total-value">{total_bill:,.0f} <span class="total-currency">د.ع</span></div>
+        <div style="font-size: 12px; color: var(--success); margin-top: 4px;">
+            ربح متوقع: {total_profit:,.0f} د.ع
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # عناصر السلة
+    if not st.session_state.cart:
+        st.markdown("""
+        <div class="empty-cart">
+            <div class="empty-cart-icon">🛒</div>
+            <p>السلة فارغة</p>
+            <p style="font-size: 12px;">اختر منتجاً للبدء</p>
+        </div>
+        """, unsafe_allow_html=True)
+        return
+
+    for i, item in enumerate(st.session_state.cart):
+        col_item, col_del = st.columns([5, 1])
+        with col_item:
+            st.markdown(f"""
+            <div class="cart-item">
+                <div style="display: flex; justify-content: space-between;">
+                    <strong>{item['name']}</strong>
+                    <span style="color: var(--primary);">{item['total']:,.0f}</span>
+                </div>
+                <div style="color: var(--text-muted); font-size: 12px; margin-top: 4px;">
+                    {item['color']} • {item['size']} • {item['qty']} × {item['price']:,.0f}
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+        with col_del:
+            st.button("🗑️", key=f"del_{i}", help="إزالة", on_click=remove_from_cart_callback, args=(i,))
+
+@timed_fragment("checkout")
+def pos_checkout():
+    # معلومات العميل
+    with st.expander("👤 معلومات العميل", expanded=True):
+        df_cust = get_customers()
+        customer_options = ["➕ عميل جديد"]
+        if df_cust is not None and not df_cust.empty:
+            customer_options += df_cust['name'].tolist()
+        
+        st.selectbox("العميل", customer_options, key="c_select")
+        
+        if st.session_state.get('c_select') == "➕ عميل جديد":
+            st.text_input("الاسم *", key="c_name", placeholder="اسم العميل")
+            col_p, col_a = st.columns(2)
+            col_p.text_input("📞 الهاتف", key="c_phone", placeholder="07XX")
+            col_a.text_input("📍 العنوان", key="c_addr", placeholder="المنطقة/الحي")
+        else:
+            if df_cust is not None and not df_cust.empty and st.session_state.get('c_select'):
+                curr = df_cust[df_cust['name'] == st.session_state.c_select]
+                if not curr.empty:
+                    curr = curr.iloc[0]
+                    st.markdown(f"""
+                    <div style="background: var(--bg-elevated); padding: 12px; border-radius: 10px; font-size: 13px;">
+                        <span>📞 {curr['phone'] or 'لا يوجد'}</span> &nbsp;|&nbsp; 
+                        <span>📍 {curr['address'] or 'لا يوجد'}</span>
+                    </div>
+                    """, unsafe_allow_html=True)
+
+        st.selectbox("⏱️ مدة التوصيل", ["24 ساعة", "48 ساعة", "فوري"], key="c_dur")
+        st.number_input("💵 خصم للكلي (%)", 0, 100, 0, key="c_discount")
+    
+    # زر الدفع
+    if st.button("✅ إتمام البيع وطباعة الفاتورة", type="primary", use_container_width=True):
+        checkout_callback()
+        if 'last_inv' in st.session_state and not st.session_state.cart:
+            # نجاح البيع: تحديث السلة والفاتورة وملخص المخزون في الشريط الجانبي
+            st.rerun()
+
+# حالة مزامنة الفواتير المحفوظة في السجل المحلي
+def pos_sync_status():
+    pending = journal_status().get('pending', 0)
+    if pending:
+        st.caption(f"⏳ {pending} فاتورة بانتظار المزامنة مع قاعدة البيانات")
+    problems = journal_problems()
+    if problems:
+        with st.expander(f"⚠️ فواتير تحتاج مراجعة ({len(problems)})"):
+            for pr in problems:
+                invoice = f" • فاتورة {pr['invoice_id']}" if pr['invoice_id'] else ""
+                st.markdown(f"**{pr['receipt']}**{invoice} • {pr['created_at'][:16].replace('T', ' ')}")
+                if pr['status'] == 'conflict':
+                    for name, qty, stock in pr['shortfalls']:
+                        st.caption(f"📦 {name}: مطلوب {qty} والمتوفر {stock if stock is not None else 'محذوف'}")
+                    st.button("✔️ تمت المراجعة", key=f"ack_{pr['client_ref']}",
+                              on_click=acknowledge, args=(pr['client_ref'],))
+                else:
+                    st.caption(f"❌ {pr['error']}")
+                    st.button("🔁 إعادة المحاولة", key=f"retry_{pr['client_ref']}",
+                              on_click=retry, args=(pr['client_ref'],))
+
+@timed_fragment("sale")
+def pos_sale():
+    show_notices()
+    col_pos, col_cart = st.columns([2, 1.2], gap="large")
+
+    # >> القسم الأيمن: المنتجات والبحث
+    with col_pos:
+        # قارئ الباركود يرسل Enter بعد الرمز فيُضاف المنتج للسلة في نفس إعادة تشغيل الجزء
+        st.text_input(
+            "📷 مسح الباركود", key="pos_scan", on_change=scan_callback,
+            placeholder="امسح الباركود أو اكتب رمز المنتج ثم Enter"
+        )
+        pos_product_picker()
+
+    # >> القسم الأيسر: السلة والدفع
+    with col_cart:
+        st.markdown("### 🧾 الفاتورة")
+        pos_cart()
+
+        if st.session_state.cart:
+            st.divider()
+            pos_checkout()
+
+        # نافذة الفاتورة بعد الدفع
+        if 'last_inv' in st.session_state:
+            st.success("✅ تم البيع بنجاح!")
+            st.text_area("📋 نص الفاتورة (للنسخ)", st.session_state.last_inv, height=180)
+            receipt = st.session_state.get('last_receipt')
+            if receipt:
+                invoice_id = synced_invoice(receipt)
+                st.caption(f"🧾 رقم الفاتورة في النظام: {invoice_id}" if invoice_id
+                           else f"⏳ الإيصال {receipt} بانتظار المزامنة")
+            st.button("🆕 بدء طلب جديد", use_container_width=True, on_click=new_order_callback)
+
+        # مع SQLite يُحفظ البيع مباشرة ولا يوجد سجل محلي للمزامنة
+        if is_postgres():
+            pos_sync_status()
+
+# --- التخطيط (Layout) ---
+
+pos_sale()
@@ -0,0 +1,177 @@
+import streamlit as st
+import pandas as pd
+from datetime import timedelta
+
+from database import get_report_data
+from pnl import PNL_GRAINS, get_pnl
+from valuation import get_valuation_trend, get_valued_models
+from rfm import get_top_customers
+from catalog import get_top_products
+from ui import render_export_button
+
+# ==========================================
+# صفحة 3: التقارير (Dashboard)
+# ==========================================
+
+st.markdown("## 📊 لوحة المعلومات")
+
+tab_dash, tab_pnl, tab_val = st.tabs(["📊 لوحة المعلومات", "💰 الأرباح والخسائر", "📦 قيمة المخزون"])
+
+with tab_dash:
+    # فلتر الفترة
+    col_filter, _ = st.columns([1, 3])
+    with col_filter:
+        period = st.selectbox("📅 الفترة", ["اليوم", "هذا الأسبوع", "هذا الشهر", "كل الوقت"])
+        include_archive = period == "كل الوقت" and st.checkbox("📦 تضمين الأرشيف", help="إضافة مجاميع الأشهر المؤرشفة")
+
+    # تطبيق الفلتر
+    today = pd.Timestamp.now().normalize()
+    if period == "اليوم":
+        period_start = today
+    elif period == "هذا الأسبوع":
+        period_start = today - timedelta(days=today.dayofweek)
+    elif period == "هذا الشهر":
+        period_start = today.replace(day=1)
+    else:
+        period_start = None
+
+    # آخر مبيعات الفترة للرسوم + مجاميع المبيعات والفواتير لنفس الفترة (استعلامات متوازية)
+    report = get_report_data(None if period_start is None else period_start.to_pydatetime())
+    if report is None:
+        st.stop()
+    df_filtered, kpis = report
+
+    if kpis['orders'] > 0 or not df_filtered.empty:
+        df_filtered['date'] = pd.to_datetime(df_filtered['date'])
+
+        # المقاييس
+        m1, m2, m3, m4 = st.columns(4)
+        sales_total = kpis['sales']
+        profit_total = kpis['profit']
+        if include_archive:
+            # مجاميع الأشهر المؤرشفة محفوظة في archive_log (بدون قراءة ملفات Parquet)
+            from archive import get_archived_totals
+            archived = get_archived_totals("sales")
+            sales_total += archived['amount']
+            profit_total += archived['profit']
+        m1.metric("💵 المبيعات", f"{sales_total:,.0f}")
+        m2.metric("📦 الطلبات", f"{kpis['orders']}")
+        m3.metric("📈 الأرباح", f"{profit_total:,.0f}")
+        m4.metric("🛒 متوسط السلة", f"{kpis['avg_basket']:,.0f}")
+
+        st.divider()
+
+        c1, c2 = st.columns(2)
+        with c1:
+            st.markdown("#### 📈 النمو اليومي")
+            if not df_filtered.empty:
+                daily_trend = df_filtered.groupby(df_filtered['date'].dt.date)['total'].sum()
+                st.line_chart(daily_trend, color="#D48896", height=300)
+            else:
+                st.info("لا توجد بيانات لهذه الفترة")
+
+        with c2:
+            st.markdown("#### 🏆 الأكثر مبيعاً")
+            if not df_filtered.empty:
+                top = get_top_products(5, None if period_start is None else period_start.to_pydatetime())
+                if top is not None and not top.empty:
+                    st.bar_chart(top.set_index('name')['qty'], color="#D48896", height=250)
+
+                st.markdown("#### 💎 أفضل العملاء")
+                # من إحصاءات العملاء المحسوبة مسبقاً (كل التاريخ) أو رؤوس الفواتير للفترة
+                top_cust = get_top_customers(5, None if period_start is None else period_start.to_pydatetime())
+                if top_cust is not None and not top_cust.empty:
+                    st.bar_chart(top_cust.set_index('name')['total'], color="#D48896", height=250)
+            else:
+                st.info("لا توجد بيانات لهذه الفترة")
+
+        st.divider()
+        st.markdown("#### ⌚ أوقات الذروة (بالساعة)")
+        if not df_filtered.empty:
+            df_filtered['hour'] = df_filtered['date'].dt.hour
+            hourly_sales = df_filtered.groupby('hour')['total'].sum()
+            st.bar_chart(hourly_sales, color="#D48896", height=250)
+        else:
+             st.info("لا توجد بيانات كافية")
+
+        # ملخص إضافي
+        st.divider()
+        col_head, col_ex = st.columns([4, 1])
+        col_head.markdown("#### 📋 آخر المبيعات")
+        render_export_button(
+            col_ex, "📥 تصدير الكل", "sales",
+            "SELECT * FROM public.sales ORDER BY date DESC", "sales_report.csv",
+            archive_table="sales"
+        )
+        recent = df_filtered.head(10)[['date', 'product_name', 'qty', 'total', 'profit']]
+        recent.columns = ['التاريخ', 'المنتج', 'الكمية', 'المبلغ', 'الربح']
+        st.dataframe(recent, use_container_width=True, hide_index=True)
+
+    else:
+        st.info("📭 لا توجد مبيعات في هذه الفترة")
+
+# ==========================================
+# تبويب: الأرباح والخسائر (محسوبة في SQL)
+# ==========================================
+with tab_pnl:
+    col_grain, col_from, col_to = st.columns(3)
+    with col_grain:
+        grain_label = st.selectbox("📆 التجميع", list(PNL_GRAINS), index=2, key="pnl_grain")
+    today = pd.Timestamp.now().normalize()
+    with col_from:
+        pnl_from = st.date_input("من", (today - pd.DateOffset(months=6)).replace(day=1), key="pnl_from")
+    with col_to:
+        pnl_to = st.date_input("إلى", today, key="pnl_to")
+
+    df_pnl = get_pnl(PNL_GRAINS[grain_label], pnl_from, pnl_to + timedelta(days=1))
+    if df_pnl is not None and not df_pnl.empty:
+        p1, p2, p3, p4 = st.columns(4)
+        p1.metric("💵 صافي المبيعات", f"{df_pnl['net_sales'].sum():,.0f}")
+        p2.metric("📦 مجمل الربح", f"{df_pnl['gross_profit'].sum():,.0f}")
+        p3.metric("💸 المصاريف + المرتجعات", f"{(df_pnl['expenses'] + df_pnl['returns_profit']).sum():,.0f}")
+        p4.metric("📈 صافي الربح", f"{df_pnl['net_profit'].sum():,.0f}")
+
+        st.line_chart(df_pnl.set_index('period')[['gross_profit', 'net_profit']], height=280)
+
+        labels = {
+            'period': 'الفترة', 'gross_sales': 'إجمالي المبيعات', 'discounts': 'الخصومات',
+            'net_sales': 'صافي المبيعات', 'cogs': 'تكلفة البضاعة', 'gross_profit': 'مجمل الربح',
+            'returns': 'المرتجعات', 'returns_profit': 'ربح المرتجعات', 'expenses': 'المصاريف',
+            'net_profit': 'صافي الربح',
+        }
+        table = df_pnl.rename(columns=lambda c: labels.get(c, c.replace("exp:", "مصروف: ")))
+        st.dataframe(table, use_container_width=True, hide_index=True)
+    else:
+        st.info("لا توجد بيانات لهذه الفترة")
+
+# ==========================================
+# تبويب: تطور قيمة المخزون (من اللقطات اليومية)
+# ==========================================
+with tab_val:
+    col_days, col_models = st.columns([1, 3])
+    with col_days:
+        days = st.selectbox("📅 المدة", [30, 90, 180, 365], index=1, format_func=lambda d: f"آخر {d} يوم", key="val_days")
+    since = (pd.Timestamp.now().normalize() - timedelta(days=days)).date()
+
+    df_val = get_valuation_trend(since)
+    if df_val is not None and not df_val.empty:
+        latest = df_val.iloc[-1]
+        first = df_val.iloc[0]
+        v1, v2, v3 = st.columns(3)
+        v1.metric("💰 رأس المال", f"{latest['cost_value']:,.0f}", delta=f"{latest['cost_value'] - first['cost_value']:+,.0f}")
+        v2.metric("📈 القيمة البيعية", f"{latest['sale_value']:,.0f}", delta=f"{latest['sale_value'] - first['sale_value']:+,.0f}")
+        v3.metric("📦 القطع", f"{int(latest['stock']):,}", delta=f"{int(latest['stock'] - first['stock']):+,}")
+
+        trend = df_val.set_index('day')[['cost_value', 'sale_value']]
+        trend.columns = ['رأس المال', 'القيمة البيعية']
+        st.line_chart(trend, height=280)
+
+        with col_models:
+            models = st.multiselect("👗 مقارنة موديلات", get_valued_models(since), key="val_models")
+        if models:
+            df_models = get_valuation_trend(since, tuple(models))
+            if df_models is not None and not df_models.empty:
+                st.markdown("#### 👗 رأس المال حسب الموديل")
+                st.line_chart(df_models.pivot(index='day', columns='name', values='cost_value'), height=280)
+    else:
+        st.info("لا توجد لقطات تقييم بعد (تُسجل مرة يومياً)")